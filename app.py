@@ -4,25 +4,57 @@ from utils.util import (
   upload_file_to_gemini,
   poll_file_processing,
   generate_metadata,
+  generate_metadata_from_keyframes,
   generate_transcription,
-  remove_markdown,
-  parse_bounding_boxes,
-  convert_normalized_to_pixel,
-  draw_bounding_boxes
+  stream_transcription,
+  SpeakerLineParser,
+  current_session_id,
+  prepare_audio_upload,
+  prepare_video_upload
 )
-from utils.model import load_model
-from PIL import Image
-from typing import TypedDict, Optional, List, Dict, Any
-from utils.util import upload_file_to_gemini
-import google.generativeai as genai
+from utils.model import configure, load_detection_model, load_model
+from utils.upload_cache import get_upload_cache, format_cache_stats, hash_file_content
+from utils.pipeline import run_video_batch, collect_results, results_to_csv, results_to_jsonl
+from utils.schemas import VideoAnalysis
+from utils.result_cache import get_result_cache
+from utils.long_audio import transcribe_long_audio, format_transcript
+from utils.context_cache import get_context_cache_manager, usage_counts
+from utils.stream_parser import BoxStreamParser
+from utils.file_index import get_file_index
+from utils.file_ops import DEFAULT_DELETE_WORKERS, delete_files, iter_files
+from utils.metrics import get_metrics
+from utils.scheduler import file_api_call, format_queue_status, get_scheduler
+from typing import TYPE_CHECKING, Optional
+from utils.backend import genai
+import datetime
+import time
+
+# NumPy, PIL and OpenCV back only some tabs; each tab imports its own so the
+# first page render does not wait on the others.
+if TYPE_CHECKING:
+  from utils.audio_preprocess import PreparedAudio
+  from utils.video_preprocess import PreparedVideo
 
 def main():
   st.set_page_config(page_title="Gemini Multimodal", layout="wide")
+  configure()
+  index = get_file_index()
+  # Keeps this session's uploads from being collected as orphans.
+  index.heartbeat(current_session_id())
+  index.start_background_gc()
+  # Keeps the context caches this session asked about from being reaped as idle.
+  get_context_cache_manager().heartbeat(current_session_id())
   st.title("Gemini Multimodal Application")
 
   # Tab selection using radio
   tab = st.radio("", ["Video", "Image", "Audio", "File API"], horizontal=True)
 
+  st.sidebar.checkbox(
+      "Bypass result cache",
+      key="bypass_result_cache",
+      help="Always call the model instead of reusing results stored for the same content, model and prompt."
+  )
+
   if tab == "Video":
       video_tab()
   elif tab == "Image":
@@ -32,16 +64,41 @@ def main():
   elif tab == "File API":
       file_api_tab()
 
-def video_tab():
+  # Rendered last so the stages of this run are included.
+  st.sidebar.caption(format_queue_status(get_scheduler().snapshot()))
+  if st.sidebar.checkbox("Show timings", key="show_timings", help="Time, bytes and tokens per stage: upload, processing, model calls, parsing and drawing."):
+      timings_panel()
+
+
+def timings_panel():
+  """Sidebar panel summarizing recorded stages, with Prometheus and JSONL exports."""
+  metrics = get_metrics()
+  with st.sidebar.expander("⏱️ Timings", expanded=True):
+      scope = st.radio("Scope", ["This session", "All sessions"], horizontal=True, key="timings_scope")
+      session_id = current_session_id() if scope == "This session" else None
+      rows = metrics.summary(session_id)
+      if rows:
+          st.dataframe(rows, use_container_width=True)
+      else:
+          st.caption("Nothing timed yet.")
+      queue_rows = get_scheduler().snapshot()
+      if queue_rows:
+          st.caption("Request queue (all sessions)")
+          st.dataframe(queue_rows, use_container_width=True)
+      st.download_button("Download Prometheus metrics", metrics.to_prometheus(), "metrics.prom", "text/plain")
+      st.download_button("Download spans (JSONL)", metrics.to_jsonl(session_id), "spans.jsonl", "application/jsonl")
+
+def use_result_cache() -> bool:
+  return not st.session_state.get("bypass_result_cache", False)
+
 
-  # Define the structure for Video Analysis metadata
-  class VideoAnalysis(TypedDict):
-      name: str
-      title: str
-      total_duration: float  # Duration in seconds
-      summary: str
-      small_summary: str
-      tags: Optional[List[str]]
+def show_cache_marker():
+  """Marks the result just displayed if it came from the result cache."""
+  if use_result_cache() and get_result_cache().last_lookup_hit():
+      st.caption("⚡ Cached result")
+
+
+def video_tab():
 
   def display_metadata(metadata: VideoAnalysis):
       """Displays the generated metadata in a user-friendly format."""
@@ -58,6 +115,11 @@ def video_tab():
 
   model = load_model(type="video", schemaType=VideoAnalysis)
 
+  mode = st.radio("Mode", ["Single Video", "Batch"], horizontal=True)
+  if mode == "Batch":
+      video_batch_section(model)
+      return
+
   uploaded_file = st.file_uploader("Upload a video file", type=["mp4", "mov", "avi", "mkv"])
 
   if uploaded_file is not None:
@@ -65,70 +127,280 @@ def video_tab():
       with col2:
           st.video(uploaded_file)
       uploaded_file.seek(0)
+      video_mode, options = video_preprocess_options()
       if st.button("Analyze Video"):
-          with st.spinner('Uploading video...'):
-              uploaded_genai_file = upload_file_to_gemini(uploaded_file)
-              if uploaded_genai_file:
-                  st.success("File Upload successful!")
-              if uploaded_genai_file is None:
-                  st.error("Failed to upload the video.")
-                  return
-
-          processed_file = poll_file_processing(uploaded_genai_file)
-          if processed_file is None:
-              st.error("Video processing failed.")
-              return
+          started = time.perf_counter()
+          if video_mode == "raw":
+              from utils.video_preprocess import PreparedVideo
 
-          with st.spinner('Generating metadata...'):
-              metadata = generate_metadata(model, processed_file)
-              if metadata:
-                  st.success("Metadata generation successful!")
-                  display_metadata(metadata)
+              prepared = PreparedVideo("raw", uploaded_file.size, uploaded_file.size, 0.0, 0.0)
+          else:
+              with st.spinner('Preparing video...'):
+                  try:
+                      prepared = prepare_video_upload(uploaded_file, video_mode, **options)
+                  except Exception as e:
+                      st.error(f"Error preparing video: {e}")
+                      return
+
+          if prepared.keyframes is not None:
+              with st.spinner(f'Generating metadata from {len(prepared.keyframes.frames)} keyframes...'):
+                  metadata = generate_metadata_from_keyframes(model, prepared.keyframes, use_cache=use_result_cache())
+          else:
+              with st.spinner('Uploading video...'):
+                  uploaded_genai_file = upload_file_to_gemini(prepared.file or uploaded_file)
+                  if uploaded_genai_file:
+                      st.success("File Upload successful!")
+                  if uploaded_genai_file is None:
+                      st.error("Failed to upload the video.")
+                      return
+              st.caption(format_cache_stats(get_upload_cache().stats()))
+
+              processed_file = poll_file_processing(uploaded_genai_file)
+              if processed_file is None:
+                  st.error("Video processing failed.")
+                  return
+              st.session_state["video_processed_file"] = processed_file
+              st.session_state["video_processed_upload"] = uploaded_file.file_id
+              st.session_state["video_qa_history"] = []
+
+              with st.spinner('Generating metadata...'):
+                  metadata = generate_metadata(model, processed_file, use_cache=use_result_cache())
+          if metadata:
+              st.success("Metadata generation successful!")
+              show_cache_marker()
+              record_video_run(uploaded_file.name, prepared, time.perf_counter() - started)
+              display_metadata(metadata)
+      video_runs_section()
+      if st.session_state.get("video_processed_upload") == uploaded_file.file_id:
+          video_qa_section(st.session_state["video_processed_file"])
   else:
       st.info("Please upload a video file to begin analysis.")
 
 
+def video_preprocess_options():
+  """Asks how the video is sent to Gemini; returns the utils.video_preprocess mode and its options."""
+  from utils.video_preprocess import (
+    DEFAULT_FPS as DEFAULT_VIDEO_FPS,
+    DEFAULT_MAX_KEYFRAMES,
+    DEFAULT_MAX_SIDE as DEFAULT_VIDEO_MAX_SIDE,
+    DEFAULT_SCENE_THRESHOLD,
+  )
+
+  choice = st.radio(
+      "Send to Gemini",
+      ["Original video", "Reduced video", "Keyframes"],
+      horizontal=True,
+      help="Reduced re-encodes at a lower resolution and frame rate before upload (without the audio track). "
+           "Keyframes sends only the frames where the scene changes, as images.",
+  )
+  if choice == "Reduced video":
+      col1, col2 = st.columns(2)
+      with col1:
+          max_side = st.number_input("Longest side (px)", min_value=144, max_value=3840, value=DEFAULT_VIDEO_MAX_SIDE, step=64)
+      with col2:
+          fps = st.number_input("Frames per second", min_value=0.5, max_value=60.0, value=DEFAULT_VIDEO_FPS, step=0.5)
+      return "reduced", {"max_side": int(max_side), "fps": float(fps)}
+  if choice == "Keyframes":
+      col1, col2 = st.columns(2)
+      with col1:
+          threshold = st.slider("Scene change threshold", min_value=1.0, max_value=60.0, value=DEFAULT_SCENE_THRESHOLD)
+      with col2:
+          max_keyframes = st.number_input("Max keyframes", min_value=1, max_value=256, value=DEFAULT_MAX_KEYFRAMES)
+      return "keyframes", {"threshold": threshold, "max_keyframes": int(max_keyframes)}
+  return "raw", {}
+
+
+def record_video_run(name: str, prepared: "PreparedVideo", seconds: float):
+  """Reports what preprocessing saved and keeps the run for comparison with other modes."""
+  row = {"file": name, **prepared.as_row(), "time_to_metadata_s": round(seconds, 2)}
+  st.caption(
+      f"📦 Sent {row['sent_mb']} MB of {row['original_mb']} MB ({row['saved_pct']}% saved) · "
+      f"preprocessing {row['preprocess_s']} s · time to metadata {row['time_to_metadata_s']} s"
+  )
+  st.session_state.setdefault("video_runs", []).append(row)
+
+
+def video_runs_section():
+  runs = st.session_state.get("video_runs")
+  if runs:
+      with st.expander("Compare runs (bytes sent and time to metadata per mode)"):
+          st.dataframe(runs, use_container_width=True)
+
+
+def video_qa_section(processed_file):
+  """Answers follow-up questions about a processed video from a reusable context cache."""
+  st.header("💬 Ask about this video")
+  manager = get_context_cache_manager()
+  history = st.session_state.setdefault("video_qa_history", [])
+
+  question = st.text_input("Your question", placeholder="e.g., What happens after the first minute?")
+  if st.button("Ask") and question.strip():
+      with st.spinner("Thinking..."):
+          try:
+              context = manager.get_or_create(processed_file, session_id=current_session_id())
+              result = manager.ask(context, question.strip())
+              result["mode"] = "context cache"
+          except Exception as e:
+              # Caches need a minimum token count and a caching-capable model; fall back to resending the video.
+              st.warning(f"Context cache unavailable ({e}); sending the full video with this question.")
+              model = load_model(type=None, schemaType=None)
+              start = time.perf_counter()
+              try:
+                  response = model.generate_content([processed_file, question.strip()])
+                  result = {
+                      "question": question.strip(),
+                      "answer": response.text,
+                      "latency_s": round(time.perf_counter() - start, 2),
+                      **usage_counts(response),
+                      "mode": "full context",
+                  }
+              except Exception as e:
+                  st.error(f"Error answering the question: {e}")
+                  result = None
+      if result is not None:
+          history.append(result)
+
+  for result in reversed(history):
+      st.markdown(f"**Q:** {result['question']}")
+      st.markdown(result["answer"])
+      st.caption(
+          f"⏱️ {result['latency_s']} s · input tokens {result['input_tokens']} "
+          f"({result['cached_tokens']} cached, {result['uncached_input_tokens']} sent) · {result['mode']}"
+      )
+  if history:
+      with st.expander("Per-question latency and input tokens"):
+          st.dataframe(
+              [{k: v for k, v in result.items() if k != "answer"} for result in history],
+              use_container_width=True
+          )
+  entries = manager.entries()
+  if entries:
+      with st.expander("Active context caches"):
+          st.dataframe(entries, use_container_width=True)
+
+
+def video_batch_section(model):
+  uploaded_files = st.file_uploader(
+      "Upload video files", type=["mp4", "mov", "avi", "mkv"], accept_multiple_files=True
+  )
+  col1, col2 = st.columns(2)
+  with col1:
+      upload_concurrency = st.number_input("Concurrent uploads", min_value=1, max_value=16, value=4)
+  with col2:
+      generate_concurrency = st.number_input("Concurrent metadata requests", min_value=1, max_value=16, value=4)
+
+  if not uploaded_files:
+      st.info("Please upload one or more video files to begin batch analysis.")
+      return
+
+  if st.button("Analyze Batch"):
+      total = len(uploaded_files)
+      progress = st.progress(0.0, text=f"0/{total} files finished")
+      status_table = st.empty()
+      items = {}
+      finished = 0
+      batch = run_video_batch(
+          uploaded_files, model, upload_concurrency, generate_concurrency, use_cache=use_result_cache()
+      )
+      for item in batch:
+          items[item.index] = item
+          if item.finished:
+              finished += 1
+          progress.progress(finished / total, text=f"{finished}/{total} files finished")
+          status_table.dataframe([items[i].as_row() for i in sorted(items)], use_container_width=True)
+      st.session_state["video_batch_results"] = collect_results(list(items.values()))
+
+  records = st.session_state.get("video_batch_results")
+  if records:
+      st.subheader("Batch Results")
+      st.dataframe(records, use_container_width=True)
+      col1, col2 = st.columns(2)
+      with col1:
+          st.download_button("Download CSV", results_to_csv(records), "video_metadata.csv", "text/csv")
+      with col2:
+          st.download_button("Download JSONL", results_to_jsonl(records), "video_metadata.jsonl", "application/jsonl")
+
+
 def image_tab():
-    @st.cache_resource
+    import numpy as np
+    from PIL import Image
+
+    from utils.boxes import BoxArray
+    from utils.detection import detect_boxes, detections_to_csv, detections_to_json, stream_detected_boxes
+    from utils.image_preprocess import DEFAULT_MAX_SIDE
+    from utils.render import Annotator
+    from utils.tiling import DEFAULT_TILE_OVERLAP, DEFAULT_TILE_SIZE, DEFAULT_TILE_WORKERS, detect_tiled
+
     def get_model():
-        model = load_model(type=None, schemaType=None)
+        model = load_detection_model()
         return model
 
-    def process_image(image: Image.Image, object_name: str, model):
-        # Define the dynamic prompt with the user-specified object
-        prompt = f""" 
-        You are given an image. Identify all {object_name} in the image and provide their bounding boxes. 
-        Return ONLY a valid JSON array in the exact format shown below. 
-        return specific name , let say if it's a dog and you know the dog breed name return that.
-        Do NOT include any additional text, explanations, comments, trailing commas, or markdown formatting such as code blocks.
-        Use this JSON schema:
-        [
-            {{
-                "name": "string",
-                "ymin": float,
-                "xmin": float,
-                "ymax": float,
-                "xmax": float
-            }}
-        ]
-        """
-        try:
-            response = model.generate_content([image, prompt])
-        except Exception as e:
-            st.error(f"Error generating content from the model: {e}")
-            return None
-
-        final_response = remove_markdown(response.text)
-        
-        try:
-            bounding_boxes = parse_bounding_boxes(final_response)
-        except ValueError as ve:
-            st.error(f"Error parsing bounding boxes: {ve}")
-            return None
-
-        image_width, image_height = image.size
-        converted_boxes = convert_normalized_to_pixel(bounding_boxes, image_width, image_height)
-        return converted_boxes
+    def render_streaming_detection(image: Image.Image, digest: Optional[str], object_name: str, model, max_side):
+        """Draws boxes onto a preview as each one streams in; returns the boxes and the annotator."""
+        image_slot = st.empty()
+        timing = st.empty()
+        annotator = Annotator(image)
+        parser = BoxStreamParser()
+        converted_boxes = []
+        start = time.perf_counter()
+        first_box_at = None
+        for new_boxes in stream_detected_boxes(
+            image, object_name, model, max_side, use_result_cache(), parser, digest=digest
+        ):
+            if not len(new_boxes):
+                continue
+            if first_box_at is None:
+                first_box_at = time.perf_counter() - start
+            converted_boxes.append(new_boxes)
+            # Only the new boxes are drawn; earlier ones are already on the preview.
+            annotated_image = annotator.add(new_boxes)
+            box_count = sum(len(boxes) for boxes in converted_boxes)
+            image_slot.image(annotated_image, caption=f'🖼️ Annotated Image ({box_count} boxes so far)', use_container_width=True)
+            timing.caption(f"⏱️ First box after {first_box_at:.2f} s")
+        total = time.perf_counter() - start
+        if first_box_at is not None:
+            timing.caption(
+                f"⏱️ First box after {first_box_at:.2f} s, complete after {total:.2f} s, "
+                f"parse CPU {parser.parse_seconds * 1000:.1f} ms"
+                + (f", {parser.rejected} malformed objects skipped" if parser.rejected else "")
+            )
+        # The results view below shows the finished image.
+        image_slot.empty()
+        return BoxArray.concatenate(converted_boxes), annotator
+
+    def detection_results_section(detection):
+        """One image, one table and two downloads, however many boxes were found."""
+        boxes = detection["boxes"]
+        columns = boxes.to_columns(*detection["image_size"])
+
+        labels = sorted(set(boxes.names))
+        selected_labels = st.multiselect("🏷️ Filter by label", labels, default=labels, key="detection_label_filter")
+        selected_ids = [boxes.labels.index(label) for label in selected_labels]
+        rows = np.flatnonzero(np.isin(boxes.label_ids, selected_ids))
+        shown = {key: [values[i] for i in rows] for key, values in columns.items()}
+
+        image_slot = st.empty()
+        st.subheader(f"📍 Bounding Box Coordinates ({len(rows)} of {len(boxes)})")
+        st.caption("Click a column header to sort; select rows to highlight them on the image.")
+        selection = st.dataframe(
+            shown,
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="multi-row",
+            key="detection_table",
+        )
+        selected = [rows[i] for i in selection.selection.rows if i < len(rows)]
+
+        annotator = detection["annotator"]
+        annotated_image = annotator.highlighted(boxes.select(selected)) if selected else annotator.image
+        image_slot.image(annotated_image, caption='🖼️ Annotated Image', use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Download CSV", detections_to_csv(shown), "detections.csv", "text/csv")
+        with col2:
+            st.download_button("Download JSON", detections_to_json(shown), "detections.json", "application/json")
 
     st.header("📸 Object Detection")
     st.write("""
@@ -148,12 +420,15 @@ def image_tab():
 
     # Initialize uploaded_image as None
     uploaded_image = None
+    image_digest = None
 
     if input_method == "Upload Image":
         uploaded_file = st.sidebar.file_uploader("📂 Choose an image...", type=["jpg", "jpeg", "png"])
         if uploaded_file is not None:
             try:
                 uploaded_image = Image.open(uploaded_file).convert("RGB")
+                # Cache keys come from the uploaded bytes; hashing the decoded pixels on every rerun costs far more.
+                image_digest = hash_file_content(uploaded_file)
                 st.image(uploaded_image, caption='🖼️ Uploaded Image', use_container_width=True)
             except Exception as e:
                 st.error(f"❌ Error opening image: {e}")
@@ -174,6 +449,29 @@ def image_tab():
     else:
         object_name = "all"  # Set object_name to "all" when detect all is checked
 
+    max_side = st.sidebar.select_slider(
+        "📐 Max image side sent to the model (px)",
+        options=[768, 1024, 1536, 2048, 3072, "Original"],
+        value=DEFAULT_MAX_SIDE,
+    )
+    if max_side == "Original":
+        max_side = None
+
+    tiled = st.sidebar.checkbox(
+        "🧩 Tiled detection",
+        help="Split large images into overlapping tiles so small objects are not missed."
+    )
+    if tiled:
+        tile_size = st.sidebar.number_input("Tile size (px)", min_value=256, max_value=4096, value=DEFAULT_TILE_SIZE, step=128)
+        tile_overlap = st.sidebar.slider("Tile overlap", min_value=0.0, max_value=0.5, value=DEFAULT_TILE_OVERLAP, step=0.05)
+        tile_workers = st.sidebar.number_input("Concurrent tile requests", min_value=1, max_value=16, value=DEFAULT_TILE_WORKERS)
+
+    stream_detections = st.sidebar.checkbox(
+        "⚡ Stream detections",
+        disabled=tiled,
+        help="Draw each box as soon as it arrives instead of waiting for the full response."
+    )
+
     detect_button = st.sidebar.button("🚀 Detect Objects")
 
     if detect_button:
@@ -185,26 +483,48 @@ def image_tab():
             with st.spinner("🔄 Loading the model..."):
                 model = get_model()
 
-            with st.spinner("🔍 Detecting objects..."):
-                converted_boxes = process_image(uploaded_image, object_name, model)
+            annotator = None
+            if tiled:
+                with st.spinner("🔍 Detecting objects tile by tile..."):
+                    merged_boxes, tile_count, failed_tiles = detect_tiled(
+                        uploaded_image,
+                        lambda tile: detect_boxes(tile, object_name, model, max_side, use_cache=use_result_cache()),
+                        tile_size=tile_size,
+                        overlap=tile_overlap,
+                        max_workers=tile_workers,
+                    )
+                converted_boxes = merged_boxes
+                st.caption(f"🧩 {tile_count} tiles, {failed_tiles} failed, {len(converted_boxes)} boxes after merging")
+            elif stream_detections:
+                converted_boxes, annotator = render_streaming_detection(
+                    uploaded_image, image_digest, object_name, model, max_side
+                )
+                show_cache_marker()
+            else:
+                with st.spinner("🔍 Detecting objects..."):
+                    converted_boxes = detect_boxes(
+                        uploaded_image, object_name, model, max_side, use_cache=use_result_cache(), digest=image_digest
+                    )
+                show_cache_marker()
 
             if converted_boxes is None:
                 st.error("❌ An error occurred during object detection.")
                 st.stop()
 
-            if converted_boxes:
-                annotated_image = draw_bounding_boxes(uploaded_image.copy(), converted_boxes, output_path=None)
-                st.image(annotated_image, caption='🖼️ Annotated Image', use_container_width=True)
-
-                st.subheader("📍 Bounding Box Coordinates")
-                for idx, box in enumerate(converted_boxes, start=1):
-                    st.markdown(f"**{idx}. {box['name'].capitalize()}:**")
-                    st.markdown(f"- ymin: {box['ymin']}")
-                    st.markdown(f"- xmin: {box['xmin']}")
-                    st.markdown(f"- ymax: {box['ymax']}")
-                    st.markdown(f"- xmax: {box['xmax']}")
-                    st.markdown("---")
-            else:
+            if annotator is None:
+                annotator = Annotator(uploaded_image)
+                annotator.add(converted_boxes)
+            # Kept across reruns so sorting, filtering and row selection don't repeat the detection.
+            st.session_state.image_detection = {
+                "file_id": uploaded_file.file_id,
+                "boxes": converted_boxes,
+                "image_size": uploaded_image.size,
+                "annotator": annotator,
+            }
+            st.session_state.pop("detection_table", None)
+            st.session_state.pop("detection_label_filter", None)
+
+            if not len(converted_boxes):
                 if detect_all:
                     st.warning("⚠️ No objects were detected in the image.")
                 else:
@@ -213,6 +533,11 @@ def image_tab():
             st.error("⚠️ Please provide an image either by uploading or using the camera.")
             st.stop()
 
+    detection = st.session_state.get("image_detection")
+    if (detection is not None and uploaded_image is not None
+            and detection["file_id"] == uploaded_file.file_id and len(detection["boxes"])):
+        detection_results_section(detection)
+
 
 def audio_tab():
 
@@ -224,58 +549,225 @@ def audio_tab():
   uploaded_audio = st.file_uploader("Upload an audio file", type=["mp3", "wav", "aiff", "acc", "ogg", "flac"])
 
   if uploaded_audio is not None:
+      from utils.audio_preprocess import DEFAULT_MIN_SILENCE, SUPPORTED_SUFFIXES as PREPARABLE_AUDIO
+
       st.audio(uploaded_audio, format='audio/mp3')
+      is_pcm = uploaded_audio.name.lower().endswith(PREPARABLE_AUDIO)
+      prepare = st.checkbox(
+          "Prepare audio before upload",
+          value=is_pcm,
+          disabled=not is_pcm,
+          help="Downmix to mono, resample to 16 kHz and drop long silences (WAV and AIFF). "
+               "A timestamp map relates positions in the prepared audio to the original."
+      ) and is_pcm
+      if prepare:
+          min_silence = st.number_input(
+              "Drop silences longer than (seconds)", min_value=0.3, max_value=30.0, value=DEFAULT_MIN_SILENCE, step=0.1
+          )
+      # Prepared audio is always WAV.
+      is_wav = prepare or uploaded_audio.name.lower().endswith(".wav")
+      long_audio = st.checkbox(
+          "Long-audio mode",
+          disabled=not is_wav,
+          help="Split the recording into overlapping segments and transcribe them in parallel (WAV only)."
+      )
+      if long_audio and is_wav:
+          col1, col2, col3 = st.columns(3)
+          with col1:
+              segment_minutes = st.number_input("Segment length (minutes)", min_value=1, max_value=60, value=5)
+          with col2:
+              overlap_seconds = st.number_input("Overlap (seconds)", min_value=1, max_value=120, value=15)
+          with col3:
+              parallelism = st.number_input("Parallel segments", min_value=1, max_value=16, value=4)
+          if st.button("Transcribe Audio"):
+              prepared = prepare_audio_or_warn(uploaded_audio, min_silence) if prepare else None
+              with st.spinner('Transcribing audio segments...'):
+                  lines = transcribe_long_audio(
+                      model,
+                      prepared.data if prepared else uploaded_audio.getvalue(),
+                      base_name=uploaded_audio.name,
+                      segment_seconds=segment_minutes * 60,
+                      overlap_seconds=overlap_seconds,
+                      parallelism=parallelism,
+                      use_cache=use_result_cache(),
+                  )
+              if lines is None:
+                  st.error("One or more audio segments failed to transcribe.")
+                  return
+              transcription = format_transcript(lines)
+              st.success("Transcription successful!")
+              st.text_area("Transcription", transcription, height=300)
+              st.download_button("Download Transcript", transcription, "transcript.txt", "text/plain")
+          return
+
+      stream_output = st.checkbox("Stream transcript as it is generated", value=True)
       if st.button("Transcribe Audio"):
+          prepared = prepare_audio_or_warn(uploaded_audio, min_silence) if prepare else None
           with st.spinner('Uploading audio...'):
               try:
-                  uploaded_genai_file = upload_file_to_gemini(uploaded_audio)
+                  uploaded_genai_file = upload_file_to_gemini(
+                      prepared.as_file(uploaded_audio.name) if prepared else uploaded_audio
+                  )
                   if uploaded_genai_file:
                       st.success("File Upload successful!")
               except Exception as e:
                   st.error(f"Error uploading audio: {e}")
                   return
+          st.caption(format_cache_stats(get_upload_cache().stats()))
 
           processed_file = poll_file_processing(uploaded_genai_file)
           if processed_file is None:
               st.error("Audio processing failed.")
               return
 
-          with st.spinner('Transcribing audio...'):
-              transcription = generate_transcription(model, processed_file)
-              if transcription:
-                  st.success("Transcription successful!")
-                  st.text_area("Transcription", transcription, height=300)
+          if stream_output:
+              transcription = render_streaming_transcription(model, processed_file)
+          else:
+              with st.spinner('Transcribing audio...'):
+                  transcription = generate_transcription(model, processed_file, use_cache=use_result_cache())
+          if transcription:
+              st.success("Transcription successful!")
+              show_cache_marker()
+              st.text_area("Transcription", transcription, height=300)
+              st.download_button("Download Transcript", transcription, "transcript.txt", "text/plain")
   else:
       st.info("Please upload an audio file to begin transcription.")
 
 
+def prepare_audio_or_warn(uploaded_audio, min_silence: float) -> Optional["PreparedAudio"]:
+  """Prepares the audio and reports what it saved; returns None (send the original) if it cannot be decoded."""
+  with st.spinner('Preparing audio...'):
+      try:
+          prepared = prepare_audio_upload(uploaded_audio, min_silence=min_silence)
+      except ValueError as e:
+          st.warning(f"Sending the original audio: {e}")
+          return None
+  row = prepared.as_row()
+  st.caption(
+      f"🎚️ Sending {row['sent_mb']} MB instead of {row['original_mb']} MB · "
+      f"{row['sent_s']} s of audio instead of {row['original_s']} s "
+      f"(~{row['sent_tokens']} tokens instead of {row['original_tokens']}) · preprocessing {row['preprocess_s']} s"
+  )
+  with st.expander("Timestamp map (prepared audio → original recording)"):
+      st.dataframe(prepared.time_map.as_rows(), use_container_width=True)
+  return prepared
+
+
+def render_streaming_transcription(model, processed_file) -> Optional[str]:
+  """Renders speaker lines as they stream in and returns the full transcript."""
+  st.subheader("Live Transcript")
+  timing = st.empty()
+  transcript_area = st.empty()
+  parser = SpeakerLineParser()
+  chunks = []
+  start = time.perf_counter()
+  first_line_at = None
+
+  def render():
+      rendered = "\n\n".join(f"**{line['speaker']}:** {line['text']}" for line in parser.lines)
+      transcript_area.markdown(rendered)
+
+  for chunk in stream_transcription(model, processed_file, use_cache=use_result_cache()):
+      chunks.append(chunk)
+      if parser.feed(chunk) and first_line_at is None:
+          first_line_at = time.perf_counter() - start
+          timing.caption(f"⏱️ First line after {first_line_at:.2f} s")
+      if parser.lines:
+          # Continuation lines extend earlier entries, so re-render on every chunk.
+          render()
+  if parser.close():
+      render()
+
+  total = time.perf_counter() - start
+  if first_line_at is not None:
+      timing.caption(f"⏱️ First line after {first_line_at:.2f} s, complete after {total:.2f} s")
+  if parser.lines:
+      with st.expander(f"Structured transcript ({len(parser.lines)} lines)"):
+          st.dataframe(parser.lines, use_container_width=True)
+  transcription = "".join(chunks).strip()
+  return transcription or None
+
+
 def file_api_tab():
 
   st.header("📂 File API Operations")
   st.write("List and manage files uploaded to the API.")
 
+  # Filters shared by the listing and by "Delete matching files"
+  col1, col2, col3 = st.columns(3)
+  with col1:
+      name_prefix = st.text_input("Name starts with", placeholder="e.g. interview or files/abc")
+  with col2:
+      states = st.multiselect("State", ["ACTIVE", "PROCESSING", "FAILED"])
+  with col3:
+      min_age_hours = st.number_input("Older than (hours)", min_value=0.0, value=0.0, step=1.0)
+  filters = (name_prefix.strip(), tuple(states), min_age_hours or None)
+
+  index = get_file_index()
+
+  # Listings come from the local index; syncing reconciles it with the File API.
+  col1, col2 = st.columns([1, 3])
+  with col1:
+      if st.button("🔄 Sync with File API"):
+          with st.spinner("Syncing file index..."):
+              try:
+                  counts = index.sync()
+                  st.success(f"{counts['added']} new, {counts['updated']} changed, {counts['removed']} removed.")
+              except Exception as e:
+                  st.error(f"Error syncing files: {e}")
+  with col2:
+      last_sync = index.last_sync()
+      if last_sync is None:
+          st.caption("Not synced yet: only files uploaded from this app are listed.")
+      else:
+          st.caption(f"Last synced {int((time.time() - last_sync) // 60)} min ago.")
+
   # List files
+  page_size = st.select_slider("Files per page", options=[10, 25, 50, 100], value=25)
   if st.button("List Files"):
+      st.session_state.file_listing_page = 0
+
+  if "file_listing_page" in st.session_state:
       st.subheader("Uploaded Files:")
       try:
-          files = genai.list_files()
-          file_list = list(files)  # Convert generator to list
-
-          # Check if the list has files
-          if len(file_list) > 0:
-              cols = st.columns(2)  # Create two columns
-              with cols[0]:
-                  st.markdown("**__Display Name__**")
-              with cols[1]:
-                  st.write("**__File Name__**")
-
-              for f in file_list:
-                  with cols[0]:
-                      st.write(f"📄 {f.display_name}")  # Display Name
-                  with cols[1]:
-                      st.write(f"📄 {f.name}")  # File Name
+          total = index.count(*filters)
+          page_count = max(1, -(-total // page_size))
+          page = min(st.session_state.file_listing_page, page_count - 1)
+          rows = index.query(*filters, limit=page_size, offset=page * page_size)
+
+          if rows:
+              session_id = current_session_id()
+              st.dataframe(
+                  [
+                      {
+                          "Display Name": row["display_name"],
+                          "File Name": row["name"],
+                          "State": row["state"],
+                          "Size (MB)": round((row["size_bytes"] or 0) / (1024 * 1024), 2),
+                          "Type": row["mime_type"],
+                          "Created": to_datetime(row["create_time"]),
+                          "Expires": to_datetime(row["expire_time"]),
+                          "Owner": "this session" if row["session_id"] == session_id else ("app" if row["session_id"] else ""),
+                      }
+                      for row in rows
+                  ],
+                  use_container_width=True,
+                  hide_index=True,
+              )
           else:
               st.markdown("<span style='color:red;'>No files found.</span>", unsafe_allow_html=True)  # Display error if no files
+
+          col1, col2, col3 = st.columns([1, 2, 1])
+          with col1:
+              if st.button("⬅️ Previous", disabled=page == 0):
+                  st.session_state.file_listing_page = page - 1
+                  st.rerun()
+          with col2:
+              st.caption(f"Page {page + 1} of {page_count} ({total} files)")
+          with col3:
+              if st.button("Next ➡️", disabled=page >= page_count - 1):
+                  st.session_state.file_listing_page = page + 1
+                  st.rerun()
       except Exception as e:
           st.error(f"Error listing files: {e}")
 
@@ -285,8 +777,8 @@ def file_api_tab():
   if st.button("Delete File"):
       if file_name_to_delete.strip():
           try:
-              myfile = genai.get_file(file_name_to_delete)
-              myfile.delete()
+              file_api_call(genai.delete_file, file_name_to_delete.strip())
+              forget_deleted_files([file_name_to_delete.strip()])
               st.success(f"File '{file_name_to_delete}' has been deleted.")
           except Exception as e:
               st.error(f"Error deleting file: {e}")
@@ -295,18 +787,47 @@ def file_api_tab():
 
   # Option to delete all files
   st.subheader("Delete All Files")
-  delete_all = st.checkbox("Delete all files")
+  only_matching = st.checkbox("Only files matching the filters above")
+  delete_all = st.checkbox("Delete matching files" if only_matching else "Delete all files")
   if delete_all:
+      workers = st.slider("Concurrent deletes", min_value=1, max_value=32, value=DEFAULT_DELETE_WORKERS)
       if st.button("Confirm Delete All"):
-          with st.spinner("Deleting all files..."):
-              try:
-                  files = genai.list_files()
-                  for f in files:
-                      myfile = genai.get_file(f.name)
-                      myfile.delete()
-                  st.success("All files have been deleted.")
-              except Exception as e:
-                  st.error(f"Error deleting all files: {e}")
+          progress = st.progress(0.0)
+          status = st.empty()
+
+          def show_progress(report):
+              # The total isn't known while the listing is still being paged, so the bar approaches 1 asymptotically.
+              progress.progress(report.total / (report.total + workers * 2))
+              status.caption(f"Deleted {len(report.deleted)} files, {len(report.failed)} failed, {report.retries} retries")
+
+          try:
+              files = iter_files(*filters) if only_matching else iter_files()
+              report = delete_files((f.name for f in files), max_workers=workers, on_progress=show_progress)
+              progress.progress(1.0)
+              forget_deleted_files(report.deleted)
+              if report.failed:
+                  st.error(f"Deleted {len(report.deleted)} files; {len(report.failed)} could not be deleted.")
+                  st.dataframe(
+                      [{"File Name": name, "Error": error} for name, error in report.failed.items()],
+                      use_container_width=True,
+                      hide_index=True,
+                  )
+              else:
+                  st.success(f"All {len(report.deleted)} files have been deleted.")
+          except Exception as e:
+              st.error(f"Error deleting all files: {e}")
+
+
+def forget_deleted_files(file_names):
+  """Drops deleted remote files from the file index and the upload cache."""
+  get_file_index().remove(file_names)
+  cache = get_upload_cache()
+  for name in file_names:
+      cache.forget_file(name)
+
+
+def to_datetime(timestamp):
+  return None if timestamp is None else datetime.datetime.fromtimestamp(timestamp)
 
 
 if __name__ == "__main__":
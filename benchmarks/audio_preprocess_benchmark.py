@@ -0,0 +1,192 @@
+"""
+Checks and measures audio preparation (mono, 16 kHz, silence trimming) on synthetic signals.
+
+Each scenario builds a recording from "speech" bursts (amplitude-modulated
+harmonic tones) separated by silences with a faint noise floor, so the
+voiced stretches are known exactly. The checks verify that:
+
+  - every burst survives trimming in full
+  - most of each long silence is dropped
+  - the TimeMap sends every prepared sample back to the original position
+    it came from
+  - resampling keeps an in-band tone and suppresses one above the new
+    Nyquist frequency
+
+The report lists bytes, duration and estimated audio tokens before and
+after, and the preparation time. The run exits 1 if any check fails.
+
+Usage:
+    python -m benchmarks.audio_preprocess_benchmark [--minutes 5] [--seed 0]
+"""
+import argparse
+import io
+import struct
+import sys
+import time
+import wave
+from typing import List, Tuple
+
+import numpy as np
+
+from utils.audio_preprocess import (
+    DEFAULT_MIN_SILENCE,
+    DEFAULT_PADDING,
+    DEFAULT_SAMPLE_RATE,
+    prepare_audio,
+    read_pcm,
+    resample,
+)
+
+NOISE_LEVEL = 0.001
+
+
+def _burst(rng: np.random.Generator, seconds: float, rate: int) -> np.ndarray:
+    t = np.arange(int(seconds * rate)) / rate
+    pitch = rng.uniform(110, 220)
+    voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+    # Syllable-rate envelope, never fully silent inside a burst.
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+    return (0.2 * voice * envelope).astype(np.float32)
+
+
+def synthesize(
+    rng: np.random.Generator, seconds: float, rate: int, channels: int, silence_share: float,
+) -> Tuple[np.ndarray, List[Tuple[float, float]], List[Tuple[float, float]]]:
+    """A (samples, channels) signal plus the (start, end) seconds of its bursts and of its silences."""
+    pieces, bursts, silences = [], [], []
+    position = 0.0
+    while position < seconds:
+        if rng.random() < silence_share:
+            length = rng.uniform(0.3, 6.0)
+            pieces.append(np.zeros(int(length * rate), np.float32))
+            silences.append((position, position + length))
+        else:
+            length = rng.uniform(0.5, 4.0)
+            pieces.append(_burst(rng, length, rate))
+            bursts.append((position, position + length))
+        position += len(pieces[-1]) / rate
+    mono = np.concatenate(pieces)
+    mono += rng.normal(0, NOISE_LEVEL, len(mono)).astype(np.float32)
+    # Channels differ slightly, as a real stereo recording would.
+    stereo = np.stack([mono * (1 - 0.1 * c) for c in range(channels)], axis=1)
+    return stereo, bursts, silences
+
+
+def to_wav(samples: np.ndarray, rate: int) -> bytes:
+    output = io.BytesIO()
+    with wave.open(output, "wb") as writer:
+        writer.setnchannels(samples.shape[1])
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    return output.getvalue()
+
+
+def to_aiff(samples: np.ndarray, rate: int) -> bytes:
+    frames = (np.clip(samples, -1, 1) * 32767).astype(">i2").tobytes()
+    # 80-bit extended sample rate: exponent and 64-bit mantissa with an explicit leading bit.
+    exponent = int(np.floor(np.log2(rate)))
+    mantissa = int(rate * 2 ** (63 - exponent))
+    comm = struct.pack(">hIh", samples.shape[1], len(samples), 16) + struct.pack(">HQ", exponent + 16383, mantissa)
+    ssnd = struct.pack(">II", 0, 0) + frames
+    body = b"AIFF" + b"COMM" + struct.pack(">I", len(comm)) + comm + b"SSND" + struct.pack(">I", len(ssnd)) + ssnd
+    return b"FORM" + struct.pack(">I", len(body)) + body
+
+
+def _kept_intervals(prepared) -> List[Tuple[float, float]]:
+    return [(original, original + duration) for _, original, duration in prepared.time_map.spans]
+
+
+def _covered(interval: Tuple[float, float], kept: List[Tuple[float, float]], tolerance: float) -> bool:
+    start, end = interval
+    return any(k_start - tolerance <= start and end <= k_end + tolerance for k_start, k_end in kept)
+
+
+def check_scenario(name: str, data: bytes, bursts, silences, failures: List[str]) -> dict:
+    prepared = prepare_audio(data)
+    kept = _kept_intervals(prepared)
+    frame_tolerance = 0.05
+
+    lost = [b for b in bursts if not _covered(b, kept, frame_tolerance)]
+    if lost:
+        failures.append(f"{name}: {len(lost)} of {len(bursts)} bursts not kept in full, e.g. {lost[0]}")
+
+    # Long silences should lose all but the padding on either side.
+    droppable = sum(
+        end - start - 2 * DEFAULT_PADDING for start, end in silences if end - start >= DEFAULT_MIN_SILENCE + 2 * DEFAULT_PADDING
+    )
+    dropped = prepared.original_duration - prepared.duration
+    if droppable and dropped < 0.8 * droppable:
+        failures.append(f"{name}: dropped {dropped:.1f}s of silence, expected about {droppable:.1f}s")
+
+    # Every prepared sample must come from the original position the TimeMap gives.
+    samples, rate = read_pcm(data)
+    reference = resample(samples.mean(axis=1), rate, prepared.sample_rate)
+    reference_pcm = (np.clip(reference, -1, 1) * 32767).astype(np.int16)
+    prepared_pcm, _ = read_pcm(prepared.data)
+    prepared_pcm = (prepared_pcm[:, 0] * 32768).round().astype(np.int16)
+    rng = np.random.default_rng(1)
+    positions = rng.integers(0, len(prepared_pcm), 2000)
+    original_positions = [
+        int(round(prepared.time_map.to_original(p / prepared.sample_rate) * prepared.sample_rate)) for p in positions
+    ]
+    mismatched = int(np.sum(prepared_pcm[positions] != reference_pcm[np.minimum(original_positions, len(reference_pcm) - 1)]))
+    if mismatched:
+        failures.append(f"{name}: {mismatched} of {len(positions)} samples do not map back to their original position")
+
+    return {"name": name, **prepared.as_row(), "kept_spans": len(prepared.time_map.spans)}
+
+
+def check_resampling(failures: List[str]) -> None:
+    rate = 48000
+    t = np.arange(rate) / rate
+    for frequency, expect_kept in ((1000, True), (12000, False)):
+        tone = np.sin(2 * np.pi * frequency * t).astype(np.float32)
+        out = resample(tone, rate, DEFAULT_SAMPLE_RATE)
+        # Skip the filter's edges.
+        level_db = 20 * np.log10(np.sqrt(np.mean(out[1000:-1000] ** 2)) / np.sqrt(0.5))
+        if expect_kept and level_db < -1:
+            failures.append(f"resample: {frequency} Hz tone lost {-level_db:.1f} dB")
+        if not expect_kept and level_db > -30:
+            failures.append(f"resample: {frequency} Hz tone only {-level_db:.1f} dB down, expected 30")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    seconds = args.minutes * 60
+    failures: List[str] = []
+    rows = []
+    scenarios = [
+        ("wav 48k stereo, 50% silence", 48000, 2, 0.5, to_wav),
+        ("wav 16k mono, 15% silence", 16000, 1, 0.15, to_wav),
+        ("aiff 44.1k stereo, 30% silence", 44100, 2, 0.3, to_aiff),
+    ]
+    for name, rate, channels, silence_share, encode in scenarios:
+        samples, bursts, silences = synthesize(rng, seconds, rate, channels, silence_share)
+        started = time.perf_counter()
+        rows.append(check_scenario(name, encode(samples, rate), bursts, silences, failures))
+        rows[-1]["check_s"] = round(time.perf_counter() - started, 2)
+    check_resampling(failures)
+
+    print(f"{'scenario':<32} {'MB':>14} {'seconds':>14} {'tokens':>14} {'spans':>6} {'prep s':>7}")
+    for row in rows:
+        print(
+            f"{row['name']:<32} {row['original_mb']:>6.1f} -> {row['sent_mb']:<5.1f} "
+            f"{row['original_s']:>6.0f} -> {row['sent_s']:<5.0f} "
+            f"{row['original_tokens']:>6} -> {row['sent_tokens']:<5} {row['kept_spans']:>6} {row['preprocess_s']:>7.2f}"
+        )
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll checks passed.")
+
+
+if __name__ == "__main__":
+    main()
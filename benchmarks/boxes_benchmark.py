@@ -0,0 +1,75 @@
+"""
+Compares the per-dict box functions with the array-backed BoxArray pipeline.
+
+"legacy" is the original parse_bounding_boxes + per-box convert_normalized_to_pixel.
+"array" is parse_box_array + BoxArray.to_pixel, with and without the final
+to_dicts() conversion done at the UI edge.
+
+Usage:
+    python -m benchmarks.boxes_benchmark [--counts 10 1000 100000]
+"""
+import argparse
+import json
+import random
+import time
+
+from utils.boxes import parse_box_array
+from utils.util import parse_bounding_boxes
+
+LABELS = ["car", "person", "golden retriever", "bottle", "traffic light"]
+
+
+def _legacy_convert(bounding_boxes, image_width, image_height):
+    converted_boxes = []
+    for box in bounding_boxes:
+        xmin = int((box['xmin'] / 1000) * image_width)
+        ymin = int((box['ymin'] / 1000) * image_height)
+        xmax = int((box['xmax'] / 1000) * image_width)
+        ymax = int((box['ymax'] / 1000) * image_height)
+        if not (0 <= xmin < xmax <= image_width) or not (0 <= ymin < ymax <= image_height):
+            continue
+        converted_boxes.append({'name': box['name'], 'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax})
+    return converted_boxes
+
+
+def synthetic_response(count: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(count):
+        x, y = rng.uniform(0, 900), rng.uniform(0, 900)
+        boxes.append({
+            "name": rng.choice(LABELS),
+            "ymin": round(y, 1), "xmin": round(x, 1),
+            "ymax": round(y + rng.uniform(5, 100), 1), "xmax": round(x + rng.uniform(5, 100), 1),
+        })
+    return json.dumps(boxes)
+
+
+def _best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    width, height = 4000, 3000
+
+    print(f"{'boxes':>7} {'legacy ms':>10} {'array ms':>9} {'array+dicts ms':>15} {'same result':>12}")
+    for count in args.counts:
+        text = synthetic_response(count)
+        legacy = _best_of(lambda: _legacy_convert(parse_bounding_boxes(text), width, height), args.repeats)
+        array = _best_of(lambda: parse_box_array(text).to_pixel(width, height), args.repeats)
+        array_dicts = _best_of(lambda: parse_box_array(text).to_pixel(width, height).to_dicts(), args.repeats)
+        same = _legacy_convert(parse_bounding_boxes(text), width, height) == parse_box_array(text).to_pixel(width, height).to_dicts()
+        print(f"{count:>7} {legacy * 1000:>10.2f} {array * 1000:>9.2f} {array_dicts * 1000:>15.2f} {str(same):>12}")
+
+
+if __name__ == "__main__":
+    main()
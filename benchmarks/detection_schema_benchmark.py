@@ -0,0 +1,169 @@
+"""
+Compares schema-enforced detection with the prompt-only mode on recorded replies.
+
+"prompt" is a plain model with the long format-describing prompt; "schema" is
+load_detection_model() with the short prompt. Both go through detect_boxes,
+including its repair step, with the result cache off.
+
+--record runs every image/object pair against the live API (API_KEY and MODEL
+from .env) and saves each model reply, its output token count, finish reason
+and latency under --fixtures. Without --record the saved replies are replayed
+through the same pipeline, so parsing, repairs and failures are reproduced
+exactly and latency is the recorded model time. A replay that makes more
+or fewer model calls than were recorded no longer matches its fixture, and
+makes the run exit 1. No fixtures ship with the repo; record a set first
+(tests/test_detection_schema.py replays synthetic ones).
+
+Usage:
+    python -m benchmarks.detection_schema_benchmark --record --images photos/*.jpg --objects dog car
+    python -m benchmarks.detection_schema_benchmark [--fixtures benchmarks/fixtures/detection]
+"""
+import argparse
+import json
+import pathlib
+import statistics
+import sys
+import time
+import types
+from typing import Dict, List
+
+from PIL import Image
+
+from utils.detection import DetectionStats, detect_boxes
+from utils.model import load_detection_model, load_model
+
+MODES = {
+    "prompt": (False, lambda: load_model(type=None, schemaType=None)),
+    "schema": (True, load_detection_model),
+}
+DEFAULT_FIXTURES = "benchmarks/fixtures/detection"
+
+
+class RecordingModel:
+    """Forwards generate_content to a real model and keeps what each call returned."""
+
+    def __init__(self, model):
+        self.model = model
+        self.replies = []
+
+    def generate_content(self, contents):
+        started = time.perf_counter()
+        response = self.model.generate_content(contents)
+        seconds = time.perf_counter() - started
+        try:
+            text = response.text
+        except ValueError:
+            text = ""
+        usage = getattr(response, "usage_metadata", None)
+        candidates = getattr(response, "candidates", None) or []
+        finish_reason = candidates[0].finish_reason.name if candidates else None
+        self.replies.append({
+            "text": text,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+            "finish_reason": finish_reason,
+            "seconds": seconds,
+        })
+        return response
+
+
+class ReplayModel:
+    """Returns recorded replies in order, shaped like SDK responses."""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.calls = 0
+
+    def generate_content(self, contents):
+        self.calls += 1
+        if self.calls > len(self.replies):
+            raise RuntimeError("The pipeline made more model calls than were recorded.")
+        reply = self.replies[self.calls - 1]
+        return types.SimpleNamespace(
+            text=reply["text"],
+            usage_metadata=types.SimpleNamespace(candidates_token_count=reply["output_tokens"]),
+            candidates=[types.SimpleNamespace(finish_reason=types.SimpleNamespace(name=reply["finish_reason"]))],
+        )
+
+
+def _fixture_path(fixtures: pathlib.Path, mode: str, image_path: str, object_name: str) -> pathlib.Path:
+    return fixtures / mode / f"{pathlib.Path(image_path).stem}__{object_name.replace(' ', '_')}.json"
+
+
+def record(args, fixtures: pathlib.Path):
+    for mode, (structured, load) in MODES.items():
+        model = load()
+        for image_path in args.images:
+            image = Image.open(image_path)
+            for object_name in args.objects:
+                recorder = RecordingModel(model)
+                detect_boxes(image, object_name, recorder, args.max_side, use_cache=False, structured=structured)
+                path = _fixture_path(fixtures, mode, image_path, object_name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(json.dumps({
+                    "image": str(image_path),
+                    "object": object_name,
+                    "max_side": args.max_side,
+                    "replies": recorder.replies,
+                }, indent=2))
+                print(f"recorded {path} ({len(recorder.replies)} calls)")
+
+
+def replay(fixtures: pathlib.Path, failures: List[str]) -> Dict[str, DetectionStats]:
+    """Replays every fixture per mode, prints the comparison and returns each mode's stats."""
+    results = {}
+    print(f"{'mode':>7} {'requests':>9} {'failed %':>9} {'repaired':>9} {'salvaged':>9} "
+          f"{'calls/req':>10} {'out tok/req':>12} {'p50 s':>7} {'p95 s':>7}")
+    for mode, (structured, _) in MODES.items():
+        paths = sorted((fixtures / mode).glob("*.json"))
+        if not paths:
+            continue
+        stats = DetectionStats()
+        latencies = []
+        for path in paths:
+            fixture = json.loads(path.read_text())
+            image = Image.open(fixture["image"])
+            model = ReplayModel(fixture["replies"])
+            detect_boxes(
+                image, fixture["object"], model, fixture["max_side"], use_cache=False, structured=structured, stats=stats
+            )
+            if model.calls != len(fixture["replies"]):
+                failures.append(f"{path}: replay made {model.calls} model calls, {len(fixture['replies'])} recorded")
+            latencies.append(sum(reply["seconds"] for reply in fixture["replies"][:model.calls]))
+        results[mode] = stats
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(
+            f"{mode:>7} {stats.requests:>9} {100 * stats.failed / stats.requests:>9.1f} {stats.repaired:>9} "
+            f"{stats.salvaged:>9} {stats.model_calls / stats.requests:>10.2f} "
+            f"{stats.output_tokens / stats.requests:>12.1f} {statistics.median(latencies):>7.2f} {p95:>7.2f}"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="Call the live API and save the replies.")
+    parser.add_argument("--images", nargs="+", default=[])
+    parser.add_argument("--objects", nargs="+", default=["objects"])
+    parser.add_argument("--max-side", type=int, default=1536)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    args = parser.parse_args()
+    fixtures = pathlib.Path(args.fixtures)
+
+    if args.record:
+        if not args.images:
+            parser.error("--record needs --images")
+        record(args, fixtures)
+    elif not any(fixtures.glob("*/*.json")):
+        sys.exit(f"No fixtures under {fixtures}; record some first with --record.")
+    failures: List[str] = []
+    replay(fixtures, failures)
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll checks passed.")
+
+
+if __name__ == "__main__":
+    main()
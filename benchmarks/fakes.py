@@ -0,0 +1,84 @@
+"""In-process fakes of the File API used by the benchmarks."""
+import datetime
+import itertools
+import random
+import threading
+import time
+import types
+
+from google.api_core import exceptions as api_exceptions
+
+
+class FakeFileAPI:
+    """
+    Minimal File API: uploaded files stay PROCESSING for a fixed time, then turn ACTIVE.
+
+    Every get_file call is counted so benchmarks can report request volume.
+    Each call (and each listed page) sleeps for latency; delete_file fails
+    with ServiceUnavailable at transient_failure_rate.
+    """
+
+    def __init__(self, latency: float = 0.0, transient_failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.transient_failure_rate = transient_failure_rate
+        self.get_file_calls = 0
+        self.delete_calls = 0
+        self.list_pages = 0
+        self._rng = random.Random(seed)
+        self._files = {}
+        self._ready_at = {}
+        self._created_at = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def upload(self, size_bytes: int, processing_seconds: float, display_name: str = "bench", age_hours: float = 0.0):
+        name = f"files/fake-{next(self._ids)}"
+        with self._lock:
+            self._ready_at[name] = time.monotonic() + processing_seconds
+            self._files[name] = display_name
+            self._created_at[name] = time.time() - age_hours * 3600
+        return self._snapshot(name, size_bytes)
+
+    def ready_at(self, name: str) -> float:
+        return self._ready_at[name]
+
+    def get_file(self, name: str):
+        time.sleep(self.latency)
+        with self._lock:
+            self.get_file_calls += 1
+            if name not in self._files:
+                raise KeyError(name)
+        return self._snapshot(name)
+
+    def list_files(self, page_size: int = 100):
+        names = list(self._files)
+        for start in range(0, len(names), page_size):
+            time.sleep(self.latency)
+            self.list_pages += 1
+            for name in names[start:start + page_size]:
+                if name in self._files:
+                    yield self._snapshot(name)
+
+    def delete_file(self, name: str):
+        time.sleep(self.latency)
+        with self._lock:
+            self.delete_calls += 1
+            if self._rng.random() < self.transient_failure_rate:
+                raise api_exceptions.ServiceUnavailable("fake overload")
+            if name not in self._files:
+                raise api_exceptions.NotFound(name)
+            self._files.pop(name)
+            self._ready_at.pop(name, None)
+
+    def __len__(self):
+        return len(self._files)
+
+    def _snapshot(self, name: str, size_bytes: int = 0):
+        state = "ACTIVE" if time.monotonic() >= self._ready_at[name] else "PROCESSING"
+        return types.SimpleNamespace(
+            name=name,
+            display_name=self._files[name],
+            size_bytes=size_bytes,
+            create_time=datetime.datetime.fromtimestamp(self._created_at[name], datetime.timezone.utc),
+            state=types.SimpleNamespace(name=state),
+        )
@@ -0,0 +1,94 @@
+"""
+Measures the local file index against scanning the File API.
+
+Runs against benchmarks.fakes.FakeFileAPI, where every listed page and
+every delete costs --latency-ms. The index lives in a temporary directory.
+
+- "listing": one filtered page from a remote scan (iter_files) vs. the same
+  page from FileIndex.query, and a full count of matching files both ways.
+- "sync": a first full sync, then a re-sync after --churn of the files were
+  deleted remotely and as many were uploaded elsewhere.
+- "gc": recent uploads of a live session, recent uploads of a session that
+  never sent a heartbeat and old uploads of the live session, then
+  collect_garbage() with a 0.1 s idle limit; "expected" is what should have
+  been deleted.
+
+Usage:
+    python -m benchmarks.file_index_benchmark [--files 1000] [--latency-ms 40] [--churn 0.05]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeFileAPI
+from utils.file_index import FileIndex
+from utils.file_ops import iter_files, take_page
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--churn", type=float, default=0.05)
+    args = parser.parse_args()
+
+    api = FakeFileAPI(latency=args.latency_ms / 1000)
+    for i in range(args.files):
+        api.upload(1024, 0.0, display_name=f"{'video' if i % 3 == 0 else 'audio'}-{i:05d}", age_hours=(i % 96) / 2)
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = FileIndex(os.path.join(directory, "index.db"), list_files=api.list_files, delete_file=api.delete_file)
+
+        print(f"{'sync':>22} {'seconds':>8} {'pages':>6} {'added':>6} {'updated':>8} {'removed':>8}")
+        api.list_pages = 0
+        seconds, counts = _timed(index.sync)
+        print(f"{'first sync':>22} {seconds:>8.2f} {api.list_pages:>6} {counts['added']:>6} {counts['updated']:>8} {counts['removed']:>8}")
+        churn = int(args.files * args.churn)
+        for f in take_page(iter_files(list_files=api.list_files), churn):
+            api.delete_file(f.name)
+        for i in range(churn):
+            api.upload(1024, 0.0, display_name=f"external-{i}")
+        api.list_pages = 0
+        seconds, counts = _timed(index.sync)
+        print(f"{'re-sync after churn':>22} {seconds:>8.2f} {api.list_pages:>6} {counts['added']:>6} {counts['updated']:>8} {counts['removed']:>8}")
+
+        print()
+        print(f"{'listing':>22} {'seconds':>8} {'pages':>6} {'files':>6}")
+        filters = ("video", ["ACTIVE"], 24)
+        api.list_pages = 0
+        seconds, page = _timed(lambda: take_page(iter_files(*filters, list_files=api.list_files), 25))
+        print(f"{'remote first page':>22} {seconds:>8.3f} {api.list_pages:>6} {len(page):>6}")
+        seconds, rows = _timed(lambda: index.query(*filters, limit=25))
+        print(f"{'index first page':>22} {seconds:>8.3f} {0:>6} {len(rows):>6}")
+        api.list_pages = 0
+        seconds, matching = _timed(lambda: sum(1 for _ in iter_files(*filters, list_files=api.list_files)))
+        print(f"{'remote count':>22} {seconds:>8.3f} {api.list_pages:>6} {matching:>6}")
+        seconds, matching = _timed(lambda: index.count(*filters))
+        print(f"{'index count':>22} {seconds:>8.3f} {0:>6} {matching:>6}")
+
+        print()
+        expected = set()
+        for session, age_hours, collect in (("live", 1, False), ("gone", 1, True), ("live", 30, True)):
+            for i in range(5):
+                remote = api.upload(1024, 0.0, display_name=f"{session}-{age_hours}h-{i}", age_hours=age_hours)
+                index.record_upload(remote, None, 1024, "video/mp4", session)
+                if collect:
+                    expected.add(remote.name)
+        # Let the uploads go idle, then only the live session checks in.
+        time.sleep(0.2)
+        index.heartbeat("live")
+        seconds, report = _timed(lambda: index.collect_garbage(max_age_hours=24, idle_minutes=0.1 / 60))
+        deleted = set(report.deleted)
+        print(f"{'gc':>22} {'seconds':>8} {'deleted':>8} {'expected':>9} {'correct':>8}")
+        print(f"{'collect_garbage':>22} {seconds:>8.2f} {len(deleted):>8} {len(expected):>9} {str(deleted == expected):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compares File API bulk deletion and listing against the original tab code.
+
+Everything runs against benchmarks.fakes.FakeFileAPI, where every call and
+every listed page costs --latency-ms and deletes fail transiently at
+--failure-rate.
+
+"legacy delete" is the original "Confirm Delete All": list, then get_file and
+delete for each file, one at a time, with no retry. "bulk delete xN" is
+utils.file_ops.delete_files on N workers. "left" is how many files survived.
+
+For listing, "full list" materializes every page like the original "List
+Files", while "first page" takes one filtered page from iter_files().
+
+The run exits 1 when a bulk delete leaves files behind or reports failures,
+or when the first page is short, holds files outside the filter or reads
+every page.
+
+Usage:
+    python -m benchmarks.file_ops_benchmark [--files 300] [--latency-ms 40] [--failure-rate 0.05]
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.fakes import FakeFileAPI
+from utils.file_ops import delete_files, iter_files, take_page
+
+
+def _make_api(args) -> FakeFileAPI:
+    api = FakeFileAPI(latency=args.latency_ms / 1000, transient_failure_rate=args.failure_rate)
+    for i in range(args.files):
+        prefix = "video" if i % 3 == 0 else "audio"
+        api.upload(1024, 0.0, display_name=f"{prefix}-{i:04d}.mp4", age_hours=i % 72)
+    return api
+
+
+def _age_hours(file) -> float:
+    return (time.time() - file.create_time.timestamp()) / 3600
+
+
+def _legacy_delete(api: FakeFileAPI):
+    failed = 0
+    for f in api.list_files():
+        try:
+            api.get_file(f.name)
+            api.delete_file(f.name)
+        except Exception:
+            # The original loop aborted on the first error; count and carry on so the runs are comparable.
+            failed += 1
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'mode':>16} {'seconds':>8} {'API calls':>10} {'retries':>8} {'failed':>7} {'left':>5}")
+    api = _make_api(args)
+    start = time.perf_counter()
+    failed = _legacy_delete(api)
+    elapsed = time.perf_counter() - start
+    calls = api.list_pages + api.get_file_calls + api.delete_calls
+    print(f"{'legacy delete':>16} {elapsed:>8.2f} {calls:>10} {0:>8} {failed:>7} {len(api):>5}")
+
+    for workers in args.workers:
+        api = _make_api(args)
+        start = time.perf_counter()
+        names = (f.name for f in iter_files(list_files=api.list_files))
+        report = delete_files(names, max_workers=workers, base_delay=0.05, delete_file=api.delete_file)
+        elapsed = time.perf_counter() - start
+        calls = api.list_pages + api.get_file_calls + api.delete_calls
+        print(
+            f"{'bulk delete x%d' % workers:>16} {elapsed:>8.2f} {calls:>10} {report.retries:>8} "
+            f"{len(report.failed):>7} {len(api):>5}"
+        )
+        if len(api) or report.failed:
+            failures.append(f"bulk delete x{workers}: {len(api)} left, {len(report.failed)} failed")
+
+    print()
+    print(f"{'listing':>16} {'seconds':>8} {'pages':>6} {'files':>6}")
+    api = _make_api(args)
+    start = time.perf_counter()
+    everything = list(api.list_files())
+    print(f"{'full list':>16} {time.perf_counter() - start:>8.2f} {api.list_pages:>6} {len(everything):>6}")
+    api.list_pages = 0
+    start = time.perf_counter()
+    page = take_page(iter_files("video", states=["ACTIVE"], min_age_hours=24, list_files=api.list_files), 25)
+    print(f"{'first page':>16} {time.perf_counter() - start:>8.2f} {api.list_pages:>6} {len(page):>6}")
+    expected = min(25, sum(1 for f in everything if f.display_name.startswith("video") and _age_hours(f) >= 24))
+    if len(page) != expected or not all(f.display_name.startswith("video") and _age_hours(f) >= 24 for f in page):
+        failures.append(f"first page: {len(page)} files, expected {expected} old video files")
+    if args.files > 100 and api.list_pages * 100 >= args.files:
+        failures.append(f"first page: read all {api.list_pages} pages")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll checks passed.")
+
+
+if __name__ == "__main__":
+    main()
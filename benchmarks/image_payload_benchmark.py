@@ -0,0 +1,71 @@
+"""
+Compares the detection payload of the original path with the preprocessed one.
+
+"original" mirrors what the SDK does with a PIL image: a full-resolution JPEG
+encode. "preprocessed" uses utils.image_preprocess at the given max side, both
+on first use and on a repeated query served from the payload cache. Latency is
+encode time plus transfer time at --uplink-mbps; model time is excluded since
+it does not depend on the payload path.
+
+Usage:
+    python -m benchmarks.image_payload_benchmark [--megapixels 1 12 48] [--uplink-mbps 20]
+"""
+import argparse
+import io
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from utils.image_preprocess import DEFAULT_MAX_SIDE, prepare_image
+
+
+def synthetic_photo(megapixels: float) -> Image.Image:
+    """Noise plus shapes, blurred, which compresses roughly like a real photo."""
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    image = Image.effect_noise((width, height), 40).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for i in range(40):
+        x, y = (i * 97) % width, (i * 61) % height
+        draw.ellipse([x, y, x + width // 8, y + height // 8], fill=(i * 6 % 255, 120, 200 - i * 4 % 200))
+    return image.filter(ImageFilter.GaussianBlur(2))
+
+
+def _original_payload(image: Image.Image) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format="JPEG")
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 12, 48])
+    parser.add_argument("--max-side", type=int, default=DEFAULT_MAX_SIDE)
+    parser.add_argument("--uplink-mbps", type=float, default=20.0)
+    args = parser.parse_args()
+
+    def transfer_seconds(size: int) -> float:
+        return size * 8 / (args.uplink_mbps * 1e6)
+
+    print(f"{'MP':>5} {'path':<14} {'payload KB':>11} {'encode ms':>10} {'latency ms':>11}")
+    for megapixels in args.megapixels:
+        image = synthetic_photo(megapixels)
+        digest = f"bench-{megapixels}-{time.time()}"
+
+        start = time.perf_counter()
+        data = _original_payload(image)
+        encode = time.perf_counter() - start
+        rows = [("original", len(data), encode)]
+
+        for label in ("preprocessed", "cached"):
+            start = time.perf_counter()
+            encoded = prepare_image(image, digest, args.max_side)
+            rows.append((label, len(encoded.data), time.perf_counter() - start))
+
+        for label, size, encode in rows:
+            latency = encode + transfer_seconds(size)
+            print(f"{megapixels:>5g} {label:<14} {size / 1024:>11,.0f} {encode * 1000:>10.1f} {latency * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Measures the cold import time of the app's entry points and core modules.
+
+Each target is imported in a fresh interpreter under `python -X importtime`,
+--runs times after one warm-up run that writes the bytecode caches. The
+report lists, per target, the median time to import it, the median
+interpreter wall time (startup included), the heavy third-party packages
+it loaded and the packages that cost the most on their own.
+
+Heavy packages are the ones a headless worker or a first page render
+should only pay for when it needs them: the Gemini SDK, Streamlit, NumPy,
+PIL and OpenCV.
+
+Baselines are JSON files under benchmarks/baselines/. Save one with
+--save-baseline NAME and compare later runs with --compare NAME; imports
+slower than --threshold are flagged and make the run exit 1.
+
+Usage:
+    python -m benchmarks.import_benchmark [--targets app cli utils.util] [--runs 5] [--top 3]
+        [--save-baseline NAME] [--compare NAME]
+"""
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+TARGETS = ("app", "cli", "utils.util", "utils.pipeline", "utils.long_audio", "utils.detection")
+HEAVY = ("google.generativeai", "streamlit", "numpy", "PIL", "cv2")
+BASELINE_DIR = pathlib.Path(__file__).parent / "baselines"
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_once(target: str) -> Tuple[float, float, List[Tuple[str, int, int]]]:
+    """Imports target in a fresh interpreter; returns (import seconds, wall seconds, importtime rows)."""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {target}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode:
+        raise RuntimeError(f"import {target} failed:\n{completed.stderr[-2000:]}")
+    rows = _parse_importtime(completed.stderr)
+    target_us = next(cumulative for name, _, cumulative in rows if name == target)
+    return target_us / 1e6, wall, rows
+
+
+def _top_packages(rows: List[Tuple[str, int, int]], top: int, exclude: str) -> List[Tuple[str, float]]:
+    """The top-level packages with the most self time, outside the target's own package."""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        if package != exclude.split(".")[0]:
+            totals[package] += self_us
+    return [(package, us / 1e6) for package, us in sorted(totals.items(), key=lambda item: -item[1])[:top]]
+
+
+def measure(target: str, runs: int, top: int) -> dict:
+    import_once(target)
+    samples = [import_once(target) for _ in range(runs)]
+    loaded = {name for name, _, _ in samples[-1][2]}
+    return {
+        "import_s": statistics.median(s[0] for s in samples),
+        "wall_s": statistics.median(s[1] for s in samples),
+        "heavy": [package for package in HEAVY if package in loaded],
+        "top": _top_packages(samples[-1][2], top, target),
+    }
+
+
+def _compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Prints how each import moved against the baseline and returns the number of regressions."""
+    regressions = 0
+    print(f"\nComparison with baseline (threshold {threshold:.0%}):")
+    print(f"{'target':<20}{'baseline':>10}{'current':>10}{'change':>9}")
+    for target, result in current.items():
+        before = baseline.get(target)
+        if before is None:
+            continue
+        change = result["import_s"] / before["import_s"] - 1 if before["import_s"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{target:<20}{before['import_s']:>10.3f}{result['import_s']:>10.3f}{change:>+9.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=3, help="Most expensive packages listed per target.")
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown flagged as a regression.")
+    args = parser.parse_args()
+
+    results = {target: measure(target, args.runs, args.top) for target in args.targets}
+
+    print(f"{'target':<20}{'import s':>10}{'wall s':>9}  {'heavy packages loaded':<44}top packages (self s)")
+    for target, result in results.items():
+        heavy = ", ".join(result["heavy"]) or "-"
+        top = ", ".join(f"{package} {seconds:.3f}" for package, seconds in result["top"])
+        print(f"{target:<20}{result['import_s']:>10.3f}{result['wall_s']:>9.3f}  {heavy:<44}{top}")
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps({"runs": args.runs, "results": results}, indent=2))
+        print(f"\nSaved baseline to {path}")
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        if _compare(baseline["results"], results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
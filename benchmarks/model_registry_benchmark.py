@@ -0,0 +1,68 @@
+"""
+Measures the per-rerun cost of obtaining a model in a tab function.
+
+"before" replays the original load_model: load_dotenv(), genai.configure() and a
+new GenerativeModel on every call. "after" goes through the registry in
+utils.model. No network requests are made by either path.
+
+Every model the app uses, the detection model included, is built once
+first, so a response schema the SDK rejects fails the run here.
+
+Usage:
+    python -m benchmarks.model_registry_benchmark [--reruns 1000]
+"""
+import argparse
+import os
+import time
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+from google.generativeai.types import GenerationConfig
+
+from utils import model as model_registry
+from utils.schemas import VideoAnalysis
+
+
+def _legacy_load_model(type, schemaType):
+    load_dotenv()
+    genai.configure(api_key=os.getenv('API_KEY'))
+    if type is not None and schemaType is not None:
+        generation_config = GenerationConfig(
+            temperature=0.7, top_p=0.9, top_k=40, candidate_count=1, max_output_tokens=8192,
+            response_mime_type="application/json", response_schema=schemaType,
+        )
+    else:
+        generation_config = GenerationConfig(
+            temperature=0.9, top_p=1.0, top_k=32, candidate_count=1, max_output_tokens=8192,
+        )
+    return genai.GenerativeModel(model_name=os.getenv('MODEL'), generation_config=generation_config)
+
+
+def _time_per_call(load, reruns: int) -> float:
+    start = time.perf_counter()
+    for _ in range(reruns):
+        load(type="video", schemaType=VideoAnalysis)
+        load(type=None, schemaType=None)
+    return (time.perf_counter() - start) / (reruns * 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=1000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("API_KEY", "benchmark")
+    os.environ.setdefault("MODEL", "gemini-1.5-flash-latest")
+
+    model_registry.load_detection_model()
+    model_registry.reset_registry()
+
+    before = _time_per_call(_legacy_load_model, args.reruns)
+    model_registry.reset_registry()
+    after = _time_per_call(model_registry.load_model, args.reruns)
+    print(f"before: {before * 1e6:10.1f} us per load_model call")
+    print(f"after:  {after * 1e6:10.1f} us per load_model call ({before / after:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
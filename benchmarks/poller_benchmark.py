@@ -0,0 +1,111 @@
+"""
+Compares the legacy one-second polling loop with the shared FilePoller.
+
+All run against benchmarks.fakes.FakeFileAPI with the same set of files and
+report get_file call counts and the delay between a file becoming ACTIVE and
+the waiter noticing it. "interactive" is the shared poller with the backoff
+cap poll_file_processing uses outside batch work. The run exits 1 unless
+every waiter saw its file ACTIVE, the shared poller made fewer get_file
+calls than the legacy loop, and no interactive wait lagged by more than
+the jittered cap. Times are scaled down by --time-scale so a run takes
+seconds rather than minutes.
+
+Usage:
+    python -m benchmarks.poller_benchmark [--files 20] [--time-scale 0.1]
+"""
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+
+from benchmarks.fakes import FakeFileAPI
+from utils.poller import INTERACTIVE_MAX_DELAY, FilePoller
+
+
+def _make_files(api: FakeFileAPI, count: int, scale: float, seed: int):
+    rng = random.Random(seed)
+    files = []
+    for _ in range(count):
+        size_mb = rng.choice([20, 200, 800, 2000])
+        # Processing time grows with size, with some noise.
+        processing = (5 + size_mb * 0.03) * rng.uniform(0.7, 1.3) * scale
+        files.append(api.upload(size_mb * 1024 * 1024, processing))
+    return files
+
+
+def _legacy(api: FakeFileAPI, files, scale: float):
+    lags, states = [], []
+
+    def wait(uploaded_file):
+        while uploaded_file.state.name == "PROCESSING":
+            time.sleep(1 * scale)
+            uploaded_file = api.get_file(uploaded_file.name)
+        lags.append(time.monotonic() - api.ready_at(uploaded_file.name))
+        states.append(uploaded_file.state.name)
+
+    # The original code waits in each session's own script thread.
+    threads = [threading.Thread(target=wait, args=(f,)) for f in files]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return lags, states
+
+
+def _shared(api: FakeFileAPI, files, scale: float, max_delay=None):
+    poller = FilePoller(get_file=api.get_file, base_delay=1 * scale, max_delay=10 * scale)
+    lags = []
+
+    def record(future):
+        lags.append(time.monotonic() - api.ready_at(future.result().name))
+
+    futures = [poller.submit(f, max_delay=max_delay) for f in files]
+    for future in futures:
+        future.add_done_callback(record)
+    states = [future.result().state.name for future in futures]
+    return lags, states
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failures = []
+    calls = {}
+    print(f"{'poller':<12} {'get_file calls':>15} {'mean lag s':>11} {'max lag s':>10}")
+    def interactive(api, files, scale):
+        return _shared(api, files, scale, max_delay=INTERACTIVE_MAX_DELAY * scale)
+
+    for label, runner in (("legacy", _legacy), ("shared", _shared), ("interactive", interactive)):
+        api = FakeFileAPI()
+        files = _make_files(api, args.files, args.time_scale, args.seed)
+        lags, states = runner(api, files, args.time_scale)
+        # Report lag in unscaled seconds so numbers read like production ones.
+        mean_lag = statistics.mean(lags) / args.time_scale
+        max_lag = max(lags) / args.time_scale
+        calls[label] = api.get_file_calls
+        print(f"{label:<12} {api.get_file_calls:>15} {mean_lag:>11.2f} {max_lag:>10.2f}")
+        if states.count("ACTIVE") != len(files):
+            failures.append(f"{label}: {states.count('ACTIVE')}/{len(files)} waiters saw ACTIVE")
+        # The jitter stretches a capped delay by up to a quarter; allow one more second for scheduling.
+        if label == "interactive" and max_lag > INTERACTIVE_MAX_DELAY * 1.25 + 1:
+            failures.append(f"interactive: max lag {max_lag:.2f}s exceeds the {INTERACTIVE_MAX_DELAY}s cap")
+    for label in ("shared", "interactive"):
+        if calls[label] >= calls["legacy"]:
+            failures.append(f"{label}: {calls[label]} get_file calls, not fewer than legacy's {calls['legacy']}")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll checks passed.")
+
+
+if __name__ == "__main__":
+    main()
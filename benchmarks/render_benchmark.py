@@ -0,0 +1,113 @@
+"""
+Measures annotation throughput of the original drawing code and utils.render.
+
+"legacy" is the original draw_bounding_boxes: a failed arial.ttf lookup per
+call, then drawing on a full-resolution copy. "pil full" draws with the
+cached, scaled renderer at full resolution, "pil preview" on a display-sized
+preview, and "opencv preview"/"opencv full" use the OpenCV batch backend.
+Batch modes run on --workers threads. "output MP" is the size of the image
+handed to the browser; "+encode s" adds the JPEG encode st.image does before
+sending it, and "sent KB" is the encoded size per image.
+
+Usage:
+    python -m benchmarks.render_benchmark [--images 16] [--megapixels 12] [--boxes 50] [--workers 4]
+"""
+import argparse
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.render import annotate_batch, draw_boxes, render_boxes
+
+LABELS = ["car", "person", "golden retriever", "bottle", "traffic light"]
+
+
+def _legacy_draw(image, bounding_boxes):
+    image = image.copy()
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("arial.ttf", 20)
+    except OSError:
+        font = ImageFont.load_default()
+    for box in bounding_boxes:
+        draw.rectangle([box['xmin'], box['ymin'], box['xmax'], box['ymax']], outline="red", width=1)
+        text_bbox = draw.textbbox((0, 0), box['name'], font=font)
+        text_width = text_bbox[2] - text_bbox[0]
+        text_height = text_bbox[3] - text_bbox[1]
+        text_x, text_y = box['xmin'], max(0, box['ymin'] - text_height - 2)
+        draw.rectangle([text_x - 2, text_y - 2, text_x + text_width + 2, text_y + text_height + 2], fill="yellow")
+        draw.text((text_x, text_y), box['name'], fill="black", font=font)
+    return image
+
+
+def _encode(image) -> int:
+    output = io.BytesIO()
+    image.save(output, format="JPEG")
+    return output.tell()
+
+
+def synthetic_boxes(width: int, height: int, count: int, rng: random.Random):
+    boxes = []
+    for _ in range(count):
+        x, y = rng.randrange(0, width - 200), rng.randrange(0, height - 200)
+        boxes.append({
+            "name": rng.choice(LABELS),
+            "xmin": x, "ymin": y,
+            "xmax": x + rng.randrange(20, 200), "ymax": y + rng.randrange(20, 200),
+        })
+    return boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--boxes", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    width = int((args.megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    base = Image.effect_noise((width, height), 40).convert("RGB")
+    images = [base.copy() for _ in range(args.images)]
+    boxes = [synthetic_boxes(width, height, args.boxes, rng) for _ in images]
+
+    def sequential(render):
+        return lambda: [render(image, image_boxes) for image, image_boxes in zip(images, boxes)]
+
+    def threaded(render):
+        def run():
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                return list(pool.map(render, images, boxes))
+        return run
+
+    modes = [
+        ("legacy", sequential(_legacy_draw)),
+        ("pil full", sequential(lambda image, image_boxes: draw_boxes(image.copy(), image_boxes))),
+        ("pil preview", sequential(render_boxes)),
+        ("pil preview x%d" % args.workers, threaded(render_boxes)),
+        ("opencv preview x%d" % args.workers, lambda: annotate_batch(images, boxes, max_workers=args.workers)),
+        ("opencv full x%d" % args.workers, lambda: annotate_batch(images, boxes, max_side=None, max_workers=args.workers)),
+    ]
+
+    print(f"{args.images} images of {width}x{height}, {args.boxes} boxes each")
+    print(f"{'mode':>20} {'seconds':>8} {'images/s':>9} {'output MP':>10} {'+encode s':>10} {'sent KB':>8}")
+    for name, run in modes:
+        start = time.perf_counter()
+        outputs = run()
+        elapsed = time.perf_counter() - start
+        sizes = [_encode(output) for output in outputs]
+        with_encode = time.perf_counter() - start
+        output_mp = outputs[0].width * outputs[0].height / 1e6
+        print(
+            f"{name:>20} {elapsed:>8.2f} {args.images / elapsed:>9.1f} {output_mp:>10.1f} "
+            f"{with_encode:>10.2f} {sum(sizes) / len(sizes) / 1024:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Times a rerun of the detection results view for growing box counts.
+
+"markdown" is the original view: a subheader plus five st.markdown calls and a
+separator per box. "table" is the current view: one annotated preview, a label
+filter, one st.dataframe and two download buttons. The boxes and annotated
+preview are built on the first run and kept in session state, as the app
+does, so the timed second run measures only the view. Runs go through
+Streamlit's AppTest harness, which serializes every element like a real
+session would; "elements" is how many were produced.
+
+Usage:
+    python -m benchmarks.results_view_benchmark [--counts 10 100 1000]
+"""
+import argparse
+import time
+
+from streamlit.testing.v1 import AppTest
+
+SETUP = """
+import random
+from PIL import Image
+from utils.boxes import BoxArray
+
+rng = random.Random(0)
+labels = ["car", "person", "golden retriever", "bottle", "traffic light"]
+boxes = []
+for _ in range({count}):
+    x, y = rng.randrange(0, 3800), rng.randrange(0, 2800)
+    boxes.append({{"name": rng.choice(labels), "xmin": x, "ymin": y, "xmax": x + 150, "ymax": y + 150}})
+image = Image.new("RGB", (4000, 3000), "gray")
+"""
+
+MARKDOWN_VIEW = SETUP + """
+import streamlit as st
+from utils.render import render_boxes
+
+if "annotated" not in st.session_state:
+    st.session_state.annotated = render_boxes(image, boxes)
+st.image(st.session_state.annotated, caption='Annotated Image', use_container_width=True)
+st.subheader("Bounding Box Coordinates")
+for idx, box in enumerate(boxes, start=1):
+    st.markdown(f"**{{idx}}. {{box['name'].capitalize()}}:**")
+    st.markdown(f"- ymin: {{box['ymin']}}")
+    st.markdown(f"- xmin: {{box['xmin']}}")
+    st.markdown(f"- ymax: {{box['ymax']}}")
+    st.markdown(f"- xmax: {{box['xmax']}}")
+    st.markdown("---")
+"""
+
+TABLE_VIEW = SETUP + """
+import inspect
+import textwrap
+
+import streamlit as st
+
+import app
+from utils.render import Annotator
+
+# Run the app's own results section rather than a copy of it.
+source = inspect.getsource(app.image_tab)
+start = source.index("    def detection_results_section")
+end = source.index("    st.header(")
+exec(textwrap.dedent(source[start:end]), app.__dict__)
+
+if "detection" not in st.session_state:
+    boxes = BoxArray.from_dicts(boxes)
+    annotator = Annotator(image)
+    annotator.add(boxes)
+    st.session_state.detection = {{"boxes": boxes, "image_size": image.size, "annotator": annotator}}
+app.detection_results_section(st.session_state.detection)
+"""
+
+
+def _count_elements(node) -> int:
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return sum(_count_elements(child) for child in children.values())
+
+
+def _time_run(script: str, repeats: int):
+    best = float("inf")
+    elements = 0
+    for _ in range(repeats):
+        test = AppTest.from_string(script, default_timeout=120)
+        test.run()
+        start = time.perf_counter()
+        test.run()
+        best = min(best, time.perf_counter() - start)
+        if test.exception:
+            raise RuntimeError(test.exception[0].message)
+        elements = _count_elements(test._tree)
+    return best, elements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'boxes':>6} {'view':>9} {'run s':>7} {'elements':>9}")
+    for count in args.counts:
+        for name, template in (("markdown", MARKDOWN_VIEW), ("table", TABLE_VIEW)):
+            seconds, elements = _time_run(template.format(count=count), args.repeats)
+            print(f"{count:>6} {name:>9} {seconds:>7.2f} {elements:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Load test of the shared request scheduler against a quota-enforcing simulated model.
+
+Interactive callers (image detection) and batch callers (video metadata)
+send requests to one simulated model whose requests-per-minute limit is
+--rpm-limit. Two runs are compared:
+
+  direct     every caller hits the model as the app did before the scheduler;
+             a 429 fails the request
+  scheduled  calls go through RequestScheduler with a quota just below the
+             service's, interactive calls ahead of batch ones
+
+The report lists, per priority, the requests that succeeded, the 429s that
+reached callers and p50/p95 latency, then the scheduler's own counters.
+A quota minute lasts 60 x --time-scale seconds, and simulated model
+latency shrinks with it; latencies are printed unscaled.
+
+Usage:
+    python -m benchmarks.scheduler_benchmark [--interactive 2] [--batch 6] [--requests 10]
+        [--rpm-limit 40] [--time-scale 0.05]
+"""
+import argparse
+import logging
+import os
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+os.environ.setdefault("GENAI_BACKEND", "simulated")
+
+from google.api_core import exceptions as api_exceptions  # noqa: E402
+
+from utils import simulated_genai  # noqa: E402
+from utils.scheduler import BATCH, INTERACTIVE, PRIORITY_NAMES, RequestScheduler, ScheduledModel  # noqa: E402
+
+PROMPTS = {
+    INTERACTIVE: "Detect every cat in the image and return bounding boxes.",
+    BATCH: "Analyze this video and return its title, summary and tags.",
+}
+# Fraction of the service quota the scheduler admits, leaving room for clock skew.
+QUOTA_HEADROOM = 0.9
+
+
+class _Results:
+    def __init__(self):
+        self.latencies: Dict[int, List[float]] = {INTERACTIVE: [], BATCH: []}
+        self.rejected = {INTERACTIVE: 0, BATCH: 0}
+        self._lock = threading.Lock()
+
+    def add(self, priority: int, latency: float, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.latencies[priority].append(latency)
+            else:
+                self.rejected[priority] += 1
+
+
+def _run(callers: Dict[int, int], requests: int, model_for) -> _Results:
+    results = _Results()
+
+    def caller(priority: int):
+        model = model_for(priority)
+        for _ in range(requests):
+            started = time.monotonic()
+            try:
+                model.generate_content(PROMPTS[priority])
+                results.add(priority, time.monotonic() - started, True)
+            except api_exceptions.TooManyRequests:
+                results.add(priority, time.monotonic() - started, False)
+
+    threads = [
+        threading.Thread(target=caller, args=(priority,))
+        for priority, count in callers.items()
+        for _ in range(count)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def _print_row(mode: str, results: _Results, priority: int, scale: float) -> None:
+    latencies = results.latencies[priority]
+    # Latencies are reported in unscaled seconds, i.e. as they would be against the real quota.
+    p50 = statistics.median(latencies) / scale if latencies else 0.0
+    p95 = _percentile(latencies, 0.95) / scale
+    print(
+        f"{mode:<10} {PRIORITY_NAMES[priority]:<12} {len(latencies):>4} {results.rejected[priority]:>10} "
+        f"{p50:>9.1f} {p95:>9.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interactive", type=int, default=2, help="Interactive (image) callers.")
+    parser.add_argument("--batch", type=int, default=6, help="Batch (video) callers.")
+    parser.add_argument("--requests", type=int, default=10, help="Requests per caller.")
+    parser.add_argument("--rpm-limit", type=float, default=40, help="Requests per minute the simulated model accepts.")
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Queue waits are recorded as metrics spans, which look up a Streamlit session that does not exist here.
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(lambda record: False)
+    simulated_genai.configure_simulation(
+        rpm_limit=args.rpm_limit, time_scale=args.time_scale, seed=args.seed,
+        generate_failure_rate=0.0, malformed_rate=0.0,
+    )
+    callers = {INTERACTIVE: args.interactive, BATCH: args.batch}
+    model = simulated_genai.GenerativeModel("gemini-simulated")
+    total = (args.interactive + args.batch) * args.requests
+    print(
+        f"{total} requests from {args.interactive} interactive and {args.batch} batch callers, "
+        f"quota {args.rpm_limit:g} RPM, time scale {args.time_scale}"
+    )
+    print(f"{'mode':<10} {'priority':<12} {'ok':>4} {'429 seen':>10} {'p50 s':>9} {'p95 s':>9}")
+
+    simulated_genai.reset()
+    direct = _run(callers, args.requests, lambda priority: model)
+    for priority in callers:
+        _print_row("direct", direct, priority, args.time_scale)
+
+    simulated_genai.reset()
+    period = 60 * args.time_scale
+    scheduler = RequestScheduler(
+        model_rpm=args.rpm_limit * QUOTA_HEADROOM, model_tpm=0, period=period,
+        base_delay=1.0 * args.time_scale, max_delay=60.0 * args.time_scale,
+    )
+    scheduled = _run(callers, args.requests, lambda priority: ScheduledModel(model, priority, scheduler))
+    for priority in callers:
+        _print_row("scheduled", scheduled, priority, args.time_scale)
+
+    row = scheduler.snapshot()[0]
+    print(
+        f"\nScheduler: {row['admitted']} admitted, {row['throttled']} throttled by the service, "
+        f"{row['retries']} retries, "
+        f"average queue wait {row['avg_wait_s'] / args.time_scale:.1f}s (unscaled)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+End-to-end benchmark suite running every app flow against the simulated Gemini backend.
+
+Each simulated session runs the selected flows in its own thread, so N
+sessions load the shared poller, caches, file index and model registry the
+way N browser tabs would. Flows:
+
+  video  batch metadata generation (upload -> processing -> structured JSON)
+  audio  long-audio transcription (segmenting, parallel uploads, stitching)
+  image  object detection, buffered and streamed
+  files  uploads followed by a filtered listing and a bulk delete
+
+Every upload and image is unique, so the caches are written but never hit.
+The report lists p50/p95 latency per flow, flow throughput and the
+tracemalloc peak. Service timings and failure rates come from SIM_*
+environment variables (see utils/simulated_genai.py); --time-scale
+shrinks every simulated delay, and the poller's intervals with it.
+
+Baselines are JSON files under benchmarks/baselines/. Save one with
+--save-baseline NAME and compare later runs with --compare NAME; latencies
+or throughput worse than --threshold are flagged and make the run exit 1.
+
+Usage:
+    python -m benchmarks.suite [--sessions 1 4 8] [--flows video audio image files]
+        [--iterations 2] [--time-scale 0.1] [--save-baseline NAME] [--compare NAME]
+"""
+import argparse
+import importlib
+import io
+import json
+import logging
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from typing import Callable, Dict, List
+
+FLOWS = ("video", "audio", "image", "files")
+BASELINE_DIR = pathlib.Path(__file__).parent / "baselines"
+
+SAMPLE_RATE = 16000
+VIDEO_FILES = 3
+VIDEO_MB = 2
+AUDIO_SECONDS = 90
+AUDIO_SEGMENT_SECONDS = 30
+AUDIO_OVERLAP_SECONDS = 5
+FILES_PER_SESSION = 6
+
+
+def _isolate(time_scale: float, seed: int) -> str:
+    """Points every cache at a scratch directory and selects the simulated backend; call before importing utils."""
+    scratch = tempfile.mkdtemp(prefix="gemini-suite-")
+    os.environ["GENAI_BACKEND"] = "simulated"
+    os.environ["RESULT_CACHE_PATH"] = os.path.join(scratch, "results.db")
+    os.environ["UPLOAD_CACHE_PATH"] = os.path.join(scratch, "uploads.db")
+    os.environ["FILE_INDEX_PATH"] = os.path.join(scratch, "file_index.db")
+    os.environ["FILE_GC_INTERVAL_SECONDS"] = "0"
+    os.environ["SIM_TIME_SCALE"] = str(time_scale)
+    os.environ["SIM_SEED"] = str(seed)
+    return scratch
+
+
+class _BenchUpload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile."""
+
+    def __init__(self, data: bytes, name: str, mime_type: str):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+        self.size = len(data)
+
+
+def _noise_wav(rng: random.Random, seconds: int) -> bytes:
+    output = io.BytesIO()
+    with wave.open(output, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(SAMPLE_RATE)
+        writer.writeframes(rng.randbytes(seconds * SAMPLE_RATE * 2))
+    return output.getvalue()
+
+
+def _noise_image(rng: random.Random):
+    from PIL import Image
+
+    return Image.frombytes("RGB", (1280, 960), rng.randbytes(1280 * 960 * 3))
+
+
+def video_flow(session_id: str, rng: random.Random) -> None:
+    from utils.model import load_model
+    from utils.pipeline import run_video_batch
+    from utils.schemas import VideoAnalysis
+
+    model = load_model(type="video", schemaType=VideoAnalysis)
+    files = [
+        _BenchUpload(rng.randbytes(VIDEO_MB * 1024 * 1024), f"{session_id}-{i}.mp4", "video/mp4")
+        for i in range(VIDEO_FILES)
+    ]
+    items = {}
+    for item in run_video_batch(files, model):
+        items[item.index] = item
+    failed = [item.error for item in items.values() if item.status != "done"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} video(s) failed: {failed[0]}")
+
+
+def audio_flow(session_id: str, rng: random.Random) -> None:
+    from utils.long_audio import transcribe_long_audio
+    from utils.model import load_model
+
+    lines = transcribe_long_audio(
+        load_model(type=None, schemaType=None),
+        _noise_wav(rng, AUDIO_SECONDS),
+        base_name=session_id,
+        segment_seconds=AUDIO_SEGMENT_SECONDS,
+        overlap_seconds=AUDIO_OVERLAP_SECONDS,
+    )
+    if not lines:
+        raise RuntimeError("Transcription failed.")
+
+
+def image_flow(session_id: str, rng: random.Random) -> None:
+    from utils.detection import detect_boxes, stream_detected_boxes
+    from utils.model import load_detection_model
+
+    model = load_detection_model()
+    if detect_boxes(_noise_image(rng), "dog", model) is None:
+        raise RuntimeError("Detection failed.")
+    if not list(stream_detected_boxes(_noise_image(rng), "dog", model)):
+        raise RuntimeError("Streamed detection returned nothing.")
+
+
+def files_flow(session_id: str, rng: random.Random) -> None:
+    from utils.file_index import get_file_index
+    from utils.file_ops import delete_files, iter_files
+    from utils.util import upload_file_to_gemini
+
+    for i in range(FILES_PER_SESSION):
+        upload = _BenchUpload(rng.randbytes(64 * 1024), f"{session_id}-doc-{i}.txt", "text/plain")
+        if upload_file_to_gemini(upload, session_id=session_id) is None:
+            raise RuntimeError("Upload failed.")
+    report = delete_files(file.name for file in iter_files(name_prefix=session_id))
+    if report.failed or len(report.deleted) < FILES_PER_SESSION:
+        raise RuntimeError(f"Deleted {len(report.deleted)} of {FILES_PER_SESSION} files.")
+    index = get_file_index()
+    for name in report.deleted:
+        index.remove(name)
+
+
+FLOW_FUNCTIONS: Dict[str, Callable[[str, random.Random], None]] = {
+    "video": video_flow,
+    "audio": audio_flow,
+    "image": image_flow,
+    "files": files_flow,
+}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_sessions(sessions: int, flows: List[str], iterations: int, seed: int) -> Dict[str, dict]:
+    """Runs the flows in `sessions` concurrent threads and returns per-flow statistics."""
+    latencies: Dict[str, List[float]] = {flow: [] for flow in flows}
+    errors: Dict[str, List[str]] = {flow: [] for flow in flows}
+    lock = threading.Lock()
+
+    def session(index: int):
+        session_id = f"bench-{sessions}-{index}"
+        rng = random.Random(seed * 1000 + sessions * 100 + index)
+        for _ in range(iterations):
+            for flow in flows:
+                started = time.perf_counter()
+                try:
+                    FLOW_FUNCTIONS[flow](session_id, rng)
+                except Exception as e:
+                    with lock:
+                        errors[flow].append(str(e))
+                    continue
+                with lock:
+                    latencies[flow].append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,), name=f"bench-session-{i}") for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results = {}
+    for flow in flows:
+        results[flow] = {
+            "runs": len(latencies[flow]),
+            "errors": len(errors[flow]),
+            "first_error": errors[flow][0] if errors[flow] else None,
+            "p50": _percentile(latencies[flow], 0.5),
+            "p95": _percentile(latencies[flow], 0.95),
+            "throughput": len(latencies[flow]) / wall,
+        }
+    results["_total"] = {
+        "wall": wall,
+        "throughput": sum(len(values) for values in latencies.values()) / wall,
+        "peak_mb": peak / (1024 * 1024),
+    }
+    return results
+
+
+def _warm_up() -> None:
+    """Loads every flow's modules, the SDK and the shared models, so the first timed flow does not pay for them."""
+    for module in ("utils.detection", "utils.file_ops", "utils.long_audio", "utils.pipeline"):
+        importlib.import_module(module)
+    from utils.model import load_detection_model, load_model
+    from utils.schemas import VideoAnalysis
+
+    load_model(type="video", schemaType=VideoAnalysis)
+    load_model(type=None, schemaType=None)
+    load_detection_model()
+
+
+def _print_report(sessions: int, results: Dict[str, dict]) -> None:
+    total = results["_total"]
+    print(f"\n{sessions} session(s): {total['wall']:.2f}s wall, "
+          f"{total['throughput']:.2f} flows/s, peak traced memory {total['peak_mb']:.1f} MB")
+    print(f"{'flow':<8}{'runs':>6}{'errors':>8}{'p50 s':>9}{'p95 s':>9}{'flows/s':>10}")
+    for flow, stats in results.items():
+        if flow == "_total":
+            continue
+        print(f"{flow:<8}{stats['runs']:>6}{stats['errors']:>8}{stats['p50']:>9.2f}"
+              f"{stats['p95']:>9.2f}{stats['throughput']:>10.2f}")
+        if stats["first_error"]:
+            print(f"         first error: {stats['first_error']}")
+
+
+def _compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Prints how each metric moved against the baseline and returns the number of regressions."""
+    regressions = 0
+    print(f"\nComparison with baseline (threshold {threshold:.0%}):")
+    print(f"{'sessions':<10}{'flow':<8}{'metric':<12}{'baseline':>10}{'current':>10}{'change':>9}")
+    for sessions, flows in current.items():
+        for flow, stats in flows.items():
+            before = baseline.get(sessions, {}).get(flow)
+            if before is None:
+                continue
+            # Latencies and memory regress upwards, throughput downwards.
+            for metric, higher_is_worse in (("p50", True), ("p95", True), ("throughput", False), ("peak_mb", True)):
+                if metric not in stats or not before.get(metric):
+                    continue
+                change = (stats[metric] - before[metric]) / before[metric]
+                regressed = change > threshold if higher_is_worse else change < -threshold
+                regressions += regressed
+                print(f"{sessions:<10}{flow:<8}{metric:<12}{before[metric]:>10.2f}{stats[metric]:>10.2f}"
+                      f"{change:>+9.0%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--flows", nargs="+", choices=FLOWS, default=list(FLOWS))
+    parser.add_argument("--iterations", type=int, default=2, help="Rounds of every flow per session.")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="Multiplier for every simulated delay.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative change flagged as a regression.")
+    args = parser.parse_args()
+
+    scratch = _isolate(args.time_scale, args.seed)
+
+    from utils import poller, scheduler
+
+    # Flows run outside a Streamlit script, so every st.* call would log a warning. Streamlit resets
+    # logger levels when it loads its config, so drop the records with a filter instead.
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(lambda record: False)
+    # The shared poller's intervals are tuned for real processing times; scale them with the simulation.
+    poller._poller = poller.FilePoller(base_delay=1.0 * args.time_scale, max_delay=10.0 * args.time_scale)
+    # Likewise the request scheduler's quota window and backoff.
+    scheduler.set_scheduler(scheduler.RequestScheduler(
+        period=60.0 * args.time_scale, base_delay=1.0 * args.time_scale, max_delay=60.0 * args.time_scale,
+    ))
+
+    _warm_up()
+    print(f"Simulated backend, time scale {args.time_scale}, caches in {scratch}")
+    report = {}
+    for sessions in args.sessions:
+        results = run_sessions(sessions, args.flows, args.iterations, args.seed)
+        _print_report(sessions, results)
+        report[str(sessions)] = results
+
+    summary = {
+        sessions: {
+            flow: {key: value for key, value in stats.items() if key != "first_error"}
+            for flow, stats in results.items()
+        }
+        for sessions, results in report.items()
+    }
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps({"time_scale": args.time_scale, "flows": args.flows, "results": summary}, indent=2))
+        print(f"\nBaseline saved to {path}")
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        if baseline["time_scale"] != args.time_scale:
+            print(f"Warning: baseline was recorded at time scale {baseline['time_scale']}.")
+        if _compare(baseline["results"], summary, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Checks tiled detection merging on synthetic detections and reports tile-count scaling.
+
+Ground-truth objects are scattered over a large canvas. The fake detector
+returns, for each tile, every object overlapping the tile clipped to the tile
+edges, so objects on a seam are reported by several tiles in pieces. After
+merging, each ground-truth object should be matched by exactly one box; the
+run exits 1 when an object is missed or duplicated at any tile size.
+
+Usage:
+    python -m benchmarks.tiling_benchmark [--width 8000 --height 6000 --objects 400]
+"""
+import argparse
+import random
+import sys
+import time
+
+from PIL import Image
+
+from utils.tiling import detect_tiled, make_tiles
+
+LABELS = ["car", "person", "bottle", "tree"]
+
+
+def synthetic_objects(width, height, count, seed):
+    rng = random.Random(seed)
+    objects = []
+    while len(objects) < count:
+        w, h = rng.randint(30, 300), rng.randint(30, 300)
+        x, y = rng.randint(0, width - w), rng.randint(0, height - h)
+        box = {"name": rng.choice(LABELS), "xmin": x, "ymin": y, "xmax": x + w, "ymax": y + h}
+        # Keep same-label objects apart so the ground truth itself has no duplicates.
+        if all(o["name"] != box["name"] or _iou(o, box) == 0 for o in objects):
+            objects.append(box)
+    return objects
+
+
+def _iou(a, b):
+    w = max(0, min(a["xmax"], b["xmax"]) - max(a["xmin"], b["xmin"]))
+    h = max(0, min(a["ymax"], b["ymax"]) - max(a["ymin"], b["ymin"]))
+    inter = w * h
+    union = ((a["xmax"] - a["xmin"]) * (a["ymax"] - a["ymin"])
+             + (b["xmax"] - b["xmin"]) * (b["ymax"] - b["ymin"]) - inter)
+    return inter / union if union else 0.0
+
+
+class FakeTileDetector:
+    def __init__(self, image, objects, latency):
+        self.image = image
+        self.objects = objects
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, tile_image):
+        self.calls += 1
+        # Recover the tile position from its info; detect_tiled crops with Image.crop.
+        left, top, right, bottom = tile_image.info["tile"]
+        time.sleep(self.latency)
+        boxes = []
+        for o in self.objects:
+            xmin, ymin = max(o["xmin"], left), max(o["ymin"], top)
+            xmax, ymax = min(o["xmax"], right), min(o["ymax"], bottom)
+            if xmax - xmin > 4 and ymax - ymin > 4:
+                boxes.append({"name": o["name"], "xmin": xmin - left, "ymin": ymin - top,
+                              "xmax": xmax - left, "ymax": ymax - top})
+        return boxes
+
+
+class _TaggingImage:
+    """Wraps an image so each crop remembers which tile it came from."""
+
+    def __init__(self, image):
+        self._image = image
+        self.width, self.height = image.size
+
+    def crop(self, tile):
+        cropped = self._image.crop(tile)
+        cropped.info["tile"] = tile
+        return cropped
+
+
+def check(merged, objects):
+    matched = 0
+    for o in objects:
+        hits = [b for b in merged if b["name"] == o["name"] and _iou(o, b) > 0.9]
+        matched += len(hits) == 1
+    return matched, len(merged) - matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=8000)
+    parser.add_argument("--height", type=int, default=6000)
+    parser.add_argument("--objects", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model seconds per tile request.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    image = _TaggingImage(Image.new("RGB", (args.width, args.height)))
+    objects = synthetic_objects(args.width, args.height, args.objects, args.seed)
+
+    failures = []
+    print(f"{'tile px':>7} {'tiles':>6} {'raw boxes':>10} {'merged':>7} {'matched':>8} {'extra':>6} {'seconds':>8}")
+    for tile_size in (4096, 2048, 1024, 512):
+        detector = FakeTileDetector(image, objects, args.latency)
+        raw = sum(len(detector(image.crop(t))) for t in make_tiles(args.width, args.height, tile_size))
+        detector.calls = 0
+        start = time.perf_counter()
+        merged, tiles, failed = detect_tiled(image, detector, tile_size=tile_size, max_workers=args.workers)
+        elapsed = time.perf_counter() - start
+        matched, extra = check(merged.to_dicts(), objects)
+        print(f"{tile_size:>7} {tiles:>6} {raw:>10} {len(merged):>7} {matched:>7}/{len(objects)} {extra:>6} {elapsed:>8.2f}")
+        if matched != len(objects) or extra:
+            failures.append(f"{tile_size} px tiles: {matched}/{len(objects)} matched, {extra} extra")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll checks passed.")
+
+
+if __name__ == "__main__":
+    main()
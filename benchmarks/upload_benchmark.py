@@ -0,0 +1,105 @@
+"""
+Measures peak RSS and wall time of the upload paths in utils.util.
+
+The File API is replaced by a sink that reads the upload in chunks, the way the
+SDK's resumable uploader does, so only local staging costs are measured.
+
+Usage:
+    python -m benchmarks.upload_benchmark [--sizes-mb 100 1024]
+"""
+import argparse
+import io
+import json
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import time
+import types
+
+SINK_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class _BenchUpload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile, which is an in-memory BytesIO."""
+
+    def __init__(self, size_bytes: int):
+        super().__init__(os.urandom(1024) * (size_bytes // 1024))
+        self.name = "bench.mp4"
+        self.type = "video/mp4"
+        self.size = len(self.getbuffer())
+
+
+def _sink_upload_file(path, mime_type=None, display_name=None, **kwargs):
+    stream = open(path, "rb") if isinstance(path, (str, os.PathLike)) else path
+    try:
+        while stream.read(SINK_CHUNK_SIZE):
+            pass
+    finally:
+        if stream is not path:
+            stream.close()
+    return types.SimpleNamespace(name="files/bench", display_name=display_name)
+
+
+def _legacy_upload(file):
+    """The original implementation: full-buffer write to temp/<name>, then upload."""
+    temp_dir = pathlib.Path("temp")
+    temp_dir.mkdir(exist_ok=True)
+    file_path = temp_dir / file.name
+    with open(file_path, "wb") as f:
+        f.write(file.getbuffer())
+    uploaded_file = _sink_upload_file(file_path)
+    os.remove(file_path)
+    return uploaded_file
+
+
+def _run_case(mode: str, size_mb: int) -> dict:
+    from utils import util
+
+    util.genai.upload_file = _sink_upload_file
+    file = _BenchUpload(size_mb * 1024 * 1024)
+    baseline_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        _legacy_upload(file)
+    else:
+        util.upload_file_to_gemini(file, use_cache=False, stream=(mode == "stream"))
+    elapsed = time.perf_counter() - start
+
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mode": mode,
+        "size_mb": size_mb,
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(peak_rss_kb / 1024, 1),
+        "rss_growth_mb": round((peak_rss_kb - baseline_rss_kb) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[100, 1024])
+    parser.add_argument("--case", nargs=2, metavar=("MODE", "SIZE_MB"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(_run_case(args.case[0], int(args.case[1]))))
+        return
+
+    # Each case runs in a fresh interpreter so ru_maxrss reflects that case only.
+    print(f"{'mode':<8} {'size MB':>8} {'seconds':>8} {'peak RSS MB':>12} {'RSS growth MB':>14}")
+    for size_mb in args.sizes_mb:
+        for mode in ("legacy", "staged", "stream"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.upload_benchmark", "--case", mode, str(size_mb)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{result['mode']:<8} {result['size_mb']:>8} {result['seconds']:>8} "
+                  f"{result['peak_rss_mb']:>12} {result['rss_growth_mb']:>14}")
+
+
+if __name__ == "__main__":
+    main()
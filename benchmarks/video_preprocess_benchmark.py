@@ -0,0 +1,138 @@
+"""
+Compares sending a video raw, reduced and as keyframes, up to the generated metadata.
+
+A synthetic clip (--width x --height at --fps, with --scenes hard cuts and
+sensor-like noise) is written with OpenCV, then each mode runs the app's
+path against the simulated Gemini backend: preprocessing, upload,
+processing wait and metadata generation (keyframes skip the upload and the
+wait). The report lists the bytes sent, bytes saved, preprocessing time and
+total time to metadata per mode.
+
+Preprocessing is real CPU time on this machine. Simulated API times are
+shortened by --time-scale and printed unscaled, so they reflect the
+simulated service's speed; set SIM_UPLOAD_MBPS to match your uplink.
+
+Usage:
+    python -m benchmarks.video_preprocess_benchmark [--width 1920] [--height 1080] [--fps 30]
+        [--seconds 20] [--scenes 5] [--time-scale 0.05]
+"""
+import argparse
+import io
+import os
+import pathlib
+import tempfile
+import time
+
+import numpy as np
+
+MODES = ("raw", "reduced", "keyframes")
+
+
+def _isolate(scratch: str, time_scale: float) -> None:
+    """Selects the simulated backend and points every cache at scratch; call before importing utils."""
+    os.environ["GENAI_BACKEND"] = "simulated"
+    os.environ["RESULT_CACHE_PATH"] = os.path.join(scratch, "results.db")
+    os.environ["UPLOAD_CACHE_PATH"] = os.path.join(scratch, "uploads.db")
+    os.environ["FILE_INDEX_PATH"] = os.path.join(scratch, "file_index.db")
+    os.environ["FILE_GC_INTERVAL_SECONDS"] = "0"
+    os.environ["SIM_TIME_SCALE"] = str(time_scale)
+
+
+def write_clip(path: str, width: int, height: int, fps: float, seconds: float, scenes: int, seed: int = 0) -> None:
+    """Writes a clip with a moving shape, a hard cut to a new colour every seconds / scenes, and noise."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    colours = rng.integers(0, 256, (scenes, 3))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    frames = int(seconds * fps)
+    for i in range(frames):
+        scene = i * scenes // frames
+        frame = np.empty((height, width, 3), np.uint8)
+        frame[:] = colours[scene]
+        x = int((i / frames) * width)
+        cv2.circle(frame, (x, height // 2), height // 8, (255, 255, 255), -1)
+        frame = cv2.add(frame, rng.integers(0, 24, frame.shape, dtype=np.uint8))
+        writer.write(frame)
+    writer.release()
+
+
+class _ClipUpload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile."""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+        self.type = "video/mp4"
+        self.size = len(data)
+
+
+def run_mode(mode: str, clip: _ClipUpload, model, time_scale: float):
+    from utils.util import (
+        generate_metadata,
+        generate_metadata_from_keyframes,
+        poll_file_processing,
+        prepare_video_upload,
+        upload_file_to_gemini,
+    )
+    from utils.video_preprocess import PreparedVideo
+
+    if mode == "raw":
+        prepared = PreparedVideo("raw", clip.size, clip.size, 0.0, 0.0)
+    else:
+        prepared = prepare_video_upload(clip, mode)
+
+    started = time.perf_counter()
+    if prepared.keyframes is not None:
+        metadata = generate_metadata_from_keyframes(model, prepared.keyframes, use_cache=False)
+    else:
+        uploaded_file = upload_file_to_gemini(prepared.file or clip, use_cache=False)
+        metadata = generate_metadata(model, poll_file_processing(uploaded_file), use_cache=False)
+    api_seconds = (time.perf_counter() - started) / time_scale
+    if metadata is None:
+        raise RuntimeError(f"{mode}: no metadata")
+    return prepared, api_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--scenes", type=int, default=5)
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="gemini-video-")
+    _isolate(scratch, args.time_scale)
+    from utils import poller
+    from utils.model import load_model
+    from utils.reporter import Reporter, set_default_reporter
+    from utils.schemas import VideoAnalysis
+
+    set_default_reporter(Reporter())
+    poller._poller = poller.FilePoller(base_delay=1.0 * args.time_scale, max_delay=10.0 * args.time_scale)
+    model = load_model(type="video", schemaType=VideoAnalysis)
+
+    path = os.path.join(scratch, "clip.mp4")
+    write_clip(path, args.width, args.height, args.fps, args.seconds, args.scenes)
+    clip = _ClipUpload(pathlib.Path(path).read_bytes(), "clip.mp4")
+    print(
+        f"{args.width}x{args.height} at {args.fps:g} fps, {args.seconds:g}s, {args.scenes} scenes: "
+        f"{clip.size / (1024 * 1024):.1f} MB"
+    )
+    print(f"{'mode':<10} {'sent MB':>9} {'saved':>7} {'frames':>7} {'prep s':>8} {'API s':>8} {'total s':>8}")
+    for mode in MODES:
+        clip.seek(0)
+        prepared, api_seconds = run_mode(mode, clip, model, args.time_scale)
+        frames = len(prepared.keyframes.frames) if prepared.keyframes is not None else "-"
+        row = prepared.as_row()
+        print(
+            f"{row['mode']:<10} {row['sent_mb']:>9.2f} {row['saved_pct']:>6.1f}% {frames:>7} "
+            f"{prepared.seconds:>8.2f} {api_seconds:>8.2f} {prepared.seconds + api_seconds:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+Headless batch runner for the video, audio and image pipelines.
+
+Inputs are files, directories (searched recursively for the mode's file
+types) or manifests: a .txt file with one path per line, or a .jsonl file
+with a "path" and, for images, an optional "object" per line. Local work
+(hashing, audio preparation and WAV splitting, video reduction or keyframe
+extraction, image decoding and encoding) runs on a process pool; uploads, processing waits and model calls run on a thread pool.
+
+Each input produces one JSON line in the output file as soon as it
+finishes. The output doubles as the checkpoint: rerunning with the same
+output skips inputs already completed there, so an interrupted run resumes
+where it stopped. Failed inputs are tried again unless --skip-failed.
+
+Usage:
+    python cli.py video videos/ -o video_metadata.jsonl [--video-mode reduced]
+    python cli.py audio interviews.txt -o transcripts.jsonl --segment-minutes 5 [--prepare-audio]
+    python cli.py image photos/ --object dog -o detections.jsonl
+"""
+import argparse
+import io
+import json
+import logging
+import mimetypes
+import os
+import pathlib
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+# Preprocessing modules pull in NumPy, PIL and OpenCV; they are imported where
+# used so worker processes load only what their mode needs.
+from utils.reporter import LoggingReporter, RecordingReporter, set_default_reporter, use_reporter
+
+EXTENSIONS = {
+    "video": {".mp4", ".mov", ".avi", ".mkv"},
+    "audio": {".mp3", ".wav", ".aiff", ".aac", ".ogg", ".flac"},
+    "image": {".jpg", ".jpeg", ".png"},
+}
+DEFAULT_IO_WORKERS = 8
+DEFAULT_CPU_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Option defaults, copied from the preprocessing modules so that building the
+# parser does not import them (and NumPy, PIL and OpenCV) into this process.
+DEFAULT_MAX_SIDE = 1536  # utils.image_preprocess.DEFAULT_MAX_SIDE
+VIDEO_MODES = ("raw", "reduced", "keyframes")  # utils.video_preprocess.MODES
+DEFAULT_VIDEO_MAX_SIDE = 768  # utils.video_preprocess.DEFAULT_MAX_SIDE
+DEFAULT_VIDEO_FPS = 2.0  # utils.video_preprocess.DEFAULT_FPS
+DEFAULT_MAX_KEYFRAMES = 32  # utils.video_preprocess.DEFAULT_MAX_KEYFRAMES
+DEFAULT_MIN_SILENCE = 1.0  # utils.audio_preprocess.DEFAULT_MIN_SILENCE
+
+logger = logging.getLogger("gemini.cli")
+
+
+class Job:
+    """One input file and the options that identify its result in the output."""
+
+    def __init__(self, mode: str, path: str, object_name: Optional[str] = None):
+        self.mode = mode
+        self.path = os.path.abspath(path)
+        self.object_name = object_name
+        self.started_at = 0.0
+
+    @property
+    def key(self) -> str:
+        if self.mode == "image":
+            return f"{self.mode}:{self.path}:{self.object_name}"
+        return f"{self.mode}:{self.path}"
+
+    def record(self, status: str, result: Any = None, error: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "mode": self.mode,
+            "path": self.path,
+            "object": self.object_name,
+            "status": status,
+            "error": error,
+            "seconds": round(time.monotonic() - self.started_at, 3),
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "result": result,
+        }
+
+
+class LocalFile(io.FileIO):
+    """A file on disk with the name/type/size attributes upload_file_to_gemini reads from UploadedFile."""
+
+    def __init__(self, path: str):
+        super().__init__(path, "rb")
+        self.name = os.path.basename(path)
+        self.type = mimetypes.guess_type(path)[0]
+        self.size = os.fstat(self.fileno()).st_size
+
+
+def iter_jobs(mode: str, inputs: Iterable[str], object_name: Optional[str]) -> Iterator[Job]:
+    """Expands files, directories and manifests into jobs, in a stable order."""
+    for entry in inputs:
+        path = pathlib.Path(entry)
+        if path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if child.is_file() and child.suffix.lower() in EXTENSIONS[mode]:
+                    yield Job(mode, str(child), object_name)
+        elif path.suffix.lower() == ".txt":
+            for line in path.read_text(encoding="utf-8").splitlines():
+                if line.strip() and not line.lstrip().startswith("#"):
+                    yield Job(mode, line.strip(), object_name)
+        elif path.suffix.lower() == ".jsonl":
+            for line in path.read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    item = json.loads(line)
+                    yield Job(mode, item["path"], item.get("object", object_name))
+        else:
+            yield Job(mode, str(path), object_name)
+
+
+def load_checkpoint(output_path: str, skip_failed: bool) -> Set[str]:
+    """Keys of inputs already in the output; failed ones only count when skip_failed is set."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run.
+                continue
+            if record.get("status") == "ok" or skip_failed:
+                done.add(record["key"])
+    return done
+
+
+# Local preprocessing, run on the process pool. Each returns what the API step needs.
+
+def _hash_path(path: str) -> str:
+    from utils.upload_cache import hash_file_content
+
+    with open(path, "rb") as f:
+        return hash_file_content(f)
+
+
+def preprocess(job: Job, args: argparse.Namespace) -> Any:
+    if job.mode == "image":
+        from PIL import Image
+
+        from utils.image_preprocess import encode_image
+
+        with Image.open(job.path) as image:
+            image.load()
+            return _hash_path(job.path), encode_image(image, args.max_side)
+    if job.mode == "video" and args.video_mode != "raw":
+        from utils.video_preprocess import prepare_video
+
+        return prepare_video(
+            job.path, os.path.basename(job.path), args.video_mode,
+            max_side=args.video_max_side, fps=args.video_fps, max_keyframes=args.max_keyframes,
+        )
+    if job.mode == "audio" and args.prepare_audio:
+        from utils.audio_preprocess import SUPPORTED_SUFFIXES, prepare_audio
+        from utils.long_audio import split_wav
+
+        if job.path.lower().endswith(SUPPORTED_SUFFIXES):
+            with open(job.path, "rb") as f:
+                data = f.read()
+            try:
+                prepared = prepare_audio(data, min_silence=args.min_silence)
+            except ValueError as e:
+                # As in the app, audio that cannot be decoded is sent as it is.
+                logger.warning("Sending the original audio of %s: %s", job.path, e)
+            else:
+                return split_wav(prepared.data, args.segment_minutes * 60, args.overlap_seconds), {
+                    **prepared.as_row(), "time_map": prepared.time_map.as_rows(),
+                }
+    if job.mode == "audio" and job.path.lower().endswith(".wav"):
+        from utils.long_audio import split_wav
+
+        with open(job.path, "rb") as f:
+            return split_wav(f.read(), args.segment_minutes * 60, args.overlap_seconds), None
+    return _hash_path(job.path)
+
+
+# API steps, run on the I/O thread pool. Each returns the result or None after reporting an error.
+
+def _upload_and_wait(job: Job, digest: Optional[str], args: argparse.Namespace, session_id: str, file=None):
+    """Uploads the job's file, or file when given (e.g. a reduced copy), and waits for processing."""
+    from utils.util import poll_file_processing, upload_file_to_gemini
+
+    if file is not None:
+        uploaded_file = upload_file_to_gemini(file, session_id=session_id, digest=digest)
+    else:
+        with LocalFile(job.path) as file:
+            uploaded_file = upload_file_to_gemini(file, session_id=session_id, digest=digest)
+    if uploaded_file is None:
+        return None
+    return poll_file_processing(uploaded_file, timeout=args.poll_timeout, session_id=session_id)
+
+
+def run_video(job: Job, prepared: Any, model: Any, args: argparse.Namespace, session_id: str):
+    from utils.util import generate_metadata, generate_metadata_from_keyframes
+    from utils.video_preprocess import PreparedVideo
+
+    use_cache = not args.no_cache
+    if not isinstance(prepared, PreparedVideo):
+        processed_file = _upload_and_wait(job, prepared, args, session_id)
+        if processed_file is None:
+            return None
+        return generate_metadata(model, processed_file, use_cache=use_cache, session_id=session_id)
+
+    if prepared.keyframes is not None:
+        metadata = generate_metadata_from_keyframes(model, prepared.keyframes, use_cache=use_cache, session_id=session_id)
+    else:
+        processed_file = _upload_and_wait(job, None, args, session_id, file=prepared.file)
+        if processed_file is None:
+            return None
+        metadata = generate_metadata(model, processed_file, use_cache=use_cache, session_id=session_id)
+    return None if metadata is None else {**metadata, "preprocessing": prepared.as_row()}
+
+
+def run_audio(job: Job, prepared: Any, model: Any, args: argparse.Namespace, session_id: str):
+    from utils.long_audio import format_transcript, transcribe_segments
+    from utils.util import generate_transcription
+
+    if isinstance(prepared, tuple):
+        segments, preprocessing = prepared
+        lines = transcribe_segments(
+            model, segments, os.path.basename(job.path), args.segment_parallelism,
+            use_cache=not args.no_cache, session_id=session_id,
+        )
+        if lines is None:
+            return None
+        result = {"transcript": format_transcript(lines), "lines": lines}
+        if preprocessing is not None:
+            result["preprocessing"] = preprocessing
+        return result
+    processed_file = _upload_and_wait(job, prepared, args, session_id)
+    if processed_file is None:
+        return None
+    transcript = generate_transcription(model, processed_file, use_cache=not args.no_cache, session_id=session_id)
+    return None if transcript is None else {"transcript": transcript}
+
+
+def run_image(job: Job, prepared: Any, model: Any, args: argparse.Namespace, session_id: str):
+    from utils.detection import detect_encoded
+
+    digest, payload = prepared
+    boxes = detect_encoded(payload, digest, job.object_name, model, args.max_side, use_cache=not args.no_cache)
+    if boxes is None:
+        return None
+    return {"image_size": list(payload.original_size), "boxes": boxes.to_dicts()}
+
+
+RUNNERS = {"video": run_video, "audio": run_audio, "image": run_image}
+
+
+def load_mode_model(mode: str):
+    from utils.model import configure, load_detection_model, load_model
+    from utils.schemas import VideoAnalysis
+
+    configure()
+    if mode == "video":
+        return load_model(type="video", schemaType=VideoAnalysis)
+    if mode == "image":
+        return load_detection_model()
+    return load_model(type=None, schemaType=None)
+
+
+def call_api(job: Job, prepared: Any, model: Any, args: argparse.Namespace, session_id: str) -> Dict[str, Any]:
+    """Runs the API step for one job and turns its outcome into an output record."""
+    from utils.scheduler import BATCH, request_priority
+
+    reporter = RecordingReporter(forward_to=LoggingReporter(logger))
+    with use_reporter(reporter), request_priority(BATCH):
+        try:
+            result = RUNNERS[job.mode](job, prepared, model, args, session_id)
+        except Exception as e:
+            reporter.error(f"{type(e).__name__}: {e}")
+            result = None
+    if result is None:
+        return job.record("failed", error=reporter.errors[-1] if reporter.errors else "No result.")
+    return job.record("ok", result)
+
+
+def run(jobs: Iterable[Job], args: argparse.Namespace) -> Dict[str, int]:
+    """
+    Processes jobs with at most 2 x io_workers in flight and appends one record per job to args.output.
+
+    Jobs move from the process pool to the thread pool as their
+    preprocessing finishes, so decoding overlaps with API calls.
+    """
+    from utils.file_index import get_file_index
+
+    done = load_checkpoint(args.output, args.skip_failed)
+    counts = {"ok": 0, "failed": 0, "skipped": 0}
+    model = load_mode_model(args.mode)
+    session_id = f"cli-{os.getpid()}"
+    index = get_file_index()
+    max_in_flight = args.io_workers * 2
+    jobs = iter(jobs)
+    exhausted = False
+    preprocessing: Dict[Any, Job] = {}
+    calling: Dict[Any, Job] = {}
+
+    # Keeps this run's uploads from being collected as orphans while jobs are in flight.
+    with index.keep_alive(session_id), open(args.output, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=args.cpu_workers) as cpu_pool, \
+            ThreadPoolExecutor(max_workers=args.io_workers, thread_name_prefix="cli-io") as io_pool:
+
+        def write(record: Dict[str, Any]):
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            counts[record["status"]] += 1
+            logger.info("%s %s (%.1fs)", record["status"], record["path"], record["seconds"])
+
+        while True:
+            while not exhausted and len(preprocessing) + len(calling) < max_in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                elif job.key in done:
+                    counts["skipped"] += 1
+                else:
+                    done.add(job.key)
+                    job.started_at = time.monotonic()
+                    preprocessing[cpu_pool.submit(preprocess, job, args)] = job
+            if not preprocessing and not calling:
+                break
+            finished, _ = wait([*preprocessing, *calling], return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in preprocessing:
+                    job = preprocessing.pop(future)
+                    try:
+                        prepared = future.result()
+                    except Exception as e:
+                        write(job.record("failed", error=f"Preprocessing failed: {type(e).__name__}: {e}"))
+                        continue
+                    calling[io_pool.submit(call_api, job, prepared, model, args, session_id)] = job
+                else:
+                    calling.pop(future)
+                    write(future.result())
+    return counts
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=sorted(RUNNERS))
+    parser.add_argument("inputs", nargs="+", help="Files, directories or .txt/.jsonl manifests.")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file results are appended to.")
+    parser.add_argument("--object", default="all", help="Object to detect in image mode.")
+    parser.add_argument("--io-workers", type=int, default=DEFAULT_IO_WORKERS, help="Concurrent uploads and model calls.")
+    parser.add_argument("--cpu-workers", type=int, default=DEFAULT_CPU_WORKERS, help="Processes for local preprocessing.")
+    parser.add_argument("--max-side", type=int, default=DEFAULT_MAX_SIDE, help="Longest image side sent to the model.")
+    parser.add_argument(
+        "--video-mode", choices=VIDEO_MODES, default="raw",
+        help="Send videos as they are, re-encoded smaller, or as scene-change keyframes.",
+    )
+    parser.add_argument("--video-max-side", type=int, default=DEFAULT_VIDEO_MAX_SIDE, help="Longest side of reduced videos and keyframes.")
+    parser.add_argument("--video-fps", type=float, default=DEFAULT_VIDEO_FPS, help="Frame rate of reduced videos.")
+    parser.add_argument("--max-keyframes", type=int, default=DEFAULT_MAX_KEYFRAMES, help="Keyframes sent per video in keyframes mode.")
+    parser.add_argument(
+        "--prepare-audio", action="store_true",
+        help="Downmix WAV/AIFF audio to mono 16 kHz and drop long silences before upload.",
+    )
+    parser.add_argument("--min-silence", type=float, default=DEFAULT_MIN_SILENCE, help="Shortest silence dropped by --prepare-audio.")
+    parser.add_argument("--segment-minutes", type=float, default=5, help="WAV segment length in audio mode.")
+    parser.add_argument("--overlap-seconds", type=float, default=15, help="Overlap between WAV segments.")
+    parser.add_argument("--segment-parallelism", type=int, default=4, help="Segments transcribed at once per file.")
+    parser.add_argument("--poll-timeout", type=float, default=None, help="Seconds to wait for File API processing.")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the result cache.")
+    parser.add_argument("--skip-failed", action="store_true", help="Do not retry inputs that failed in an earlier run.")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    set_default_reporter(LoggingReporter())
+
+    counts = run(iter_jobs(args.mode, args.inputs, args.object if args.mode == "image" else None), args)
+    logger.info("Done: %(ok)d ok, %(failed)d failed, %(skipped)d already in the output", counts)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
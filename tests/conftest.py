@@ -0,0 +1,27 @@
+"""Runs every test against the simulated backend, with caches and indexes kept out of the repo."""
+import os
+import tempfile
+
+# Read when utils.backend and the caches are first imported, so set before any test module loads them.
+os.environ["GENAI_BACKEND"] = "simulated"
+_cache_dir = tempfile.mkdtemp(prefix="gemini-tests-")
+for variable, file_name in (
+    ("RESULT_CACHE_PATH", "result_cache.db"),
+    ("UPLOAD_CACHE_PATH", "upload_cache.db"),
+    ("FILE_INDEX_PATH", "file_index.db"),
+):
+    os.environ[variable] = os.path.join(_cache_dir, file_name)
+
+import pytest  # noqa: E402
+
+from utils import simulated_genai  # noqa: E402
+
+
+@pytest.fixture
+def simulation():
+    """A fast, seeded simulated service with no files; returns simulated_genai."""
+    simulated_genai.configure_simulation(simulated_genai.SimulationConfig(time_scale=0.01, seed=0))
+    simulated_genai.reset()
+    yield simulated_genai
+    simulated_genai.configure_simulation(simulated_genai.SimulationConfig.from_env())
+    simulated_genai.reset()
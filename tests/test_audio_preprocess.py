@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from benchmarks.audio_preprocess_benchmark import check_resampling, check_scenario, synthesize, to_aiff, to_wav
+from utils.audio_preprocess import TimeMap, prepare_audio, read_pcm
+
+
+@pytest.mark.parametrize("rate, channels, silence_share, encode", [
+    (48000, 2, 0.5, to_wav),
+    (16000, 1, 0.15, to_wav),
+    (44100, 2, 0.3, to_aiff),
+])
+def test_preparation_keeps_speech_and_maps_back(rate, channels, silence_share, encode):
+    samples, bursts, silences = synthesize(np.random.default_rng(0), 60, rate, channels, silence_share)
+    failures = []
+
+    row = check_scenario("scenario", encode(samples, rate), bursts, silences, failures)
+
+    assert failures == []
+    assert row["sent_mb"] < row["original_mb"]
+
+
+def test_resampling_filters_above_the_new_nyquist():
+    failures = []
+    check_resampling(failures)
+    assert failures == []
+
+
+def test_untrimmed_audio_is_only_downmixed_and_resampled():
+    samples, _, _ = synthesize(np.random.default_rng(1), 10, 48000, 2, 0.5)
+
+    prepared = prepare_audio(to_wav(samples, 48000), trim=False)
+
+    decoded, rate = read_pcm(prepared.data)
+    assert (rate, decoded.shape[1]) == (16000, 1)
+    assert prepared.duration == pytest.approx(prepared.original_duration, abs=0.01)
+    assert prepared.time_map.to_original(5.0) == 5.0
+
+
+def test_low_rate_recordings_are_not_upsampled():
+    samples, _, _ = synthesize(np.random.default_rng(2), 5, 8000, 1, 0.0)
+    assert prepare_audio(to_wav(samples, 8000), trim=False).sample_rate == 8000
+
+
+def test_unreadable_audio_raises_value_error():
+    with pytest.raises(ValueError):
+        prepare_audio(b"not a wav file at all")
+
+
+def test_time_map_clamps_to_kept_spans():
+    time_map = TimeMap([(0.0, 2.0, 1.0), (1.0, 10.0, 2.0)])
+    assert time_map.to_original(0.5) == 2.5
+    assert time_map.to_original(1.5) == 10.5
+    assert time_map.to_original(5.0) == 12.0
@@ -0,0 +1,23 @@
+import subprocess
+import sys
+
+import cli
+from utils import audio_preprocess, image_preprocess, video_preprocess
+
+
+def test_option_defaults_match_the_preprocessing_modules():
+    assert cli.DEFAULT_MAX_SIDE == image_preprocess.DEFAULT_MAX_SIDE
+    assert cli.VIDEO_MODES == video_preprocess.MODES
+    assert cli.DEFAULT_VIDEO_MAX_SIDE == video_preprocess.DEFAULT_MAX_SIDE
+    assert cli.DEFAULT_VIDEO_FPS == video_preprocess.DEFAULT_FPS
+    assert cli.DEFAULT_MAX_KEYFRAMES == video_preprocess.DEFAULT_MAX_KEYFRAMES
+    assert cli.DEFAULT_MIN_SILENCE == audio_preprocess.DEFAULT_MIN_SILENCE
+
+
+def test_parsing_arguments_loads_no_heavy_packages():
+    code = (
+        "import sys, cli; cli.build_parser().parse_args(['image', 'photos', '-o', 'out.jsonl']); "
+        "print(sorted(m for m in ('numpy', 'PIL', 'cv2', 'google.generativeai') if m in sys.modules))"
+    )
+    completed = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == "[]"
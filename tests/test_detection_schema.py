@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from PIL import Image
+
+from benchmarks.detection_schema_benchmark import replay
+
+BOX = {"name": "dog", "ymin": 100, "xmin": 100, "ymax": 500, "xmax": 400}
+
+
+def reply(text, finish_reason="STOP"):
+    return {"text": text, "output_tokens": len(text) // 4, "finish_reason": finish_reason, "seconds": 0.1}
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    image = tmp_path / "photo.png"
+    Image.new("RGB", (640, 480)).save(image)
+
+    def write(mode, name, replies):
+        path = tmp_path / mode / f"photo__{name}.json"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(json.dumps({"image": str(image), "object": "dog", "max_side": 512, "replies": replies}))
+
+    return tmp_path, write
+
+
+def test_replay_reproduces_repairs_salvages_and_failures(fixtures):
+    root, write = fixtures
+    clean = json.dumps([BOX])
+    write("schema", "clean", [reply(clean)])
+    write("schema", "repaired", [reply('[{"name": "dog"}]'), reply(clean)])
+    write("schema", "salvaged", [reply(json.dumps([BOX, BOX])[:-20], "MAX_TOKENS")])
+    write("schema", "failed", [reply("not json"), reply("still not json")])
+    write("prompt", "fenced", [reply(f"```json\n{clean}\n```")])
+    failures = []
+
+    results = replay(root, failures)
+
+    assert failures == []
+    schema = results["schema"]
+    assert (schema.requests, schema.model_calls) == (4, 6)
+    assert (schema.repaired, schema.salvaged, schema.failed) == (1, 1, 1)
+    assert (results["prompt"].requests, results["prompt"].failed) == (1, 0)
+
+
+def test_replay_flags_fixtures_the_pipeline_no_longer_matches(fixtures):
+    root, write = fixtures
+    # A valid first reply ends the request, so the recorded repair is never asked for.
+    write("schema", "extra", [reply(json.dumps([BOX])), reply(json.dumps([BOX]))])
+    # An invalid reply asks for a repair that was never recorded.
+    write("schema", "missing", [reply("not json")])
+    failures = []
+
+    replay(root, failures)
+
+    assert len(failures) == 2
+    assert "1 model calls, 2 recorded" in failures[0]
+    assert "2 model calls, 1 recorded" in failures[1]
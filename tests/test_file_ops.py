@@ -0,0 +1,85 @@
+import pytest
+
+from benchmarks.fakes import FakeFileAPI
+from utils.file_ops import delete_files, iter_files, take_page
+
+
+def make_api(count, **kwargs):
+    api = FakeFileAPI(**kwargs)
+    for i in range(count):
+        prefix = "video" if i % 2 == 0 else "audio"
+        api.upload(1024, 0.0, display_name=f"{prefix}-{i:03d}.mp4", age_hours=i % 48)
+    return api
+
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_bulk_delete_leaves_nothing_behind(workers):
+    api = make_api(120, transient_failure_rate=0.3)
+    names = (f.name for f in iter_files(list_files=api.list_files))
+
+    report = delete_files(names, max_workers=workers, retries=10, base_delay=0, delete_file=api.delete_file)
+
+    assert len(api) == 0
+    assert report.failed == {}
+    assert len(report.deleted) == 120
+    assert report.retries > 0
+
+
+def test_files_already_gone_count_as_deleted():
+    api = make_api(10)
+    names = [f.name for f in api.list_files()]
+    for name in names[:4]:
+        api.delete_file(name)
+
+    report = delete_files(names, base_delay=0, delete_file=api.delete_file)
+
+    assert sorted(report.deleted) == sorted(names)
+    assert report.failed == {}
+    assert len(api) == 0
+
+
+def test_files_that_keep_failing_are_reported():
+    api = make_api(5, transient_failure_rate=1.0)
+    progress = []
+
+    report = delete_files(
+        [f.name for f in api.list_files()], retries=2, base_delay=0,
+        delete_file=api.delete_file, on_progress=lambda r: progress.append(r.total),
+    )
+
+    assert len(report.failed) == 5
+    assert report.deleted == []
+    assert len(api) == 5
+    assert api.delete_calls == 15
+    assert progress == [1, 2, 3, 4, 5]
+
+
+def test_iter_files_filters_by_prefix_and_age():
+    api = make_api(40)
+
+    files = list(iter_files("video", states=["ACTIVE"], min_age_hours=24, list_files=api.list_files))
+
+    assert files
+    assert all(f.display_name.startswith("video") for f in files)
+    assert len(files) == sum(1 for i in range(40) if i % 2 == 0 and i % 48 >= 24)
+
+
+def test_prefix_matches_the_file_name_too():
+    api = make_api(3)
+    name = next(iter(api.list_files())).name
+    assert [f.name for f in iter_files(name.split("/", 1)[1], list_files=api.list_files)] == [name]
+
+
+def test_take_page_fetches_only_the_pages_it_needs():
+    api = make_api(350)
+    files = iter_files("audio", list_files=api.list_files)
+
+    first = take_page(files, 25)
+    assert len(first) == 25
+    assert api.list_pages == 1
+
+    # Half of the first 100 files are audio, so 50 more runs into the second page.
+    second = take_page(files, 50)
+    assert len(second) == 50
+    assert {f.name for f in first}.isdisjoint(f.name for f in second)
+    assert api.list_pages == 2
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from benchmarks.long_audio_benchmark import check, fake_transcriber, synthetic_script, synthetic_wav
+from utils.long_audio import split_wav, stitch_transcripts, transcribe_long_audio
+from utils.reporter import RecordingReporter, get_reporter, use_reporter
+
+SECONDS = 600
+
+
+@pytest.fixture(scope="module")
+def recording():
+    return synthetic_wav(SECONDS), synthetic_script(SECONDS, seed=0)
+
+
+def test_split_wav_covers_the_recording_with_overlapping_segments(recording):
+    data, _ = recording
+    segments = split_wav(data, segment_seconds=120, overlap_seconds=10)
+
+    assert [s.index for s in segments] == list(range(len(segments)))
+    assert segments[0].start_seconds == 0
+    assert segments[-1].end_seconds == pytest.approx(SECONDS)
+    for previous, current in zip(segments, segments[1:]):
+        assert current.start_seconds == pytest.approx(previous.end_seconds - 10)
+    assert all(s.end_seconds - s.start_seconds <= 120 for s in segments)
+
+
+def test_overlap_must_be_shorter_than_segments(recording):
+    data, _ = recording
+    with pytest.raises(ValueError):
+        split_wav(data, segment_seconds=30, overlap_seconds=30)
+
+
+@pytest.mark.parametrize("parallelism", [1, 4])
+def test_stitching_restores_the_script(recording, parallelism):
+    data, script = recording
+    lines = transcribe_long_audio(
+        None, data, segment_seconds=120, overlap_seconds=10, parallelism=parallelism,
+        transcribe_segment=fake_transcriber(script, 0.0),
+    )
+    assert check(lines, script) == "ok"
+
+
+def test_segments_finishing_out_of_order_keep_their_order(recording):
+    data, script = recording
+    transcribe = fake_transcriber(script, 0.0)
+
+    def late_first(segment):
+        # Earlier segments finish last.
+        time.sleep(0.02 * (10 - segment.index))
+        return transcribe(segment)
+
+    lines = transcribe_long_audio(
+        None, data, segment_seconds=120, overlap_seconds=10, parallelism=8, transcribe_segment=late_first,
+    )
+    assert check(lines, script) == "ok"
+
+
+def test_a_failed_segment_fails_the_recording(recording):
+    data, script = recording
+    transcribe = fake_transcriber(script, 0.0)
+    lines = transcribe_long_audio(
+        None, data, segment_seconds=120, overlap_seconds=10,
+        transcribe_segment=lambda segment: None if segment.index == 2 else transcribe(segment),
+    )
+    assert lines is None
+
+
+def test_segment_messages_are_reported_on_the_caller_in_order(recording):
+    data, _ = recording
+
+    def transcribe(segment):
+        time.sleep(0.01 * (10 - segment.index))
+        get_reporter().warning(f"segment {segment.index}")
+        return "[Speaker A]: Hello."
+
+    with use_reporter(RecordingReporter()) as reporter:
+        transcribe_long_audio(None, data, segment_seconds=120, overlap_seconds=10, parallelism=4, transcribe_segment=transcribe)
+
+    count = len(split_wav(data, 120, 10))
+    assert reporter.messages == [("warning", f"segment {i}") for i in range(count)]
+
+
+def test_stitching_maps_speaker_labels_across_segments():
+    first = "[Speaker A]: Good morning everyone.\n[Speaker B]: Thanks for joining us today."
+    # The next segment hears Bob first, so the model calls him Speaker A.
+    second = "[Speaker A]: Thanks for joining us today.\n[Speaker B]: Shall we start?\n[Speaker A]: Yes, let's."
+
+    lines = stitch_transcripts([first, second])
+
+    assert lines == [
+        {"speaker": "Speaker A", "text": "Good morning everyone."},
+        {"speaker": "Speaker B", "text": "Thanks for joining us today."},
+        {"speaker": "Speaker A", "text": "Shall we start?"},
+        {"speaker": "Speaker B", "text": "Yes, let's."},
+    ]
@@ -0,0 +1,80 @@
+import io
+import time
+
+import pytest
+
+from benchmarks.fakes import FakeFileAPI
+from utils.poller import FilePoller
+
+
+def _upload_audio(simulation, size: int = 64 * 1024):
+    return simulation.upload_file(io.BytesIO(b"\0" * size), mime_type="audio/wav")
+
+
+def test_every_file_resolves_active_soon_after_it_is_ready():
+    api = FakeFileAPI()
+    files = [api.upload(1024, 0.05 + 0.02 * i) for i in range(8)]
+    poller = FilePoller(get_file=api.get_file, base_delay=0.01, max_delay=0.05)
+    lags = []
+    futures = [poller.submit(f, timeout=5) for f in files]
+    for future in futures:
+        future.add_done_callback(lambda done: lags.append(time.monotonic() - api.ready_at(done.result().name)))
+
+    results = [future.result(timeout=5) for future in futures]
+
+    assert [f.state.name for f in results] == ["ACTIVE"] * len(files)
+    assert len(lags) == len(files) and max(lags) < 0.5
+
+
+def test_processing_failure_resolves_failed(simulation):
+    simulation.configure_simulation(processing_failure_rate=1.0, processing_base=1.0)
+    uploaded = _upload_audio(simulation)
+    assert uploaded.state.name == "PROCESSING"
+    poller = FilePoller(get_file=simulation.get_file, base_delay=0.005, max_delay=0.02)
+
+    result = poller.submit(uploaded, timeout=5).result(timeout=5)
+
+    assert result.state.name == "FAILED"
+
+
+def test_processing_success_resolves_active(simulation):
+    simulation.configure_simulation(processing_base=1.0)
+    uploaded = _upload_audio(simulation)
+    poller = FilePoller(get_file=simulation.get_file, base_delay=0.005, max_delay=0.02)
+
+    assert poller.submit(uploaded, timeout=5).result(timeout=5).state.name == "ACTIVE"
+
+
+def test_file_not_processing_resolves_immediately():
+    api = FakeFileAPI()
+    ready = api.upload(1024, 0.0)
+    future = FilePoller(get_file=api.get_file).submit(ready)
+    assert future.done() and future.result() is ready
+    assert api.get_file_calls == 0
+
+
+def test_repeated_errors_fail_the_future():
+    def get_file(name):
+        raise ConnectionError("offline")
+
+    api = FakeFileAPI()
+    poller = FilePoller(get_file=get_file, base_delay=0.005, max_delay=0.01, max_errors=3)
+    with pytest.raises(ConnectionError):
+        poller.submit(api.upload(1024, 10.0)).result(timeout=5)
+
+
+def test_timeout_fails_the_future():
+    api = FakeFileAPI()
+    poller = FilePoller(get_file=api.get_file, base_delay=0.005, max_delay=0.01)
+    with pytest.raises(TimeoutError):
+        poller.submit(api.upload(1024, 10.0), timeout=0.05).result(timeout=5)
+
+
+def test_max_delay_caps_the_backoff_for_one_file():
+    api = FakeFileAPI()
+    poller = FilePoller(get_file=api.get_file, base_delay=0.01, max_delay=10.0, elapsed_fraction=1.0)
+    uploaded = api.upload(1024, 0.3)
+
+    poller.submit(uploaded, max_delay=0.02).result(timeout=5)
+
+    assert time.monotonic() - api.ready_at(uploaded.name) < 0.2
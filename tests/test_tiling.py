@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.tiling_benchmark import FakeTileDetector, _TaggingImage, check, synthetic_objects
+from utils.tiling import detect_tiled, fuse_seam_fragments, make_tiles, nms_per_class
+
+WIDTH, HEIGHT = 2400, 1800
+
+
+@pytest.mark.parametrize("tile_size", [1024, 512])
+def test_each_object_is_found_once_across_seams(tile_size):
+    image = _TaggingImage(Image.new("RGB", (WIDTH, HEIGHT)))
+    objects = synthetic_objects(WIDTH, HEIGHT, 60, seed=0)
+
+    merged, tiles, failed = detect_tiled(image, FakeTileDetector(image, objects, 0.0), tile_size=tile_size)
+
+    assert tiles == len(make_tiles(WIDTH, HEIGHT, tile_size))
+    assert failed == 0
+    assert check(merged.to_dicts(), objects) == (len(objects), 0)
+
+
+def test_failed_tiles_are_counted():
+    image = _TaggingImage(Image.new("RGB", (WIDTH, HEIGHT)))
+    objects = synthetic_objects(WIDTH, HEIGHT, 20, seed=1)
+    detector = FakeTileDetector(image, objects, 0.0)
+
+    def flaky(tile_image):
+        return None if tile_image.info["tile"][:2] == (0, 0) else detector(tile_image)
+
+    _, tiles, failed = detect_tiled(image, flaky, tile_size=1024)
+
+    assert tiles > 1
+    assert failed == 1
+
+
+def test_tiles_cover_the_image():
+    tiles = make_tiles(WIDTH, HEIGHT, 1024, overlap=0.2)
+    assert {(right, bottom) for _, _, right, bottom in tiles} >= {(WIDTH, HEIGHT)}
+    assert all(right - left <= 1024 and bottom - top <= 1024 for left, top, right, bottom in tiles)
+    assert make_tiles(500, 400, 1024) == [(0, 0, 500, 400)]
+
+
+def test_nms_suppresses_overlaps_within_a_class_only():
+    boxes = np.array([[0, 0, 100, 100], [5, 5, 100, 100], [0, 0, 100, 100], [300, 300, 400, 400]])
+    scores = np.array([1.0, 0.9, 0.8, 0.7])
+    labels = np.array([0, 0, 1, 0])
+
+    keep = nms_per_class(boxes, scores, labels)
+
+    assert keep.tolist() == [0, 2, 3]
+
+
+def test_nms_drops_boxes_contained_in_a_larger_one():
+    boxes = np.array([[0, 0, 200, 200], [10, 10, 150, 150]])
+    keep = nms_per_class(boxes, np.array([2.0, 1.0]), np.array([0, 0]))
+    assert keep.tolist() == [0]
+
+
+def test_seam_fragments_fuse_into_one_box():
+    # One object cut by a vertical seam at x=100, and an unrelated box of another label.
+    boxes = np.array([[40, 10, 101, 90], [99, 12, 160, 88], [99, 12, 160, 88]])
+    labels = np.array([0, 0, 1])
+    clipped = np.array([True, True, True])
+
+    fused, sources = fuse_seam_fragments(boxes, labels, clipped)
+
+    assert sources.tolist() == [0, 2]
+    assert fused[0].tolist() == [40, 10, 160, 90]
+    assert fused[1].tolist() == [99, 12, 160, 88]
+
+
+def test_unclipped_neighbours_stay_apart():
+    boxes = np.array([[0, 0, 50, 50], [40, 0, 90, 50]])
+    fused, sources = fuse_seam_fragments(boxes, np.array([0, 0]), np.array([False, False]))
+    assert sources.tolist() == [0, 1]
+    assert fused.tolist() == boxes.tolist()
@@ -0,0 +1,310 @@
+import io
+import math
+import struct
+import time
+import wave
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Uncompressed formats worth preparing; compressed uploads are already small and are sent as they are.
+SUPPORTED_SUFFIXES = (".wav", ".aif", ".aiff")
+# Speech needs little above 8 kHz, so 16 kHz mono keeps it intact at a fraction of the size.
+DEFAULT_SAMPLE_RATE = 16000
+# Gemini bills audio by duration, not by sample rate or channels.
+TOKENS_PER_SECOND = 32
+
+# Voice activity detection works on frames of FRAME_SECONDS. A frame is voiced when its
+# energy is SPEECH_MARGIN_DB above the noise floor (a low percentile of all frame
+# energies) and above ABSOLUTE_FLOOR_DB, the level of near-digital silence.
+FRAME_SECONDS = 0.03
+NOISE_PERCENTILE = 10
+SPEECH_MARGIN_DB = 12.0
+ABSOLUTE_FLOOR_DB = -55.0
+# Only silences at least this long are dropped, and this much audio is kept on
+# either side of speech so word onsets and tails are not clipped.
+DEFAULT_MIN_SILENCE = 1.0
+DEFAULT_PADDING = 0.25
+# Taps of the anti-aliasing filter applied before downsampling.
+FILTER_TAPS = 63
+
+
+class TimeMap:
+    """
+    Maps positions in prepared audio back to the original recording.
+
+    Each span is (prepared start, original start, duration) in seconds; the
+    spans are the stretches of audio kept, in order.
+    """
+
+    def __init__(self, spans: List[Tuple[float, float, float]]):
+        self.spans = spans
+        self._starts = np.array([start for start, _, _ in spans])
+
+    def to_original(self, seconds: float) -> float:
+        """The original position of a point in the prepared audio."""
+        if not self.spans:
+            return seconds
+        i = max(0, int(np.searchsorted(self._starts, seconds, side="right")) - 1)
+        start, original_start, duration = self.spans[i]
+        return original_start + min(max(0.0, seconds - start), duration)
+
+    def as_rows(self) -> List[Dict[str, Any]]:
+        return [
+            {"prepared_start_s": round(start, 2), "original_start_s": round(original, 2), "duration_s": round(duration, 2)}
+            for start, original, duration in self.spans
+        ]
+
+
+class AudioBytes(io.BytesIO):
+    """A prepared WAV file with the name/type/size attributes upload_file_to_gemini expects."""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+        self.type = "audio/wav"
+        self.size = len(data)
+
+
+class PreparedAudio:
+    """A recording as it will be uploaded, with what preparing it saved."""
+
+    def __init__(
+        self,
+        data: bytes,
+        sample_rate: int,
+        duration: float,
+        original_bytes: int,
+        original_duration: float,
+        time_map: TimeMap,
+        seconds: float,
+    ):
+        self.data = data
+        self.sample_rate = sample_rate
+        self.duration = duration
+        self.original_bytes = original_bytes
+        self.original_duration = original_duration
+        self.time_map = time_map
+        self.seconds = seconds
+
+    def as_file(self, name: str) -> AudioBytes:
+        stem = name.rsplit(".", 1)[0]
+        return AudioBytes(self.data, f"{stem}.prepared.wav")
+
+    def as_row(self) -> Dict[str, Any]:
+        return {
+            "original_mb": round(self.original_bytes / (1024 * 1024), 2),
+            "sent_mb": round(len(self.data) / (1024 * 1024), 2),
+            "original_s": round(self.original_duration, 1),
+            "sent_s": round(self.duration, 1),
+            "original_tokens": estimate_audio_tokens(self.original_duration),
+            "sent_tokens": estimate_audio_tokens(self.duration),
+            "preprocess_s": round(self.seconds, 2),
+        }
+
+
+def estimate_audio_tokens(seconds: float) -> int:
+    return math.ceil(seconds * TOKENS_PER_SECOND)
+
+
+def _pcm_to_float(frames: bytes, sample_width: int, channels: int, big_endian: bool = False) -> np.ndarray:
+    """Decodes interleaved integer PCM into a (samples, channels) float32 array in [-1, 1]."""
+    if sample_width == 1:
+        # 8-bit WAV is unsigned; 8-bit AIFF is signed.
+        samples = np.frombuffer(frames, np.int8 if big_endian else np.uint8).astype(np.float32)
+        samples = samples / 128.0 if big_endian else (samples - 128.0) / 128.0
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, np.uint8).reshape(-1, 3).astype(np.int32)
+        if big_endian:
+            raw = raw[:, ::-1]
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values >= 1 << 23, values - (1 << 24), values)
+        samples = values.astype(np.float32) / float(1 << 23)
+    elif sample_width in (2, 4):
+        dtype = np.dtype(f"{'>' if big_endian else '<'}i{sample_width}")
+        samples = np.frombuffer(frames, dtype).astype(np.float32) / float(1 << (8 * sample_width - 1))
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width} bytes")
+    return samples.reshape(-1, channels)
+
+
+def _extended_to_float(data: bytes) -> float:
+    """Decodes the 80-bit IEEE extended float AIFF uses for the sample rate."""
+    exponent, mantissa = struct.unpack(">HQ", data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+
+def _read_aiff(data: bytes) -> Tuple[np.ndarray, int]:
+    if data[:4] != b"FORM" or data[8:12] not in (b"AIFF", b"AIFC"):
+        raise ValueError("Not an AIFF file")
+    position = 12
+    channels = sample_width = sample_rate = None
+    frames = None
+    little_endian = False
+    while position + 8 <= len(data):
+        chunk_id, size = struct.unpack(">4sI", data[position:position + 8])
+        body = data[position + 8:position + 8 + size]
+        if chunk_id == b"COMM":
+            channels, _, bits = struct.unpack(">hIh", body[:8])
+            sample_width = (bits + 7) // 8
+            sample_rate = int(_extended_to_float(body[8:18]))
+            compression = body[18:22] if data[8:12] == b"AIFC" else b"NONE"
+            if compression not in (b"NONE", b"sowt"):
+                raise ValueError(f"Compressed AIFF ({compression.decode('ascii', 'replace')}) is not supported")
+            little_endian = compression == b"sowt"
+        elif chunk_id == b"SSND":
+            offset = struct.unpack(">I", body[:4])[0]
+            frames = body[8 + offset:]
+        # Chunks are padded to an even length.
+        position += 8 + size + (size & 1)
+    if channels is None or frames is None:
+        raise ValueError("AIFF file has no COMM or SSND chunk")
+    usable = len(frames) - len(frames) % (sample_width * channels)
+    return _pcm_to_float(frames[:usable], sample_width, channels, big_endian=not little_endian), sample_rate
+
+
+def read_pcm(data: bytes) -> Tuple[np.ndarray, int]:
+    """Decodes a PCM WAV or AIFF file into a (samples, channels) float32 array and its sample rate."""
+    if data[:4] == b"FORM":
+        return _read_aiff(data)
+    try:
+        with wave.open(io.BytesIO(data), "rb") as reader:
+            params = reader.getparams()
+            frames = reader.readframes(params.nframes)
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Unsupported WAV file: {e}") from e
+    return _pcm_to_float(frames, params.sampwidth, params.nchannels), params.framerate
+
+
+def write_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encodes mono float samples as a 16-bit PCM WAV file."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    output = io.BytesIO()
+    with wave.open(output, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(pcm.tobytes())
+    return output.getvalue()
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resamples mono audio to target_rate.
+
+    Downsampling first applies a windowed-sinc low-pass filter at the new
+    Nyquist frequency, so content above it does not fold back as noise;
+    the new samples are then interpolated linearly.
+    """
+    if sample_rate == target_rate or len(samples) == 0:
+        return samples
+    if target_rate < sample_rate:
+        cutoff = 0.5 * target_rate / sample_rate
+        n = np.arange(FILTER_TAPS) - (FILTER_TAPS - 1) / 2
+        taps = (2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(FILTER_TAPS)).astype(np.float32)
+        samples = np.convolve(samples, taps / taps.sum(), mode="same")
+    count = int(round(len(samples) * target_rate / sample_rate))
+    positions = np.arange(count) * (sample_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def voiced_frames(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """One boolean per FRAME_SECONDS frame: whether its energy stands out from the noise floor."""
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    count = len(samples) // frame
+    if count == 0:
+        return np.ones(1 if len(samples) else 0, dtype=bool)
+    frames = samples[:count * frame].reshape(count, frame)
+    energy_db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-12)
+    threshold = max(np.percentile(energy_db, NOISE_PERCENTILE) + SPEECH_MARGIN_DB, ABSOLUTE_FLOOR_DB)
+    voiced = energy_db > threshold
+    if len(samples) > count * frame:
+        # The partial last frame follows its neighbour.
+        voiced = np.append(voiced, voiced[-1])
+    return voiced
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """(start, end) index pairs of the True runs in mask."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def keep_mask(
+    samples: np.ndarray,
+    sample_rate: int,
+    min_silence: float = DEFAULT_MIN_SILENCE,
+    padding: float = DEFAULT_PADDING,
+) -> np.ndarray:
+    """
+    Per-frame mask of the audio to keep: speech plus padding, and every silence shorter than min_silence.
+
+    A recording with no detectable speech is kept whole rather than dropped.
+    """
+    voiced = voiced_frames(samples, sample_rate)
+    if not voiced.any():
+        return np.ones_like(voiced)
+    pad = int(round(padding / FRAME_SECONDS))
+    if pad:
+        voiced = np.convolve(voiced, np.ones(2 * pad + 1), mode="same") > 0
+    keep = voiced.copy()
+    min_frames = int(round(min_silence / FRAME_SECONDS))
+    for start, end in _runs(~voiced):
+        if end - start < min_frames:
+            keep[start:end] = True
+    return keep
+
+
+def trim_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    min_silence: float = DEFAULT_MIN_SILENCE,
+    padding: float = DEFAULT_PADDING,
+) -> Tuple[np.ndarray, TimeMap]:
+    """Drops long silences from mono audio; returns the shortened audio and its TimeMap."""
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    keep = keep_mask(samples, sample_rate, min_silence, padding)
+    pieces = []
+    spans = []
+    prepared_start = 0
+    for start, end in _runs(keep):
+        first, last = start * frame, min(end * frame, len(samples))
+        pieces.append(samples[first:last])
+        spans.append((prepared_start / sample_rate, first / sample_rate, (last - first) / sample_rate))
+        prepared_start += last - first
+    trimmed = np.concatenate(pieces) if pieces else samples[:0]
+    return trimmed, TimeMap(spans)
+
+
+def prepare_audio(
+    data: bytes,
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    trim: bool = True,
+    min_silence: float = DEFAULT_MIN_SILENCE,
+    padding: float = DEFAULT_PADDING,
+) -> PreparedAudio:
+    """
+    Downmixes a PCM WAV or AIFF recording to mono, resamples it to sample_rate and, with trim, drops long silences.
+
+    Raises ValueError for files read_pcm cannot decode; callers then send
+    the original instead. Recordings already at or below sample_rate are not
+    upsampled.
+    """
+    started = time.perf_counter()
+    samples, source_rate = read_pcm(data)
+    original_duration = len(samples) / source_rate
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    target_rate = min(sample_rate, source_rate)
+    mono = resample(mono, source_rate, target_rate)
+    if trim:
+        mono, time_map = trim_silence(mono, target_rate, min_silence, padding)
+    else:
+        time_map = TimeMap([(0.0, 0.0, len(mono) / target_rate)])
+    return PreparedAudio(
+        write_wav(mono, target_rate), target_rate, len(mono) / target_rate,
+        len(data), original_duration, time_map, time.perf_counter() - started,
+    )
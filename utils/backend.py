@@ -0,0 +1,54 @@
+"""
+Chooses the implementation of the google.generativeai API used by the app.
+
+GENAI_BACKEND=simulated (in the environment or .env) swaps in
+utils.simulated_genai, so every flow can run offline for benchmarks and
+demos. Anything else uses the real SDK. Modules import genai and caching
+from here instead of from google.generativeai.
+
+Both are imported on first use rather than here: the SDK takes most of a
+second to import, which every Streamlit cold start and CLI run would pay
+even when no API call is made.
+"""
+import importlib
+import os
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKEND = os.getenv("GENAI_BACKEND", "google").strip().lower()
+
+
+class _LazyModule:
+    """Stands in for a module (or one of its attributes) and imports it on first attribute access."""
+
+    def __init__(self, module: str, attribute: Optional[str] = None):
+        object.__setattr__(self, "_module", module)
+        object.__setattr__(self, "_attribute", attribute)
+
+    def _target(self) -> Any:
+        # importlib caches the module and serializes concurrent first imports.
+        target = importlib.import_module(self._module)
+        return getattr(target, self._attribute) if self._attribute else target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Patching e.g. genai.upload_file in a benchmark patches the real module.
+        setattr(self._target(), name, value)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._module}{'.' + self._attribute if self._attribute else ''}>"
+
+
+if BACKEND == "simulated":
+    genai = _LazyModule("utils.simulated_genai")
+    caching = _LazyModule("utils.simulated_genai", "caching")
+else:
+    genai = _LazyModule("google.generativeai")
+    caching = _LazyModule("google.generativeai.caching")
+
+__all__ = ["BACKEND", "genai", "caching"]
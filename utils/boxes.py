@@ -0,0 +1,162 @@
+import json
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# Column order of BoxArray.coords.
+COORD_KEYS = ("xmin", "ymin", "xmax", "ymax")
+NORMALIZED_SCALE = 1000
+
+
+class BoxArray:
+    """
+    A compact set of labelled boxes.
+
+    coords is an (N, 4) float array of xmin, ymin, xmax, ymax and label_ids is
+    an (N,) int array indexing into labels, so repeated names are stored once.
+    Scaling, clipping and filtering work on whole arrays; to_dicts() produces
+    the per-box dicts the UI uses.
+    """
+
+    __slots__ = ("coords", "label_ids", "labels")
+
+    def __init__(self, coords: np.ndarray, label_ids: np.ndarray, labels: Sequence[str]):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+        self.label_ids = np.asarray(label_ids, dtype=np.int64)
+        self.labels = list(labels)
+
+    @classmethod
+    def empty(cls) -> "BoxArray":
+        return cls(np.empty((0, 4)), np.empty(0, dtype=np.int64), [])
+
+    @classmethod
+    def from_names(cls, coords: np.ndarray, names: Iterable[str]) -> "BoxArray":
+        labels, label_ids = np.unique(np.asarray(list(names), dtype=object).astype(str), return_inverse=True)
+        return cls(coords, label_ids.reshape(-1), labels.tolist())
+
+    @classmethod
+    def from_dicts(cls, boxes: List[Dict[str, Any]]) -> "BoxArray":
+        """Builds a BoxArray from dicts with name, xmin, ymin, xmax and ymax keys."""
+        if not boxes:
+            return cls.empty()
+        coords = np.array([[box[key] for key in COORD_KEYS] for box in boxes], dtype=np.float64)
+        return cls.from_names(coords, (box["name"] for box in boxes))
+
+    @classmethod
+    def coerce(cls, boxes) -> "BoxArray":
+        return boxes if isinstance(boxes, BoxArray) else cls.from_dicts(boxes)
+
+    @classmethod
+    def concatenate(cls, arrays: List["BoxArray"]) -> "BoxArray":
+        arrays = [a for a in arrays if len(a)]
+        if not arrays:
+            return cls.empty()
+        coords = np.concatenate([a.coords for a in arrays])
+        return cls.from_names(coords, (name for a in arrays for name in a.names))
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    @property
+    def names(self) -> List[str]:
+        labels = self.labels
+        return [labels[i] for i in self.label_ids.tolist()]
+
+    def select(self, mask_or_indices) -> "BoxArray":
+        return BoxArray(self.coords[mask_or_indices], self.label_ids[mask_or_indices], self.labels)
+
+    def translate(self, dx: float, dy: float) -> "BoxArray":
+        return BoxArray(self.coords + np.array([dx, dy, dx, dy]), self.label_ids, self.labels)
+
+    def scale(self, sx: float, sy: float) -> "BoxArray":
+        return BoxArray(self.coords * np.array([sx, sy, sx, sy]), self.label_ids, self.labels)
+
+    def clip(self, width: int, height: int) -> "BoxArray":
+        limits = np.array([width, height, width, height])
+        return BoxArray(np.clip(self.coords, 0, limits), self.label_ids, self.labels)
+
+    def valid_mask(self, width: int, height: int) -> np.ndarray:
+        """True for boxes with 0 <= min < max <= size on both axes."""
+        xmin, ymin, xmax, ymax = self.coords.T
+        return (
+            (0 <= xmin) & (xmin < xmax) & (xmax <= width)
+            & (0 <= ymin) & (ymin < ymax) & (ymax <= height)
+        )
+
+    def areas(self) -> np.ndarray:
+        xmin, ymin, xmax, ymax = self.coords.T
+        return np.maximum(xmax - xmin, 0) * np.maximum(ymax - ymin, 0)
+
+    def to_pixel(self, image_width: int, image_height: int) -> "BoxArray":
+        """
+        Converts 0-1000 normalized coordinates to integer pixels and drops invalid boxes.
+
+        Matches the original per-box conversion: scale, truncate to int, then
+        keep only boxes with 0 <= min < max <= size.
+        """
+        size = np.array([image_width, image_height, image_width, image_height], dtype=np.float64)
+        # Same operation order as (value / 1000) * size, so results match bit for bit.
+        pixels = BoxArray(np.trunc(self.coords / NORMALIZED_SCALE * size), self.label_ids, self.labels)
+        return pixels.select(pixels.valid_mask(image_width, image_height))
+
+    def to_columns(self, image_width: int, image_height: int) -> Dict[str, list]:
+        """
+        Returns pixel boxes as columns for a results table.
+
+        Each column is one list: name, the integer pixel coordinates, the same
+        coordinates normalized to 0-1000 (one decimal) and the area in pixels.
+        """
+        size = np.array([image_width, image_height, image_width, image_height], dtype=np.float64)
+        pixels = self.coords.astype(np.int64)
+        normalized = np.round(self.coords / size * NORMALIZED_SCALE, 1)
+        columns: Dict[str, list] = {"name": self.names}
+        for i, key in enumerate(COORD_KEYS):
+            columns[key] = pixels[:, i].tolist()
+        for i, key in enumerate(COORD_KEYS):
+            columns[f"norm_{key}"] = normalized[:, i].tolist()
+        columns["area"] = self.areas().astype(np.int64).tolist()
+        return columns
+
+    def to_dicts(self, integer: bool = True) -> List[Dict[str, Any]]:
+        coords = self.coords.astype(np.int64) if integer else self.coords
+        return [
+            {"name": name, "xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax}
+            for name, xmin, ymin, xmax, ymax in zip(self.names, *coords.T.tolist())
+        ]
+
+
+def parse_box_array(response_text: str, validator=None) -> BoxArray:
+    """
+    Parses a JSON array of normalized boxes straight into a BoxArray.
+
+    The common, well-formed case is checked in bulk. When a box is missing a
+    key or has a value of the wrong type, validator (typically
+    utils.util.parse_bounding_boxes) is run to raise its detailed ValueError.
+    """
+    try:
+        boxes = json.loads(response_text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON response: {e}")
+    if not isinstance(boxes, list):
+        raise ValueError("Response JSON is not a list.")
+    if not boxes:
+        return BoxArray.empty()
+
+    try:
+        names = [box["name"] for box in boxes]
+        values = [box[key] for box in boxes for key in COORD_KEYS]
+        # map(type, ...) runs in C; subclasses are rare enough to go to the validator.
+        well_typed = (
+            set(map(type, names)) <= {str}
+            and set(map(type, values)) <= {int, float, bool}
+        )
+    except (KeyError, TypeError):
+        well_typed = False
+    if not well_typed:
+        if validator is not None:
+            validator(response_text)
+        raise ValueError("Bounding boxes have missing keys or values of the wrong type.")
+
+    coords = np.array(values, dtype=np.float64).reshape(-1, 4)
+    return BoxArray.from_names(coords, names)
+
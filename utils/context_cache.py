@@ -0,0 +1,203 @@
+import datetime
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from utils.backend import genai
+
+from utils.model import create_context_cache
+from utils.scheduler import INTERACTIVE, ScheduledModel
+
+# Caches are also deleted from the reaper thread, where no session's reporter applies.
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_MINUTES = 10
+REAPER_INTERVAL_SECONDS = 60
+
+VIDEO_QA_INSTRUCTION = (
+    "You are an expert video analyst. Answer questions about the provided video "
+    "accurately and concisely, citing timestamps (MM:SS) where relevant."
+)
+
+
+class CachedContext:
+    """A context cache holding one processed file, plus the bookkeeping to keep it alive."""
+
+    def __init__(self, file_name: str, cache: Any, ttl_minutes: float):
+        self.file_name = file_name
+        self.cache = cache
+        self.name = cache.name
+        self.ttl_minutes = ttl_minutes
+        usage = getattr(cache, "usage_metadata", None)
+        self.token_count = getattr(usage, "total_token_count", 0) or 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.expires_at = self.created_at + ttl_minutes * 60
+        self.questions = 0
+        # Sessions that asked about the file; their heartbeats keep the cache alive.
+        self.sessions: Set[str] = set()
+        self.model = ScheduledModel(genai.GenerativeModel.from_cached_content(cached_content=cache), INTERACTIVE)
+
+    def as_row(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "cache": self.name,
+            "file": self.file_name,
+            "tokens": self.token_count,
+            "questions": self.questions,
+            "expires_in_s": max(0, int(self.expires_at - now)),
+            "idle_s": int(now - self.last_used),
+        }
+
+
+class ContextCacheManager:
+    """
+    Creates one context cache per processed file and manages its lifetime.
+
+    Caches are reused for follow-up questions, their TTL is extended while
+    they are in use or a session that used them sends heartbeats, and a
+    background reaper deletes caches that have been idle for longer than
+    idle_seconds. idle_seconds defaults to half the TTL and must be shorter
+    than it, or caches would expire on the server before they count as idle.
+    """
+
+    def __init__(
+        self,
+        ttl_minutes: float = DEFAULT_TTL_MINUTES,
+        idle_seconds: Optional[float] = None,
+        reaper_interval: float = REAPER_INTERVAL_SECONDS,
+    ):
+        if idle_seconds is None:
+            # Half the TTL, so an abandoned cache is deleted before the server would expire it.
+            idle_seconds = ttl_minutes * 30
+        if idle_seconds >= ttl_minutes * 60:
+            raise ValueError("idle_seconds must be shorter than the cache TTL.")
+        self.ttl_minutes = ttl_minutes
+        self.idle_seconds = idle_seconds
+        self.reaper_interval = reaper_interval
+        self._contexts: Dict[str, CachedContext] = {}
+        self._lock = threading.Lock()
+        self._reaper = threading.Thread(target=self._reap_forever, name="context-cache-reaper", daemon=True)
+        self._reaper.start()
+
+    def get_or_create(
+        self,
+        processed_file,
+        system_instruction: str = VIDEO_QA_INSTRUCTION,
+        session_id: Optional[str] = None,
+    ) -> CachedContext:
+        """Returns the context cache for a processed file, creating it on first use; session_id marks it as used by that session."""
+        with self._lock:
+            context = self._contexts.get(processed_file.name)
+            if context is not None and context.expires_at > time.time():
+                if session_id is not None:
+                    context.sessions.add(session_id)
+                return context
+        cache = create_context_cache(
+            contents=[processed_file],
+            display_name=f"qa-{processed_file.display_name or processed_file.name}"[:128],
+            system_instruction=system_instruction,
+            ttl_minutes=self.ttl_minutes,
+        )
+        context = CachedContext(processed_file.name, cache, self.ttl_minutes)
+        if session_id is not None:
+            context.sessions.add(session_id)
+        with self._lock:
+            previous = self._contexts.get(processed_file.name)
+            self._contexts[processed_file.name] = context
+        if previous is not None:
+            self._delete(previous)
+        return context
+
+    def touch(self, context: CachedContext) -> None:
+        """Marks a context as in use and extends its TTL once half of it has elapsed."""
+        now = time.time()
+        context.last_used = now
+        if context.expires_at - now < context.ttl_minutes * 30:
+            context.cache.update(ttl=datetime.timedelta(minutes=context.ttl_minutes))
+            context.expires_at = now + context.ttl_minutes * 60
+
+    def heartbeat(self, session_id: str) -> int:
+        """Touches every live cache the session has used; returns how many."""
+        now = time.time()
+        with self._lock:
+            contexts = [
+                context for context in self._contexts.values()
+                if session_id in context.sessions and context.expires_at > now
+            ]
+        for context in contexts:
+            try:
+                self.touch(context)
+            except Exception as e:
+                logger.warning("Could not extend context cache %s: %s", context.name, e)
+        return len(contexts)
+
+    def ask(self, context: CachedContext, question: str) -> Dict[str, Any]:
+        """Answers a question against the cached context and reports latency and token usage."""
+        self.touch(context)
+        start = time.perf_counter()
+        response = context.model.generate_content(question)
+        latency = time.perf_counter() - start
+        context.questions += 1
+        return {
+            "question": question,
+            "answer": response.text,
+            "latency_s": round(latency, 2),
+            **usage_counts(response),
+        }
+
+    def reap_idle(self) -> int:
+        """Deletes caches that are idle or already expired; returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            doomed = [
+                name for name, context in self._contexts.items()
+                if now - context.last_used > self.idle_seconds or context.expires_at <= now
+            ]
+            removed = [self._contexts.pop(name) for name in doomed]
+        for context in removed:
+            self._delete(context)
+        return len(removed)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [context.as_row() for context in self._contexts.values()]
+
+    def _delete(self, context: CachedContext) -> None:
+        try:
+            context.cache.delete()
+        except Exception as e:
+            # The cache may already have expired on the server.
+            logger.warning("Could not delete context cache %s: %s", context.name, e)
+
+    def _reap_forever(self) -> None:
+        while True:
+            time.sleep(self.reaper_interval)
+            self.reap_idle()
+
+
+def usage_counts(response) -> Dict[str, int]:
+    """Splits a response's input tokens into cached and freshly sent tokens."""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+    return {
+        "input_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "uncached_input_tokens": prompt_tokens - cached_tokens,
+        "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+    }
+
+
+_manager: Optional[ContextCacheManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_context_cache_manager() -> ContextCacheManager:
+    """Returns the process-wide context cache manager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ContextCacheManager()
+        return _manager
@@ -0,0 +1,307 @@
+import csv
+import io
+import json
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from PIL import Image
+
+from utils.boxes import BoxArray, parse_box_array
+from utils.context_cache import usage_counts
+from utils.image_preprocess import DEFAULT_MAX_SIDE, EncodedImage, prepare_image
+from utils.metrics import record_usage, span, stream_span
+from utils.reporter import get_reporter
+from utils.result_cache import get_result_cache, make_key
+from utils.stream_parser import BoxStreamParser
+from utils.util import (
+    hash_image,
+    parse_bounding_boxes,
+    remove_markdown,
+)
+
+
+# A reply that fails validation is retried at most this many times.
+MAX_REPAIRS = 1
+
+REPAIR_PROMPT = (
+    "Your previous reply could not be used: {error}. "
+    "Reply again with only the JSON array of boxes."
+)
+
+
+class DetectionStats:
+    """
+    Counters for the model calls made by detect_boxes.
+
+    Pass the same instance to several calls to aggregate them. requests counts
+    detections that reached the model (cache hits are not counted); repaired
+    and salvaged count requests rescued by a retry or by keeping the boxes
+    of a truncated reply.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.model_calls = 0
+        self.repaired = 0
+        self.salvaged = 0
+        self.failed = 0
+        self.output_tokens = 0
+        self.model_seconds = 0.0
+
+
+def detection_prompt(object_name: str, structured: bool = True) -> str:
+    if structured:
+        # The response schema fixes the output format, so the prompt only describes the task.
+        return (
+            f"Detect every {object_name} in the image. Name each one as specifically as you can "
+            "(for a dog, its breed) and give its bounding box normalized to 0-1000."
+        )
+    # Define the dynamic prompt with the user-specified object
+    return f""" 
+        You are given an image. Identify all {object_name} in the image and provide their bounding boxes. 
+        Return ONLY a valid JSON array in the exact format shown below. 
+        return specific name , let say if it's a dog and you know the dog breed name return that.
+        Do NOT include any additional text, explanations, comments, trailing commas, or markdown formatting such as code blocks.
+        Use this JSON schema:
+        [
+            {{
+                "name": "string",
+                "ymin": float,
+                "xmin": float,
+                "ymax": float,
+                "xmax": float
+            }}
+        ]
+        """
+
+
+def _truncated(response) -> bool:
+    try:
+        return response.candidates[0].finish_reason.name == "MAX_TOKENS"
+    except (AttributeError, IndexError):
+        return False
+
+
+def _request_boxes(model: Any, payload: EncodedImage, prompt: str, structured: bool, stats: DetectionStats) -> BoxArray:
+    """
+    Asks the model for boxes, repairing a reply that fails validation.
+
+    A reply cut off by the output limit keeps the boxes that did complete,
+    since asking again would hit the same limit. Any other invalid reply is
+    sent back once with the validation error. Raises ValueError when every
+    attempt fails; errors from the model call itself propagate.
+    """
+    stats.requests += 1
+    contents = [payload.as_part(), prompt]
+    for attempt in range(MAX_REPAIRS + 1):
+        started = time.perf_counter()
+        response = model.generate_content(contents)
+        stats.model_seconds += time.perf_counter() - started
+        stats.model_calls += 1
+        stats.output_tokens += usage_counts(response)["output_tokens"]
+        record_usage(response)
+
+        # JSON mode replies are plain JSON; remove_markdown would also strip underscores from labels.
+        text = response.text if structured else remove_markdown(response.text)
+        try:
+            with span("parse_boxes") as timing:
+                timing.add_bytes(len(text))
+                boxes = parse_box_array(text, validator=parse_bounding_boxes)
+        except ValueError as ve:
+            error = ve
+        else:
+            if attempt:
+                stats.repaired += 1
+            return boxes
+
+        if _truncated(response):
+            salvaged = BoxStreamParser().feed(text)
+            if salvaged:
+                stats.salvaged += 1
+                return BoxArray.from_dicts(salvaged)
+        contents = [payload.as_part(), prompt, REPAIR_PROMPT.format(error=error)]
+    stats.failed += 1
+    raise error
+
+
+def detect_boxes(
+    image: Image.Image,
+    object_name: str,
+    model: Any,
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    use_cache: bool = True,
+    structured: bool = True,
+    stats: Optional[DetectionStats] = None,
+    digest: Optional[str] = None,
+) -> Optional[BoxArray]:
+    """
+    Detects objects in an image and returns their boxes as pixel coordinates in a BoxArray.
+
+    structured selects the short prompt for a model built by
+    load_detection_model(); pass False for a plain model that has to be told
+    the output format. digest identifies the image for the caches; pass the
+    hash of the uploaded file when there is one, so the decoded pixels need
+    not be hashed. Returns None if the model call or response parsing fails.
+    """
+    digest = digest or hash_image(image)
+    return _detect(
+        digest, image.size, lambda: prepare_image(image, digest, max_side),
+        object_name, model, max_side, use_cache, structured, stats,
+    )
+
+
+def detect_encoded(
+    payload: EncodedImage,
+    digest: str,
+    object_name: str,
+    model: Any,
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    use_cache: bool = True,
+    structured: bool = True,
+    stats: Optional[DetectionStats] = None,
+) -> Optional[BoxArray]:
+    """
+    detect_boxes for an image already hashed and encoded, e.g. on a worker process.
+
+    payload must come from encode_image or prepare_image with the same
+    max_side. digest identifies the image for the caches as in
+    detect_boxes: the hash of the file's bytes (hash_file_content), or
+    hash_image of the decoded image when there is no file.
+    """
+    return _detect(
+        digest, payload.original_size, lambda: payload,
+        object_name, model, max_side, use_cache, structured, stats,
+    )
+
+
+def _detect(
+    digest: str,
+    image_size,
+    load_payload: Callable[[], EncodedImage],
+    object_name: str,
+    model: Any,
+    max_side: Optional[int],
+    use_cache: bool,
+    structured: bool,
+    stats: Optional[DetectionStats],
+) -> Optional[BoxArray]:
+    prompt = detection_prompt(object_name, structured)
+    cache = get_result_cache() if use_cache else None
+    boxes = None
+    if cache is not None:
+        cache_key = make_key("detection", f"{digest}@{max_side}", model, prompt)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            boxes = BoxArray.from_dicts(cached)
+    if boxes is None:
+        # Boxes are normalized to 0-1000, so a downsampled payload maps back to the original size.
+        payload = load_payload()
+        try:
+            with span("detect_boxes", max_side=max_side) as timing:
+                timing.add_bytes(len(payload.data))
+                boxes = _request_boxes(model, payload, prompt, structured, stats or DetectionStats())
+        except ValueError as ve:
+            get_reporter().error(f"Error parsing bounding boxes: {ve}")
+            return None
+        except Exception as e:
+            get_reporter().error(f"Error generating content from the model: {e}")
+            return None
+        if cache is not None:
+            cache.put(cache_key, "detection", boxes.to_dicts(integer=False))
+
+    image_width, image_height = image_size
+    return boxes.to_pixel(image_width, image_height)
+
+
+def process_image(
+    image: Image.Image,
+    object_name: str,
+    model: Any,
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    use_cache: bool = True,
+    structured: bool = True,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Detects objects in an image and returns their boxes in pixel coordinates.
+
+    Returns None if the model call or response parsing fails.
+    """
+    boxes = detect_boxes(image, object_name, model, max_side, use_cache, structured)
+    return boxes.to_dicts() if boxes is not None else None
+
+
+def stream_detected_boxes(
+    image: Image.Image,
+    object_name: str,
+    model: Any,
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    use_cache: bool = True,
+    parser: Optional[BoxStreamParser] = None,
+    structured: bool = True,
+    digest: Optional[str] = None,
+) -> Iterator[BoxArray]:
+    """
+    Streams detection results, yielding pixel boxes as soon as each one is complete.
+
+    Each yielded BoxArray holds the boxes completed by one response chunk. A
+    cached result is yielded in one piece. Pass a BoxStreamParser to read its
+    parse timing and rejection count afterwards. Malformed objects are skipped
+    rather than repaired, since the boxes before them are already shown.
+    Only a reply that finished with every object intact is cached where
+    detect_boxes finds it. digest is as for detect_boxes.
+    """
+    prompt = detection_prompt(object_name, structured)
+    digest = digest or hash_image(image)
+    image_width, image_height = image.size
+    cache = get_result_cache() if use_cache else None
+    if cache is not None:
+        cache_key = make_key("detection", f"{digest}@{max_side}", model, prompt)
+        # Replies that were cut off or had malformed objects are kept apart,
+        # so detect_boxes never serves them as a complete answer.
+        stream_key = make_key("detection-stream", f"{digest}@{max_side}", model, prompt)
+        cached = cache.get(cache_key)
+        if cached is None:
+            cached = cache.get(stream_key)
+        if cached is not None:
+            yield BoxArray.from_dicts(cached).to_pixel(image_width, image_height)
+            return
+
+    parser = parser or BoxStreamParser()
+    payload = prepare_image(image, digest, max_side)
+    normalized = []
+    try:
+        with stream_span("stream_detect_boxes", max_side=max_side) as timing:
+            timing.add_bytes(len(payload.data))
+            stream = model.generate_content([payload.as_part(), prompt], stream=True)
+            for response in stream:
+                try:
+                    text = response.text
+                except ValueError:
+                    continue
+                boxes = parser.feed(text)
+                if boxes:
+                    normalized.extend(boxes)
+                    yield BoxArray.from_dicts(boxes).to_pixel(image_width, image_height)
+            # Once iterated, the stream's usage_metadata is that of the whole reply.
+            timing.record_usage(stream)
+    except Exception as e:
+        get_reporter().error(f"Error generating content from the model: {e}")
+        return
+    if cache is not None:
+        complete = not _truncated(stream) and not parser.pending and parser.rejected == 0
+        cache.put(cache_key if complete else stream_key, "detection", normalized)
+
+
+def detections_to_csv(columns: Dict[str, list]) -> str:
+    """Writes BoxArray.to_columns() output as CSV, one row per box."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    writer.writerows(zip(*columns.values()))
+    return output.getvalue()
+
+
+def detections_to_json(columns: Dict[str, list]) -> str:
+    """Writes BoxArray.to_columns() output as a JSON array of row objects."""
+    keys = list(columns)
+    return json.dumps([dict(zip(keys, row)) for row in zip(*columns.values())], ensure_ascii=False, indent=2)
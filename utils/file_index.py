@@ -0,0 +1,362 @@
+import contextlib
+import itertools
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from utils.backend import genai
+from utils.file_ops import LIST_PAGE_SIZE, DeleteReport, delete_files, delete_remote_file
+from utils.upload_cache import get_upload_cache, to_timestamp
+
+# GC runs on a background thread, where no session's reporter applies.
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.getenv("FILE_INDEX_PATH", ".cache/file_index.db")
+
+# Garbage collection of files this app uploaded. Set FILE_GC_INTERVAL_SECONDS=0 to disable it.
+GC_INTERVAL_SECONDS = float(os.getenv("FILE_GC_INTERVAL_SECONDS", 10 * 60))
+GC_MAX_AGE_HOURS = float(os.getenv("FILE_GC_MAX_AGE_HOURS", 24))
+GC_IDLE_MINUTES = float(os.getenv("FILE_GC_IDLE_MINUTES", 60))
+# How often keep_alive() heartbeats; well inside GC_IDLE_MINUTES.
+HEARTBEAT_INTERVAL_SECONDS = 60
+
+COLUMNS = (
+    "name", "display_name", "digest", "size_bytes", "mime_type", "state",
+    "create_time", "expire_time", "session_id", "last_used", "last_seen",
+)
+
+
+def _remote_fields(remote_file) -> Dict[str, Any]:
+    return {
+        "name": remote_file.name,
+        "display_name": getattr(remote_file, "display_name", None),
+        "size_bytes": getattr(remote_file, "size_bytes", None),
+        "mime_type": getattr(remote_file, "mime_type", None),
+        "state": remote_file.state.name,
+        "create_time": to_timestamp(getattr(remote_file, "create_time", None)),
+        "expire_time": to_timestamp(getattr(remote_file, "expiration_time", None)),
+    }
+
+
+class FileIndex:
+    """
+    Local SQLite index of remote files, so listings don't need a full remote scan.
+
+    Uploads are recorded with their content digest, size, MIME type and
+    owning Streamlit session; processing updates their state. sync_step()
+    reconciles the index with the File API a bounded number of files at a
+    time, and collect_garbage() deletes files this app uploaded once they are
+    too old or their session has gone away. Files found only by syncing
+    (uploaded by something else) are listed but never collected.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_INDEX_PATH,
+        list_files: Optional[Callable[..., Iterable[Any]]] = None,
+        delete_file: Optional[Callable[[str], Any]] = None,
+    ):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._list_files = list_files or genai.list_files
+        self._delete_file = delete_file or delete_remote_file
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._scan = None
+        self._scan_started = 0.0
+        self._gc_thread = None
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    name TEXT PRIMARY KEY,
+                    display_name TEXT,
+                    digest TEXT,
+                    size_bytes INTEGER,
+                    mime_type TEXT,
+                    state TEXT,
+                    create_time REAL,
+                    expire_time REAL,
+                    session_id TEXT,
+                    last_used REAL,
+                    last_seen REAL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS files_session ON files (session_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS files_create_time ON files (create_time)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, last_heartbeat REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL)")
+
+    def record_upload(self, remote_file, digest: Optional[str], size_bytes: int, mime_type: Optional[str], session_id: str) -> None:
+        """Records a file this app just uploaded, owned by session_id."""
+        fields = _remote_fields(remote_file)
+        fields.update(
+            digest=digest,
+            size_bytes=fields["size_bytes"] or size_bytes,
+            mime_type=fields["mime_type"] or mime_type,
+            session_id=session_id,
+            last_used=time.time(),
+            last_seen=time.time(),
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO files ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [fields[column] for column in COLUMNS],
+            )
+
+    def record_use(self, remote_file, session_id: str) -> None:
+        """Hands an already uploaded file (e.g. an upload cache hit) to the session now using it."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE files SET session_id = ?, last_used = ?, state = ? WHERE name = ?",
+                (session_id, now, remote_file.state.name, remote_file.name),
+            )
+
+    def update_state(self, remote_file) -> None:
+        fields = _remote_fields(remote_file)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE files SET state = ?, expire_time = COALESCE(?, expire_time), last_seen = ? WHERE name = ?",
+                (fields["state"], fields["expire_time"], time.time(), fields["name"]),
+            )
+
+    def heartbeat(self, session_id: str) -> None:
+        """Marks a session as alive, which keeps its files from being collected as orphans."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?)", (session_id, time.time()))
+
+    @contextlib.contextmanager
+    def keep_alive(self, session_id: str, interval: float = HEARTBEAT_INTERVAL_SECONDS) -> Iterator[None]:
+        """
+        Heartbeats session_id every interval seconds while the block runs.
+
+        The app heartbeats on every rerun; processes without reruns, such as
+        cli.py, use this so the app's GC does not take their files for
+        orphans while a long job is still working on them.
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    self.heartbeat(session_id)
+                except Exception as e:
+                    logger.warning("Heartbeat for %s failed: %s", session_id, e)
+
+        self.heartbeat(session_id)
+        thread = threading.Thread(target=beat, name="file-index-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def prune_sessions(self, idle_minutes: Optional[float] = GC_IDLE_MINUTES) -> int:
+        """
+        Drops sessions with no heartbeat for idle_minutes; returns how many.
+
+        gc_candidates() treats a missing session like an idle one, so this
+        changes nothing about which files are collected.
+        """
+        if not idle_minutes:
+            return 0
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE last_heartbeat < ?", (time.time() - idle_minutes * 60,))
+        return cursor.rowcount
+
+    def remove(self, names: Sequence[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM files WHERE name = ?", [(name,) for name in names])
+
+    def _where(self, name_prefix: str, states: Optional[Sequence[str]], min_age_hours: Optional[float]):
+        clauses, params = ["(expire_time IS NULL OR expire_time > ?)"], [time.time()]
+        prefix = name_prefix.strip()
+        if prefix:
+            # GLOB is case-sensitive, matching str.startswith in iter_files().
+            pattern = prefix.replace("[", "[[]").replace("*", "[*]").replace("?", "[?]") + "*"
+            clauses.append("(display_name GLOB ? OR name GLOB ? OR name GLOB ?)")
+            params += [pattern, pattern, "files/" + pattern]
+        if states:
+            clauses.append(f"state IN ({', '.join('?' * len(states))})")
+            params += list(states)
+        if min_age_hours:
+            clauses.append("create_time <= ?")
+            params.append(time.time() - min_age_hours * 3600)
+        return " AND ".join(clauses), params
+
+    def query(
+        self,
+        name_prefix: str = "",
+        states: Optional[Sequence[str]] = None,
+        min_age_hours: Optional[float] = None,
+        limit: int = 25,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Returns one page of indexed, unexpired files, newest first, using the same filters as iter_files()."""
+        where, params = self._where(name_prefix, states, min_age_hours)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM files WHERE {where} "
+                "ORDER BY create_time DESC, name LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def count(self, name_prefix: str = "", states: Optional[Sequence[str]] = None, min_age_hours: Optional[float] = None) -> int:
+        where, params = self._where(name_prefix, states, min_age_hours)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM files WHERE {where}", params).fetchone()[0]
+
+    def last_sync(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_sync'").fetchone()
+        return row[0] if row else None
+
+    def sync_step(self, max_files: int = LIST_PAGE_SIZE) -> Dict[str, int]:
+        """
+        Applies up to max_files more files from the remote listing to the index.
+
+        A scan spans as many calls as it needs; each call only touches the
+        rows that are new or changed. When the scan reaches the end of the
+        listing, indexed files it did not see (and that existed before it
+        started) are removed, and "done" is 1 in the returned counts.
+        """
+        with self._sync_lock:
+            if self._scan is None:
+                self._scan_started = time.time()
+                self._scan = iter(self._list_files(page_size=LIST_PAGE_SIZE))
+            batch = [_remote_fields(remote_file) for remote_file in itertools.islice(self._scan, max_files)]
+            done = len(batch) < max_files
+            counts = {"added": 0, "updated": 0, "removed": 0, "done": int(done)}
+
+            with self._lock, self._conn:
+                known = {}
+                for start in range(0, len(batch), 500):
+                    names = [fields["name"] for fields in batch[start:start + 500]]
+                    rows = self._conn.execute(
+                        f"SELECT name, state, expire_time FROM files WHERE name IN ({', '.join('?' * len(names))})",
+                        names,
+                    )
+                    known.update((name, (state, expire_time)) for name, state, expire_time in rows)
+                new = [fields for fields in batch if fields["name"] not in known]
+                changed = [
+                    fields for fields in batch
+                    if fields["name"] in known and known[fields["name"]] != (fields["state"], fields["expire_time"])
+                ]
+                self._conn.executemany(
+                    "INSERT INTO files (name, display_name, size_bytes, mime_type, state, create_time, expire_time, last_seen) "
+                    "VALUES (:name, :display_name, :size_bytes, :mime_type, :state, :create_time, :expire_time, :last_seen)",
+                    [dict(fields, last_seen=self._scan_started) for fields in new],
+                )
+                self._conn.executemany(
+                    "UPDATE files SET state = :state, expire_time = :expire_time WHERE name = :name",
+                    changed,
+                )
+                # Unchanged rows only need their last_seen bumped so the final sweep keeps them.
+                self._conn.executemany(
+                    "UPDATE files SET last_seen = ? WHERE name = ?",
+                    [(self._scan_started, fields["name"]) for fields in batch if fields["name"] in known],
+                )
+                counts["added"], counts["updated"] = len(new), len(changed)
+
+                if done:
+                    cursor = self._conn.execute(
+                        "DELETE FROM files WHERE COALESCE(last_seen, 0) < ? AND COALESCE(create_time, 0) < ?",
+                        (self._scan_started, self._scan_started),
+                    )
+                    counts["removed"] = cursor.rowcount
+                    self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('last_sync', ?)", (self._scan_started,))
+            if done:
+                self._scan = None
+            return counts
+
+    def sync(self) -> Dict[str, int]:
+        """Runs a complete sync scan and returns the total counts."""
+        totals = {"added": 0, "updated": 0, "removed": 0}
+        while True:
+            counts = self.sync_step()
+            for key in totals:
+                totals[key] += counts[key]
+            if counts["done"]:
+                return totals
+
+    def gc_candidates(self, max_age_hours: Optional[float] = GC_MAX_AGE_HOURS, idle_minutes: Optional[float] = GC_IDLE_MINUTES) -> List[str]:
+        """
+        Names of uploaded files to collect: older than max_age_hours, or owned by a
+        session that has sent no heartbeat (and not used the file) for idle_minutes.
+        """
+        now = time.time()
+        age_cutoff = now - max_age_hours * 3600 if max_age_hours else None
+        idle_cutoff = now - idle_minutes * 60 if idle_minutes else None
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT f.name FROM files f LEFT JOIN sessions s ON s.session_id = f.session_id
+                WHERE f.session_id IS NOT NULL AND (
+                    (? IS NOT NULL AND COALESCE(f.create_time, f.last_used) < ?)
+                    OR (? IS NOT NULL AND COALESCE(s.last_heartbeat, 0) < ? AND COALESCE(f.last_used, 0) < ?)
+                )
+                """,
+                (age_cutoff, age_cutoff, idle_cutoff, idle_cutoff, idle_cutoff),
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def collect_garbage(self, max_age_hours: Optional[float] = GC_MAX_AGE_HOURS, idle_minutes: Optional[float] = GC_IDLE_MINUTES) -> DeleteReport:
+        """
+        Deletes the gc_candidates() remotely and drops them from the index and the
+        upload cache, then prunes sessions that have gone away.
+        """
+        report = delete_files(self.gc_candidates(max_age_hours, idle_minutes), delete_file=self._delete_file)
+        self.remove(report.deleted)
+        upload_cache = get_upload_cache()
+        for name in report.deleted:
+            upload_cache.forget_file(name)
+        self.prune_sessions(idle_minutes)
+        return report
+
+    def start_background_gc(self, interval: float = GC_INTERVAL_SECONDS) -> None:
+        """
+        Starts a daemon thread that syncs and collects garbage every interval seconds.
+
+        Only the Streamlit app starts it. Short-lived processes such as cli.py
+        leave collection to the app, so they never delete remote files
+        another process is still using.
+        """
+        if interval <= 0 or self._gc_thread is not None:
+            return
+        self._gc_thread = threading.Thread(target=self._gc_forever, args=(interval,), name="file-index-gc", daemon=True)
+        self._gc_thread.start()
+
+    def _gc_forever(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.sync()
+                report = self.collect_garbage()
+                if report.total:
+                    logger.info("File GC deleted %d files, %d failed", len(report.deleted), len(report.failed))
+            except Exception as e:
+                logger.warning("File GC failed: %s", e)
+
+
+_index: Optional[FileIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_file_index() -> FileIndex:
+    """Returns the process-wide file index. Background GC is started separately, by the app."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FileIndex()
+        return _index
@@ -0,0 +1,142 @@
+import itertools
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from utils.backend import genai
+from utils.scheduler import file_api_call, retryable_errors
+from utils.upload_cache import to_timestamp
+
+DEFAULT_DELETE_WORKERS = 8
+DEFAULT_DELETE_RETRIES = 3
+RETRY_BASE_DELAY = 0.5
+# The File API returns at most 100 files per page.
+LIST_PAGE_SIZE = 100
+
+
+def delete_remote_file(name: str) -> None:
+    """Deletes one remote file under the File API quota; callers handle retries, as delete_files does."""
+    file_api_call(genai.delete_file, name, retries=0)
+
+
+def _age_seconds(file: Any, now: float) -> Optional[float]:
+    created = to_timestamp(getattr(file, "create_time", None))
+    return None if created is None else now - created
+
+
+def iter_files(
+    name_prefix: str = "",
+    states: Optional[Sequence[str]] = None,
+    min_age_hours: Optional[float] = None,
+    list_files: Optional[Callable[..., Iterable[Any]]] = None,
+) -> Iterator[Any]:
+    """
+    Lazily yields remote files matching the filters, fetching pages only as they are consumed.
+
+    name_prefix matches the start of either the display name or the file name
+    (with or without the "files/" prefix). states limits the result to files
+    in those states, e.g. ["ACTIVE"]. min_age_hours keeps files created at
+    least that long ago. list_files replaces genai.list_files, e.g. with a
+    fake in benchmarks.
+    """
+    list_files = list_files or genai.list_files
+    prefix = name_prefix.strip()
+    states = set(states) if states else None
+    now = time.time()
+    for file in list_files(page_size=LIST_PAGE_SIZE):
+        if prefix:
+            names = (file.display_name or "", file.name, file.name.split("/", 1)[-1])
+            if not any(name.startswith(prefix) for name in names):
+                continue
+        if states is not None and file.state.name not in states:
+            continue
+        if min_age_hours is not None:
+            age = _age_seconds(file, now)
+            if age is None or age < min_age_hours * 3600:
+                continue
+        yield file
+
+
+def take_page(files: Iterator[Any], page_size: int) -> List[Any]:
+    """Returns up to page_size more files from an iter_files() iterator."""
+    return list(itertools.islice(files, page_size))
+
+
+class DeleteReport:
+    """Outcome of a bulk delete: deleted names, failures with their last error, and retries made."""
+
+    def __init__(self):
+        self.deleted: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.retries = 0
+
+    @property
+    def total(self) -> int:
+        return len(self.deleted) + len(self.failed)
+
+
+def _delete_with_retry(delete_file: Callable[[str], Any], name: str, retries: int, base_delay: float) -> int:
+    """Deletes one file, retrying transient errors; returns how many retries were needed."""
+    from google.api_core import exceptions as api_exceptions
+
+    for attempt in range(retries + 1):
+        try:
+            delete_file(name)
+            return attempt
+        except api_exceptions.NotFound:
+            # Already gone, which is what we wanted.
+            return attempt
+        except retryable_errors():
+            if attempt == retries:
+                raise
+            time.sleep(base_delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+    return retries
+
+
+def delete_files(
+    names: Iterable[str],
+    max_workers: int = DEFAULT_DELETE_WORKERS,
+    retries: int = DEFAULT_DELETE_RETRIES,
+    base_delay: float = RETRY_BASE_DELAY,
+    on_progress: Optional[Callable[[DeleteReport], None]] = None,
+    delete_file: Optional[Callable[[str], Any]] = None,
+) -> DeleteReport:
+    """
+    Deletes remote files by name on a bounded thread pool.
+
+    Each file costs one delete call; there is no get_file beforehand. Names
+    are consumed lazily, so deletes start while a listing is still being
+    paged. Transient errors are retried with jittered exponential backoff
+    and a file that no longer exists counts as deleted. on_progress is called
+    on the calling thread after every completed file, so it may update
+    Streamlit elements. delete_file replaces delete_remote_file, e.g. with a
+    fake in benchmarks.
+    """
+    delete_file = delete_file or delete_remote_file
+    report = DeleteReport()
+    # Keep a couple of names queued per worker without reading the whole listing up front.
+    max_pending = max_workers * 2
+
+    def finish(done):
+        for future in done:
+            name = pending.pop(future)
+            try:
+                report.retries += future.result()
+                report.deleted.append(name)
+            except Exception as e:
+                report.failed[name] = str(e)
+            if on_progress is not None:
+                on_progress(report)
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file-delete") as pool:
+        for name in names:
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                finish(done)
+            pending[pool.submit(_delete_with_retry, delete_file, name, retries, base_delay)] = name
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            finish(done)
+    return report
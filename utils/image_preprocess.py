@@ -0,0 +1,82 @@
+import io
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+# Boxes come back normalized to 0-1000, so sending more pixels than this rarely helps.
+DEFAULT_MAX_SIDE = 1536
+JPEG_QUALITY = 80
+CACHE_ENTRIES = 32
+
+
+class EncodedImage:
+    """An image encoded for the model, with the sizes needed to map results back."""
+
+    def __init__(self, data: bytes, mime_type: str, size, original_size):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.original_size = original_size
+
+    def as_part(self) -> Dict[str, Any]:
+        """Returns the inline blob form accepted by generate_content."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def downsample(image: Image.Image, max_side: Optional[int]) -> Image.Image:
+    if not max_side or max(image.size) <= max_side:
+        return image
+    scale = max_side / max(image.size)
+    new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # Box-reduce by an integer factor first; a full-size resampling filter is slow on huge images.
+    factor = int(max(image.size) / max_side)
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image.resize(new_size, Image.BICUBIC)
+
+
+def encode_image(image: Image.Image, max_side: Optional[int] = DEFAULT_MAX_SIDE) -> EncodedImage:
+    """
+    Downsamples an image to max_side and encodes it compactly.
+
+    Photos are sent as JPEG. Images with few colours (screenshots, diagrams)
+    or an alpha channel are sent as PNG, which is both smaller and lossless
+    for that kind of content.
+    """
+    resized = downsample(image, max_side)
+    output = io.BytesIO()
+    if resized.mode in ("RGBA", "LA", "P") or resized.getcolors(256) is not None:
+        resized.save(output, format="PNG", optimize=True)
+        mime_type = "image/png"
+    else:
+        resized.convert("RGB").save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        mime_type = "image/jpeg"
+    return EncodedImage(output.getvalue(), mime_type, resized.size, image.size)
+
+
+_cache: "OrderedDict[tuple, EncodedImage]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def prepare_image(image: Image.Image, digest: str, max_side: Optional[int] = DEFAULT_MAX_SIDE) -> EncodedImage:
+    """
+    Returns the encoded payload for an image, reusing it for repeated queries.
+
+    digest identifies the image content (see utils.util.hash_image). Payloads
+    are kept in a small in-process LRU cache keyed by digest and max_side.
+    """
+    key = (digest, max_side)
+    with _cache_lock:
+        encoded = _cache.get(key)
+        if encoded is not None:
+            _cache.move_to_end(key)
+            return encoded
+
+    encoded = encode_image(image, max_side)
+    with _cache_lock:
+        _cache[key] = encoded
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return encoded
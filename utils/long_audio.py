@@ -0,0 +1,231 @@
+import difflib
+import io
+import re
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.reporter import RecordingReporter, use_reporter
+from utils.scheduler import current_priority, request_priority
+from utils.util import (
+    SpeakerLineParser,
+    current_session_id,
+    generate_transcription,
+    poll_file_processing,
+    upload_file_to_gemini,
+)
+
+DEFAULT_SEGMENT_SECONDS = 300
+DEFAULT_OVERLAP_SECONDS = 15
+DEFAULT_PARALLELISM = 4
+
+# How many lines at each seam are compared when removing overlap duplicates.
+SEAM_WINDOW = 8
+MATCH_RATIO = 0.8
+
+
+class AudioSegment:
+    """One overlapping slice of a longer recording, encoded as a standalone WAV file."""
+
+    def __init__(self, index: int, start_seconds: float, end_seconds: float, data: bytes):
+        self.index = index
+        self.start_seconds = start_seconds
+        self.end_seconds = end_seconds
+        self.data = data
+
+
+class _SegmentFile(io.BytesIO):
+    """Gives a segment the name/type/size attributes upload_file_to_gemini expects."""
+
+    def __init__(self, segment: AudioSegment, base_name: str):
+        super().__init__(segment.data)
+        self.name = f"{base_name}.part{segment.index:03d}.wav"
+        self.type = "audio/wav"
+        self.size = len(segment.data)
+
+
+def split_wav(data: bytes, segment_seconds: float, overlap_seconds: float) -> List[AudioSegment]:
+    """
+    Splits a WAV file into segments of segment_seconds that overlap by overlap_seconds.
+
+    Splitting works on raw PCM frames, so no audio is decoded or re-encoded.
+    """
+    if overlap_seconds >= segment_seconds:
+        raise ValueError("Overlap must be shorter than the segment length.")
+
+    with wave.open(io.BytesIO(data), "rb") as reader:
+        params = reader.getparams()
+        frames = reader.readframes(params.nframes)
+
+    frame_size = params.sampwidth * params.nchannels
+    total_frames = len(frames) // frame_size
+    segment_frames = int(segment_seconds * params.framerate)
+    step_frames = int((segment_seconds - overlap_seconds) * params.framerate)
+
+    segments = []
+    start = 0
+    while True:
+        end = min(start + segment_frames, total_frames)
+        output = io.BytesIO()
+        with wave.open(output, "wb") as writer:
+            writer.setparams(params)
+            writer.writeframes(frames[start * frame_size:end * frame_size])
+        segments.append(AudioSegment(
+            len(segments), start / params.framerate, end / params.framerate, output.getvalue()
+        ))
+        if end >= total_frames:
+            return segments
+        start += step_frames
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^\w\s]", "", text.lower()).strip()
+
+
+def _same_text(a: str, b: str) -> bool:
+    a, b = _normalize(a), _normalize(b)
+    if not a or not b:
+        return False
+    return difflib.SequenceMatcher(None, a, b).ratio() >= MATCH_RATIO
+
+
+def _is_fragment(part: str, whole: str) -> bool:
+    """Whether part is a cut-off piece of whole, as happens at segment boundaries."""
+    part, whole = _normalize(part), _normalize(whole)
+    return bool(part) and len(part) < len(whole) and (whole.startswith(part) or whole.endswith(part))
+
+
+def stitch_transcripts(transcripts: List[str]) -> List[Dict[str, str]]:
+    """
+    Joins per-segment transcripts into one list of speaker lines.
+
+    Lines at the start of a segment that repeat (or are fragments of) lines at
+    the end of the previous one come from the overlap and are dropped. Each
+    such match also pairs the segment's speaker label with the label already
+    in use, and that mapping is applied to the rest of the segment so labels
+    like "Speaker A" stay consistent across segments.
+    """
+    stitched: List[Dict[str, str]] = []
+    for transcript in transcripts:
+        parser = SpeakerLineParser()
+        parser.feed(transcript)
+        parser.close()
+        lines = parser.lines
+        if not stitched:
+            stitched.extend(lines)
+            continue
+
+        tail = stitched[-SEAM_WINDOW:]
+        speaker_map: Dict[str, str] = {}
+        skip = 0
+        for line in lines[:SEAM_WINDOW]:
+            match = None
+            for previous in tail:
+                if (_same_text(line["text"], previous["text"])
+                        or _is_fragment(line["text"], previous["text"])
+                        or _is_fragment(previous["text"], line["text"])):
+                    match = previous
+                    break
+            if match is None:
+                break
+            if len(line["text"]) > len(match["text"]):
+                # The previous segment cut this line off; keep the more complete version.
+                match["text"] = line["text"]
+            speaker_map.setdefault(line["speaker"], match["speaker"])
+            skip += 1
+
+        # A label not heard in the overlap must not take over a label that now
+        # belongs to another speaker; give it one of the unclaimed labels instead.
+        claimed = set(speaker_map.values())
+        unclaimed = [speaker for speaker in dict.fromkeys(line["speaker"] for line in stitched) if speaker not in claimed]
+        for line in lines[skip:]:
+            label = line["speaker"]
+            if label not in speaker_map and label in claimed:
+                speaker_map[label] = unclaimed.pop(0) if unclaimed else label
+
+        for line in lines[skip:]:
+            stitched.append({"speaker": speaker_map.get(line["speaker"], line["speaker"]), "text": line["text"]})
+    return stitched
+
+
+def format_transcript(lines: List[Dict[str, str]]) -> str:
+    return "\n".join(f"[{line['speaker']}]: {line['text']}" for line in lines)
+
+
+def transcribe_segment_with_gemini(
+    model: Any,
+    segment: AudioSegment,
+    base_name: str,
+    use_cache: bool = True,
+    session_id: Optional[str] = None,
+) -> Optional[str]:
+    """Uploads one segment, waits for processing and transcribes it."""
+    uploaded_file = upload_file_to_gemini(_SegmentFile(segment, base_name), use_cache=use_cache, session_id=session_id)
+    if uploaded_file is None:
+        return None
+    processed_file = poll_file_processing(uploaded_file, session_id=session_id)
+    if processed_file is None:
+        return None
+    return generate_transcription(model, processed_file, use_cache=use_cache, session_id=session_id)
+
+
+def transcribe_long_audio(
+    model: Any,
+    data: bytes,
+    base_name: str = "audio",
+    segment_seconds: float = DEFAULT_SEGMENT_SECONDS,
+    overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+    parallelism: int = DEFAULT_PARALLELISM,
+    use_cache: bool = True,
+    transcribe_segment: Optional[Callable[[AudioSegment], Optional[str]]] = None,
+) -> Optional[List[Dict[str, str]]]:
+    """
+    Transcribes a long WAV recording as overlapping segments processed concurrently.
+
+    transcribe_segment can replace the upload/poll/generate step, e.g. with a
+    fake model in tests. Returns the stitched speaker lines, or None if any
+    segment failed.
+    """
+    segments = split_wav(data, segment_seconds, overlap_seconds)
+    return transcribe_segments(model, segments, base_name, parallelism, use_cache, transcribe_segment)
+
+
+def transcribe_segments(
+    model: Any,
+    segments: List[AudioSegment],
+    base_name: str = "audio",
+    parallelism: int = DEFAULT_PARALLELISM,
+    use_cache: bool = True,
+    transcribe_segment: Optional[Callable[[AudioSegment], Optional[str]]] = None,
+    session_id: Optional[str] = None,
+) -> Optional[List[Dict[str, str]]]:
+    """
+    Transcribes segments from split_wav concurrently and stitches the results.
+
+    Lets the splitting happen elsewhere, e.g. on a worker process. Messages
+    from the segments are reported on the calling thread, in segment order.
+    Returns None if any segment failed.
+    """
+    if transcribe_segment is None:
+        session_id = session_id or current_session_id()
+
+        def transcribe_segment(segment):
+            return transcribe_segment_with_gemini(model, segment, base_name, use_cache, session_id)
+
+    # Context variables do not reach pool threads, so carry the caller's priority over explicitly.
+    priority = current_priority()
+
+    def run(segment):
+        recorder = RecordingReporter()
+        with use_reporter(recorder), request_priority(priority):
+            return transcribe_segment(segment), recorder
+
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="audio-segment") as pool:
+        results = list(pool.map(run, segments))
+    transcripts = []
+    for transcript, recorder in results:
+        recorder.replay()
+        transcripts.append(transcript)
+    if any(transcript is None for transcript in transcripts):
+        return None
+    return stitch_transcripts(transcripts)
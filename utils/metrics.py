@@ -0,0 +1,263 @@
+import collections
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from utils.session import current_session_id
+
+# Optional file that every finished span is appended to as one JSON line.
+DEFAULT_JSONL_PATH = os.getenv("METRICS_JSONL_PATH") or None
+# Recent spans kept in memory for the sidebar panel and the JSONL download.
+MAX_SPANS = 5000
+# Histogram buckets in seconds, from a parse step up to a long video's processing wait.
+DURATION_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+TOKEN_KINDS = ("prompt", "output", "cached")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Timing, bytes moved and token usage of one stage of a request."""
+
+    def __init__(self, stage: str, session_id: str, attrs: Dict[str, Any]):
+        self.stage = stage
+        self.session_id = session_id
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.bytes = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.error: Optional[str] = None
+
+    def add_bytes(self, size: Optional[int]) -> None:
+        self.bytes += size or 0
+
+    def record_usage(self, response: Any) -> None:
+        """Adds the token counts from a model response's usage_metadata."""
+        usage = getattr(response, "usage_metadata", None)
+        self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+        self.output_tokens += getattr(usage, "candidates_token_count", 0) or 0
+        self.cached_tokens += getattr(usage, "cached_content_token_count", 0) or 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "session_id": self.session_id,
+            "started_at": round(self.started_at, 3),
+            "duration_s": round(self.duration, 6),
+            "bytes": self.bytes,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_tokens": self.cached_tokens,
+            "error": self.error,
+            **self.attrs,
+        }
+
+
+class _StageTotals:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.tokens = dict.fromkeys(TOKEN_KINDS, 0)
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+
+class MetricsRecorder:
+    """
+    Collects spans from every session in the process.
+
+    Totals per stage are kept for the whole process lifetime and exported in
+    the Prometheus text format; the most recent spans are kept individually
+    for percentiles and the JSONL export. When jsonl_path is set, every span
+    is also appended to that file as it finishes.
+    """
+
+    def __init__(self, max_spans: int = MAX_SPANS, jsonl_path: Optional[str] = DEFAULT_JSONL_PATH):
+        self.jsonl_path = jsonl_path
+        self._spans: Deque[Span] = collections.deque(maxlen=max_spans)
+        self._totals: Dict[str, _StageTotals] = collections.defaultdict(_StageTotals)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, stage: str, session_id: Optional[str] = None, **attrs) -> Iterator[Span]:
+        """
+        Times the enclosed block as one span of the given stage.
+
+        An exception leaving the block marks the span as failed and is
+        re-raised. While the block runs, the module-level record_usage()
+        adds to this span, so nested helpers need not be handed it.
+        """
+        if session_id is None:
+            session_id = current_session_id()
+        span = Span(stage, session_id, attrs)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self.record(span)
+
+    @contextlib.contextmanager
+    def stream_span(self, stage: str, session_id: Optional[str] = None, **attrs) -> Iterator[Span]:
+        """
+        Like span(), for a block that yields inside a generator.
+
+        The span stays open across yields, so it includes the time the caller
+        spends between chunks. It is not made the current span: the generator
+        may be resumed, or closed early, from a different context than the one
+        that set it. A consumer that stops early marks the span "closed".
+        """
+        if session_id is None:
+            session_id = current_session_id()
+        span = Span(stage, session_id, attrs)
+        started = time.perf_counter()
+        try:
+            yield span
+        except GeneratorExit:
+            span.attrs["closed"] = True
+            raise
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+            totals = self._totals[span.stage]
+            totals.count += 1
+            totals.errors += span.error is not None
+            totals.seconds += span.duration
+            totals.bytes += span.bytes
+            totals.tokens["prompt"] += span.prompt_tokens
+            totals.tokens["output"] += span.output_tokens
+            totals.tokens["cached"] += span.cached_tokens
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    totals.buckets[i] += 1
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span.as_dict(), default=str) + "\n")
+
+    def spans(self, session_id: Optional[str] = None, stage: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        return [
+            span for span in spans
+            if (session_id is None or span.session_id == session_id) and (stage is None or span.stage == stage)
+        ]
+
+    def summary(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """One row per stage over the recent spans: count, p50/p95, total time, MB and tokens."""
+        by_stage: Dict[str, List[Span]] = collections.defaultdict(list)
+        for span in self.spans(session_id):
+            by_stage[span.stage].append(span)
+        rows = []
+        for stage, spans in sorted(by_stage.items()):
+            durations = sorted(span.duration for span in spans)
+            rows.append({
+                "stage": stage,
+                "count": len(spans),
+                "errors": sum(span.error is not None for span in spans),
+                "p50_s": round(durations[len(durations) // 2], 3),
+                "p95_s": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 3),
+                "total_s": round(sum(durations), 3),
+                "mb": round(sum(span.bytes for span in spans) / (1024 * 1024), 2),
+                "prompt_tokens": sum(span.prompt_tokens for span in spans),
+                "output_tokens": sum(span.output_tokens for span in spans),
+            })
+        return rows
+
+    def to_prometheus(self) -> str:
+        """Process-wide totals in the Prometheus text exposition format."""
+        with self._lock:
+            totals = {
+                stage: {**vars(t), "tokens": dict(t.tokens), "buckets": list(t.buckets)}
+                for stage, t in self._totals.items()
+            }
+        lines = [
+            "# HELP gemini_stage_duration_seconds Time spent in each request stage.",
+            "# TYPE gemini_stage_duration_seconds histogram",
+        ]
+        for stage, t in sorted(totals.items()):
+            for bound, count in zip(DURATION_BUCKETS, t["buckets"]):
+                lines.append(f'gemini_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'gemini_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {t["count"]}')
+            lines.append(f'gemini_stage_duration_seconds_sum{{stage="{stage}"}} {t["seconds"]:.6f}')
+            lines.append(f'gemini_stage_duration_seconds_count{{stage="{stage}"}} {t["count"]}')
+        lines += ["# HELP gemini_stage_errors_total Stage runs that raised.", "# TYPE gemini_stage_errors_total counter"]
+        lines += [f'gemini_stage_errors_total{{stage="{stage}"}} {t["errors"]}' for stage, t in sorted(totals.items())]
+        lines += ["# HELP gemini_stage_bytes_total Bytes uploaded or processed by each stage.", "# TYPE gemini_stage_bytes_total counter"]
+        lines += [f'gemini_stage_bytes_total{{stage="{stage}"}} {t["bytes"]}' for stage, t in sorted(totals.items())]
+        lines += ["# HELP gemini_tokens_total Model tokens by stage and kind.", "# TYPE gemini_tokens_total counter"]
+        for stage, t in sorted(totals.items()):
+            for kind in TOKEN_KINDS:
+                lines.append(f'gemini_tokens_total{{stage="{stage}",kind="{kind}"}} {t["tokens"][kind]}')
+        return "\n".join(lines) + "\n"
+
+    def to_jsonl(self, session_id: Optional[str] = None) -> str:
+        return "".join(json.dumps(span.as_dict(), default=str) + "\n" for span in self.spans(session_id))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._totals.clear()
+
+
+def record_duration(stage: str, seconds: float, session_id: str, error: Optional[str] = None, **attrs) -> None:
+    """Records a span timed elsewhere, e.g. a wait that starts and ends in different callbacks."""
+    span = Span(stage, session_id, attrs)
+    span.started_at = time.time() - seconds
+    span.duration = seconds
+    span.error = error
+    get_metrics().record(span)
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span in this thread or task, if any."""
+    return _current_span.get()
+
+
+def record_usage(response: Any) -> None:
+    """Adds a model response's token usage to the innermost open span, if there is one."""
+    span = _current_span.get()
+    if span is not None:
+        span.record_usage(response)
+
+
+_recorder: Optional[MetricsRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRecorder:
+    """Returns the process-wide metrics recorder shared by all sessions."""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = MetricsRecorder()
+        return _recorder
+
+
+def span(stage: str, session_id: Optional[str] = None, **attrs):
+    """Shorthand for get_metrics().span(...)."""
+    return get_metrics().span(stage, session_id, **attrs)
+
+
+def stream_span(stage: str, session_id: Optional[str] = None, **attrs):
+    """Shorthand for get_metrics().stream_span(...)."""
+    return get_metrics().stream_span(stage, session_id, **attrs)
@@ -1,16 +1,40 @@
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig
 from dotenv import load_dotenv
 import os
-from google.generativeai import caching
 import datetime
+import threading
+from typing import Any, Dict, Tuple
 
-def load_model(type, schemaType):
-  load_dotenv()
-  genai.configure(api_key=os.getenv('API_KEY'))
+from utils.backend import caching, genai
+from utils.scheduler import INTERACTIVE, NORMAL, ScheduledModel
+from utils.schemas import DetectedBox
+
+# Process-wide registry of models, shared by every Streamlit session.
+_registry: Dict[Tuple, Any] = {}
+_registry_lock = threading.RLock()
+_configured = False
+
+
+def configure(force: bool = False):
+  """Loads .env and configures the SDK once per process."""
+  global _configured
+  with _registry_lock:
+      if _configured and not force:
+          return
+      load_dotenv()
+      genai.configure(api_key=os.getenv('API_KEY'))
+      _configured = True
+
+
+def reset_registry():
+  """Drops all registered models so the next load_model builds fresh ones."""
+  with _registry_lock:
+      _registry.clear()
+
+
+def _generation_settings(type, schemaType) -> Dict[str, Any]:
   if type is not None and schemaType is not None:
       # Configuration when both type and schemaType are provided
-      generation_config = GenerationConfig(
+      return dict(
           temperature=0.7,
           top_p=0.9,
           top_k=40,
@@ -19,35 +43,71 @@ def load_model(type, schemaType):
           response_mime_type="application/json",
           response_schema=schemaType
       )
-  else:
-      # Default configuration when type or schemaType is not provided
-      generation_config = GenerationConfig(
-          temperature=0.9,
-          top_p=1.0,
-          top_k=32,
-          candidate_count=1,
-          max_output_tokens=8192
-      )
-  
+  # Default configuration when type or schemaType is not provided
+  return dict(
+      temperature=0.9,
+      top_p=1.0,
+      top_k=32,
+      candidate_count=1,
+      max_output_tokens=8192
+  )
+
+
+def _detection_settings() -> Dict[str, Any]:
+  # JSON mode with a typed schema, so replies are always a well-formed box array.
+  # A lower temperature keeps coordinates stable between runs.
+  return dict(
+      temperature=0.4,
+      top_p=0.9,
+      top_k=40,
+      candidate_count=1,
+      max_output_tokens=8192,
+      response_mime_type="application/json",
+      response_schema=list[DetectedBox]
+  )
+
+
+def load_model(type, schemaType):
+  """
+  Returns the shared model for this configuration, building it on first use.
+
+  Models are keyed by (model name, generation config, response schema), so reruns
+  and concurrent sessions reuse the same instance instead of rebuilding it. Their
+  calls go through the shared request scheduler.
+  """
+  return _shared_model(_generation_settings(type, schemaType))
+
+
+def load_detection_model():
+  """Returns the shared object detection model, which replies with a schema-checked list of DetectedBox."""
+  return _shared_model(_detection_settings(), INTERACTIVE)
+
+
+def _shared_model(settings: Dict[str, Any], priority: int = NORMAL):
+  configure()
   model_name = os.getenv('MODEL')
-  model = genai.GenerativeModel(model_name=model_name, generation_config=generation_config)
-  return model
+  schema = settings.get("response_schema")
+  config_key = tuple(sorted((k, v) for k, v in settings.items() if k != "response_schema"))
+  key = (model_name, config_key, schema)
+
+  with _registry_lock:
+      model = _registry.get(key)
+      if model is None:
+          # A plain dict works with both backends; the SDK converts it like a GenerationConfig.
+          model = genai.GenerativeModel(model_name=model_name, generation_config=settings)
+          model = _registry[key] = ScheduledModel(model, priority)
+      return model
 
 
-def load_cached_content_model(contents, display_name, system_instruction, ttl_minutes=5):
-  print('loading cached content model')
-  load_dotenv() 
-  genai.configure(api_key=os.getenv('API_KEY'))
+def create_context_cache(contents, display_name, system_instruction, ttl_minutes=5):
+  """Creates a context cache on CACHING_MODEL holding the given contents."""
+  configure()
   # Create a cache with the specified TTL
-  cache = caching.CachedContent.create(
+  return caching.CachedContent.create(
       model=os.getenv('CACHING_MODEL'),
       display_name=display_name,
       system_instruction=system_instruction,
       contents=contents,
       ttl=datetime.timedelta(minutes=ttl_minutes),
   )
-  print('cache',cache)
-  # Construct a GenerativeModel which uses the created cache.
-  model = genai.GenerativeModel.from_cached_content(cached_content=cache)
-  return model
 
@@ -0,0 +1,194 @@
+import csv
+import functools
+import io
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.file_index import get_file_index
+from utils.metrics import record_duration
+from utils.poller import get_poller
+from utils.reporter import RecordingReporter, use_reporter
+from utils.scheduler import BATCH, request_priority
+from utils.schemas import VideoAnalysis
+from utils.util import current_session_id, generate_metadata, upload_file_to_gemini
+
+STAGES = ("queued", "uploading", "processing", "generating", "done", "failed")
+
+
+class BatchItem:
+    """Progress and result of one file in a batch run."""
+
+    def __init__(self, index: int, file):
+        self.index = index
+        self.file = file
+        self.name = file.name
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.metadata: Optional[Dict[str, Any]] = None
+        # Messages from the stages, which run off the caller's thread.
+        self.reporter = RecordingReporter()
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    def as_row(self) -> Dict[str, Any]:
+        return {
+            "file": self.name,
+            "status": self.status,
+            "seconds": round(self.elapsed, 1),
+            "error": self.error or "",
+        }
+
+
+def run_video_batch(
+    files,
+    model: Any,
+    upload_concurrency: int = 4,
+    generate_concurrency: int = 4,
+    poll_timeout: Optional[float] = None,
+    use_cache: bool = True,
+) -> Iterator[BatchItem]:
+    """
+    Runs upload -> processing wait -> metadata generation for many videos.
+
+    Stages for different files overlap: uploads and model calls each run on
+    their own bounded thread pool, and processing waits are handed to the
+    shared FilePoller, so no thread is held while a file is processing.
+    Uploads and model calls run at BATCH priority, so the request scheduler
+    lets interactive requests from other sessions go first.
+    Yields every BatchItem once as it is queued and again each time it changes
+    stage; iteration ends once every item is done or failed. Warnings and
+    errors from an item's stages are reported on the iterating thread when
+    the item finishes; every message stays in item.reporter.
+    """
+    items = [BatchItem(index, f) for index, f in enumerate(files)]
+    if not items:
+        return
+    events: "queue.Queue[BatchItem]" = queue.Queue()
+    poller = get_poller()
+    # Worker threads have no Streamlit context, so uploads are attributed to the caller's session.
+    session_id = current_session_id()
+
+    def update(item: BatchItem, status: str, error: Optional[str] = None):
+        item.status = status
+        item.error = error
+        if item.finished:
+            item.finished_at = time.monotonic()
+        events.put(item)
+
+    def fail(item: BatchItem, reason: str):
+        """Fails the item with the last error its stages reported, else reason."""
+        errors = item.reporter.errors
+        update(item, "failed", errors[-1] if errors else reason)
+
+    def guarded(step):
+        """
+        Runs a stage with the item's reporter and fails the item if the stage raises.
+
+        Exceptions and messages in pool threads and future callbacks are otherwise lost.
+        """
+        @functools.wraps(step)
+        def run(item: BatchItem, *args):
+            with use_reporter(item.reporter):
+                try:
+                    step(item, *args)
+                except Exception as e:
+                    if not item.finished:
+                        update(item, "failed", str(e))
+        return run
+
+    @guarded
+    def generate(item: BatchItem, processed_file):
+        update(item, "generating")
+        with request_priority(BATCH):
+            metadata = generate_metadata(model, processed_file, use_cache=use_cache, session_id=session_id)
+        if metadata is None:
+            fail(item, "Metadata generation failed.")
+            return
+        item.metadata = metadata
+        update(item, "done")
+
+    @guarded
+    def on_processed(item: BatchItem, submitted_at: float, future):
+        waited = time.monotonic() - submitted_at
+        try:
+            processed_file = future.result()
+        except Exception as e:
+            record_duration("poll", waited, session_id, error=str(e))
+            update(item, "failed", f"Processing error: {e}")
+            return
+        record_duration("poll", waited, session_id, file=processed_file.name, state=processed_file.state.name)
+        get_file_index().update_state(processed_file)
+        if processed_file.state.name != "ACTIVE":
+            update(item, "failed", f"File processing ended in state {processed_file.state.name}.")
+            return
+        generate_pool.submit(generate, item, processed_file)
+
+    @guarded
+    def upload(item: BatchItem):
+        update(item, "uploading")
+        with request_priority(BATCH):
+            uploaded_file = upload_file_to_gemini(item.file, session_id=session_id)
+        if uploaded_file is None:
+            fail(item, "Upload failed.")
+            return
+        update(item, "processing")
+        submitted_at = time.monotonic()
+        future = poller.submit(uploaded_file, timeout=poll_timeout)
+        future.add_done_callback(lambda f: on_processed(item, submitted_at, f))
+
+    upload_pool = ThreadPoolExecutor(max_workers=upload_concurrency, thread_name_prefix="batch-upload")
+    generate_pool = ThreadPoolExecutor(max_workers=generate_concurrency, thread_name_prefix="batch-generate")
+    try:
+        for item in items:
+            yield item
+            upload_pool.submit(upload, item)
+        remaining = len(items)
+        while remaining:
+            item = events.get()
+            if item.finished:
+                remaining -= 1
+                item.reporter.replay(levels=("warning", "error"))
+            yield item
+    finally:
+        upload_pool.shutdown(wait=False, cancel_futures=True)
+        generate_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def collect_results(items: List[BatchItem]) -> List[Dict[str, Any]]:
+    """Returns the VideoAnalysis records of the successful items, in input order."""
+    records = []
+    for item in sorted(items, key=lambda i: i.index):
+        if item.metadata is not None:
+            record = {key: item.metadata.get(key) for key in VideoAnalysis.__annotations__}
+            record["file"] = item.name
+            records.append(record)
+    return records
+
+
+def results_to_csv(records: List[Dict[str, Any]]) -> str:
+    fieldnames = ["file", *VideoAnalysis.__annotations__]
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+    for record in records:
+        row = dict(record)
+        if isinstance(row.get("tags"), list):
+            row["tags"] = "; ".join(row["tags"])
+        writer.writerow(row)
+    return output.getvalue()
+
+
+def results_to_jsonl(records: List[Dict[str, Any]]) -> str:
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
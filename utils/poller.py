@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from utils.backend import genai
+from utils.scheduler import file_api_call
+
+# Rough server-side processing cost used to schedule the first status check.
+SECONDS_PER_MB = 0.02
+# Longest gap between checks for a file someone is waiting on. The default
+# max_delay suits batch work, where fewer requests matter more than a few
+# seconds of lag per file.
+INTERACTIVE_MAX_DELAY = 2.0
+
+
+class _PendingFile:
+    def __init__(self, uploaded_file, future: Future, deadline: Optional[float], max_delay: float):
+        self.file = uploaded_file
+        self.future = future
+        self.deadline = deadline
+        self.max_delay = max_delay
+        self.started_at = time.monotonic()
+        self.attempts = 0
+        self.errors = 0
+
+
+class FilePoller:
+    """
+    Tracks many files in PROCESSING state from one shared background thread.
+
+    Each submitted file gets a concurrent.futures.Future that resolves to the
+    file once it leaves PROCESSING. Status checks back off exponentially with
+    jitter; the first check is scheduled from the file size and later checks
+    never come sooner than a fraction of the time already spent waiting, so
+    long-running files are polled far less often than one request per second.
+    """
+
+    def __init__(
+        self,
+        get_file: Optional[Callable] = None,
+        base_delay: float = 1.0,
+        max_delay: float = 10.0,
+        backoff_factor: float = 1.3,
+        jitter: float = 0.25,
+        elapsed_fraction: float = 0.1,
+        max_errors: int = 3,
+    ):
+        # No scheduler retries: failed checks are counted and rescheduled here, and backing off
+        # inside a check would hold up every other file on this thread.
+        self._get_file = get_file or (lambda name: file_api_call(genai.get_file, name, retries=0))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.elapsed_fraction = elapsed_fraction
+        self.max_errors = max_errors
+        self.status_checks = 0
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, uploaded_file, timeout: Optional[float] = None, max_delay: Optional[float] = None) -> Future:
+        """
+        Starts tracking a file and returns a future for its final state.
+
+        max_delay caps the backoff for this file below the poller's own, e.g.
+        INTERACTIVE_MAX_DELAY when a user is watching a spinner.
+        """
+        future = Future()
+        if uploaded_file.state.name != "PROCESSING":
+            future.set_result(uploaded_file)
+            return future
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        max_delay = self.max_delay if max_delay is None else min(max_delay, self.max_delay)
+        pending = _PendingFile(uploaded_file, future, deadline, max_delay)
+        self._schedule(pending, self._first_delay(uploaded_file, max_delay))
+        return future
+
+    def pending_count(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    def _first_delay(self, uploaded_file, max_delay: float) -> float:
+        size_mb = (getattr(uploaded_file, "size_bytes", 0) or 0) / (1024 * 1024)
+        return min(max_delay, max(self.base_delay, size_mb * SECONDS_PER_MB))
+
+    def _next_delay(self, pending: _PendingFile) -> float:
+        elapsed = time.monotonic() - pending.started_at
+        delay = max(
+            self.base_delay * self.backoff_factor ** pending.attempts,
+            elapsed * self.elapsed_fraction,
+        )
+        delay = min(pending.max_delay, delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _schedule(self, pending: _PendingFile, delay: float) -> None:
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), pending))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="gemini-file-poller", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._heap:
+                    # Idle threads exit; _schedule starts a new one when needed.
+                    if not self._condition.wait(timeout=60):
+                        if not self._heap:
+                            self._thread = None
+                            return
+                due_at, _, pending = self._heap[0]
+                wait_for = due_at - time.monotonic()
+                if wait_for > 0:
+                    self._condition.wait(timeout=wait_for)
+                    continue
+                heapq.heappop(self._heap)
+            self._check(pending)
+
+    def _check(self, pending: _PendingFile) -> None:
+        if pending.future.cancelled():
+            return
+        pending.attempts += 1
+        self.status_checks += 1
+        try:
+            pending.file = self._get_file(pending.file.name)
+        except Exception as e:
+            pending.errors += 1
+            if pending.errors >= self.max_errors:
+                pending.future.set_exception(e)
+                return
+        else:
+            pending.errors = 0
+            if pending.file.state.name != "PROCESSING":
+                pending.future.set_result(pending.file)
+                return
+
+        if pending.deadline is not None and time.monotonic() >= pending.deadline:
+            pending.future.set_exception(
+                TimeoutError(f"File '{pending.file.name}' is still processing.")
+            )
+            return
+        self._schedule(pending, self._next_delay(pending))
+
+
+_poller: Optional[FilePoller] = None
+_poller_lock = threading.Lock()
+
+
+def get_poller() -> FilePoller:
+    """Returns the process-wide poller shared by all sessions."""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = FilePoller()
+        return _poller
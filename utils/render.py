@@ -0,0 +1,171 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.boxes import BoxArray
+from utils.image_preprocess import downsample
+from utils.metrics import span
+
+# Annotated images are shown in the browser, which rarely displays more than this.
+DISPLAY_MAX_SIDE = 1600
+
+# Tried in order; the first one PIL can find is used for every label.
+FONT_CANDIDATES = ("DejaVuSans.ttf", "arial.ttf", "Arial.ttf", "LiberationSans-Regular.ttf")
+
+BOX_COLOR = (255, 0, 0)
+LABEL_BACKGROUND = (255, 255, 0)
+LABEL_COLOR = (0, 0, 0)
+HIGHLIGHT_COLOR = (0, 200, 255)
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(size: int) -> ImageFont.ImageFont:
+    """Returns a label font of the given pixel size, loading it only once per size."""
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+@functools.lru_cache(maxsize=4096)
+def _label_size(font_size: int, text: str) -> Tuple[int, int, int]:
+    """Width, height and top offset of a label; labels repeat a lot, so they are measured once."""
+    left, top, right, bottom = get_font(font_size).getbbox(text)
+    return right - left, bottom - top, top
+
+
+class BoxStyle:
+    """Stroke width, label size and padding scaled to the size of the image being drawn on."""
+
+    def __init__(self, stroke: int, font_size: int, padding: int):
+        self.stroke = stroke
+        self.font_size = font_size
+        self.padding = padding
+
+    @classmethod
+    def for_size(cls, width: int, height: int) -> "BoxStyle":
+        side = max(width, height)
+        font_size = max(12, round(side / 50))
+        return cls(stroke=max(1, round(side / 600)), font_size=font_size, padding=max(2, font_size // 8))
+
+
+def make_preview(image: Image.Image, max_side: Optional[int] = DISPLAY_MAX_SIDE) -> Image.Image:
+    """Returns a copy of the image no larger than max_side, without copying the full-size pixels first."""
+    preview = downsample(image, max_side)
+    return image.copy() if preview is image else preview
+
+
+def _draw_pil(image: Image.Image, boxes: BoxArray, style: BoxStyle, color=BOX_COLOR) -> None:
+    with span("draw_boxes", boxes=len(boxes), width=image.width, height=image.height):
+        draw = ImageDraw.Draw(image)
+        font = get_font(style.font_size)
+        pad = style.padding
+        for (xmin, ymin, xmax, ymax), name in zip(boxes.coords.tolist(), boxes.names):
+            draw.rectangle([xmin, ymin, xmax, ymax], outline=color, width=style.stroke)
+            text_width, text_height, top = _label_size(style.font_size, name)
+            # Above the box, or just inside it when the box touches the top edge.
+            text_y = max(pad, ymin - text_height - pad)
+            draw.rectangle(
+                [xmin - pad, text_y - pad, xmin + text_width + pad, text_y + text_height + pad],
+                fill=LABEL_BACKGROUND,
+            )
+            draw.text((xmin, text_y - top), name, fill=LABEL_COLOR, font=font)
+
+
+def draw_boxes(image: Image.Image, boxes: Any) -> Image.Image:
+    """Draws pixel boxes (a BoxArray or dicts) onto the image in place, styled for its size."""
+    _draw_pil(image, BoxArray.coerce(boxes), BoxStyle.for_size(*image.size))
+    return image
+
+
+class Annotator:
+    """
+    Draws boxes onto a display-sized copy of an image.
+
+    Boxes are given in the original image's pixel coordinates and scaled to
+    the preview. add() can be called repeatedly, e.g. as detections stream in;
+    only the new boxes are drawn each time.
+    """
+
+    def __init__(self, image: Image.Image, max_side: Optional[int] = DISPLAY_MAX_SIDE):
+        self.image = make_preview(image, max_side)
+        self.scale = (self.image.width / image.width, self.image.height / image.height)
+        self.style = BoxStyle.for_size(*self.image.size)
+
+    def add(self, boxes: Any) -> Image.Image:
+        _draw_pil(self.image, BoxArray.coerce(boxes).scale(*self.scale), self.style)
+        return self.image
+
+    def highlighted(self, boxes: Any) -> Image.Image:
+        """Returns a copy of the preview with the given boxes drawn over it in a highlight style."""
+        style = BoxStyle(self.style.stroke * 2, self.style.font_size, self.style.padding)
+        image = self.image.copy()
+        _draw_pil(image, BoxArray.coerce(boxes).scale(*self.scale), style, HIGHLIGHT_COLOR)
+        return image
+
+
+def render_boxes(image: Image.Image, boxes: Any, max_side: Optional[int] = DISPLAY_MAX_SIDE) -> Image.Image:
+    """Returns a display-sized copy of the image with the boxes drawn on it; the input is left untouched."""
+    return Annotator(image, max_side).add(boxes)
+
+
+def _draw_opencv(array: np.ndarray, boxes: BoxArray, style: BoxStyle) -> None:
+    import cv2
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    thickness = max(1, style.stroke // 2)
+    font_scale = cv2.getFontScaleFromHeight(font, style.font_size, thickness)
+    pad = style.padding
+    for (xmin, ymin, xmax, ymax), name in zip(boxes.coords.astype(np.int64).tolist(), boxes.names):
+        cv2.rectangle(array, (xmin, ymin), (xmax, ymax), BOX_COLOR, style.stroke)
+        (text_width, text_height), baseline = cv2.getTextSize(name, font, font_scale, thickness)
+        text_y = max(text_height + pad, ymin - baseline - pad)
+        cv2.rectangle(
+            array,
+            (xmin - pad, text_y - text_height - pad),
+            (xmin + text_width + pad, text_y + baseline + pad),
+            LABEL_BACKGROUND,
+            cv2.FILLED,
+        )
+        cv2.putText(array, name, (xmin, text_y), font, font_scale, LABEL_COLOR, thickness, cv2.LINE_AA)
+
+
+def _render_opencv(image: Image.Image, boxes: Any, max_side: Optional[int]) -> Image.Image:
+    preview = make_preview(image, max_side).convert("RGB")
+    scale = (preview.width / image.width, preview.height / image.height)
+    array = np.array(preview)
+    _draw_opencv(array, BoxArray.coerce(boxes).scale(*scale), BoxStyle.for_size(*preview.size))
+    return Image.fromarray(array)
+
+
+def annotate_batch(
+    images: Sequence[Image.Image],
+    boxes: Sequence[Any],
+    max_side: Optional[int] = DISPLAY_MAX_SIDE,
+    backend: str = "opencv",
+    max_workers: int = 4,
+) -> List[Image.Image]:
+    """
+    Renders annotated copies of many images in parallel.
+
+    boxes[i] holds the pixel boxes for images[i]. The "opencv" backend draws
+    on a NumPy array and releases the GIL while drawing, so it scales with
+    max_workers. OpenCV's built-in fonts may not cover non-Latin labels; use
+    the "pil" backend for those. Pass max_side=None to keep full resolution.
+    """
+    if backend == "opencv":
+        render = _render_opencv
+    elif backend == "pil":
+        render = render_boxes
+    else:
+        raise ValueError(f"Unknown render backend: {backend}")
+    if len(images) != len(boxes):
+        raise ValueError("images and boxes must have the same length.")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render") as pool:
+        return list(pool.map(lambda pair: render(pair[0], pair[1], max_side), zip(images, boxes)))
@@ -0,0 +1,157 @@
+import contextlib
+import contextvars
+import logging
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+
+class Reporter:
+    """
+    Where the pipeline functions in utils report progress and errors.
+
+    The default, StreamlitReporter, shows them as Streamlit elements; the
+    CLI logs them instead. Subclasses override the levels they care about;
+    everything is silently dropped by this base class.
+    """
+
+    def info(self, message: str) -> None:
+        pass
+
+    def success(self, message: str) -> None:
+        pass
+
+    def warning(self, message: str) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    @contextlib.contextmanager
+    def spinner(self, message: str) -> Iterator[None]:
+        yield
+
+
+class StreamlitReporter(Reporter):
+    """Shows messages with st.info/st.success/st.warning/st.error and waits with st.spinner."""
+
+    def info(self, message: str) -> None:
+        import streamlit as st
+
+        st.info(message)
+
+    def success(self, message: str) -> None:
+        import streamlit as st
+
+        st.success(message)
+
+    def warning(self, message: str) -> None:
+        import streamlit as st
+
+        st.warning(message)
+
+    def error(self, message: str) -> None:
+        import streamlit as st
+
+        st.error(message)
+
+    @contextlib.contextmanager
+    def spinner(self, message: str) -> Iterator[None]:
+        import streamlit as st
+
+        with st.spinner(message):
+            yield
+
+
+class LoggingReporter(Reporter):
+    """Sends messages to a logging.Logger; success is logged at INFO and spinners at DEBUG."""
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger("gemini")
+
+    def info(self, message: str) -> None:
+        self.logger.info(message)
+
+    def success(self, message: str) -> None:
+        self.logger.info(message)
+
+    def warning(self, message: str) -> None:
+        self.logger.warning(message)
+
+    def error(self, message: str) -> None:
+        self.logger.error(message)
+
+    @contextlib.contextmanager
+    def spinner(self, message: str) -> Iterator[None]:
+        self.logger.debug(message)
+        yield
+
+
+class RecordingReporter(Reporter):
+    """Keeps every message, e.g. to attach a failure reason to a result; optionally forwards them."""
+
+    def __init__(self, forward_to: Optional[Reporter] = None):
+        self.messages: List[Tuple[str, str]] = []
+        self.forward_to = forward_to
+
+    def _record(self, level: str, message: str) -> None:
+        self.messages.append((level, message))
+        if self.forward_to is not None:
+            getattr(self.forward_to, level)(message)
+
+    def info(self, message: str) -> None:
+        self._record("info", message)
+
+    def success(self, message: str) -> None:
+        self._record("success", message)
+
+    def warning(self, message: str) -> None:
+        self._record("warning", message)
+
+    def error(self, message: str) -> None:
+        self._record("error", message)
+
+    @property
+    def errors(self) -> List[str]:
+        return [message for level, message in self.messages if level == "error"]
+
+    def replay(self, reporter: Optional[Reporter] = None, levels: Optional[Tuple[str, ...]] = None) -> None:
+        """Sends the recorded messages, in order, to reporter (by default the current one); levels filters them."""
+        reporter = reporter or get_reporter()
+        for level, message in self.messages:
+            if levels is None or level in levels:
+                getattr(reporter, level)(message)
+
+
+_default: Reporter = StreamlitReporter()
+_default_lock = threading.Lock()
+_current: contextvars.ContextVar[Optional[Reporter]] = contextvars.ContextVar("reporter", default=None)
+
+
+def set_default_reporter(reporter: Reporter) -> None:
+    """Replaces the process-wide reporter used wherever use_reporter() is not in effect."""
+    global _default
+    with _default_lock:
+        _default = reporter
+
+
+def get_reporter() -> Reporter:
+    """The reporter installed by use_reporter() in this thread or task, else the process default."""
+    return _current.get() or _default
+
+
+@contextlib.contextmanager
+def use_reporter(reporter: Reporter) -> Iterator[Reporter]:
+    """
+    Routes messages from the enclosed block to reporter.
+
+    The override is context-local, so it does not reach threads started by
+    the block; those report to the process default. In the app that is a
+    StreamlitReporter, whose elements are lost off the script thread, so pool
+    workers record their messages with a RecordingReporter and the caller
+    replays them.
+    """
+    token = _current.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _current.reset(token)
@@ -0,0 +1,183 @@
+import base64
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+DEFAULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", ".cache/result_cache.db")
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 60 * 60  # 7 days
+
+
+def _describe(value: Any) -> Any:
+    """Turns generation configs and schema types into a stable, JSON-friendly form."""
+    if isinstance(value, type) and hasattr(value, "__annotations__"):
+        return {
+            "schema": f"{value.__module__}.{value.__qualname__}",
+            "fields": {name: repr(annotation) for name, annotation in value.__annotations__.items()},
+        }
+    if isinstance(value, dict):
+        return {str(key): _describe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_describe(item) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, "__dict__"):
+        return _describe(vars(value))
+    return repr(value)
+
+
+def model_fingerprint(model: Any) -> Any:
+    """Returns the model name and generation config (including response schema) of a model."""
+    return {
+        "model": getattr(model, "model_name", None),
+        "generation_config": _describe(getattr(model, "_generation_config", None)),
+    }
+
+
+def remote_file_digest(remote_file) -> str:
+    """
+    Returns a content hash for a file already uploaded to the File API.
+
+    Prefers the local SHA-256 recorded by the upload cache, then the hash the
+    File API reports, and finally the remote file name.
+    """
+    from utils.upload_cache import get_upload_cache
+
+    digest = get_upload_cache().digest_for(remote_file.name)
+    if digest:
+        return digest
+    remote_hash = getattr(remote_file, "sha256_hash", None)
+    if remote_hash:
+        if isinstance(remote_hash, bytes):
+            remote_hash = base64.b64encode(remote_hash).decode("ascii")
+        return f"remote:{remote_hash}"
+    return f"name:{remote_file.name}"
+
+
+def make_key(kind: str, content_digest: str, model: Any, prompt: str) -> str:
+    """Builds a cache key from the content hash, model, prompt, schema and generation config."""
+    payload = json.dumps(
+        {
+            "kind": kind,
+            "content": content_digest,
+            "model": model_fingerprint(model),
+            "prompt": prompt,
+        },
+        sort_keys=True,
+        default=repr,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed cache of model outputs with size- and age-based LRU eviction.
+
+    Values are stored as JSON. Whether the most recent lookup on the calling
+    thread was a hit is available through last_lookup_hit(), so the UI can mark
+    results that were served from the cache.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+    ):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value for the key, or None if it is missing or too old."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.max_age_seconds:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        self._local.last_hit = row is not None
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key: str, kind: str, value: Any) -> None:
+        encoded = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, encoded, len(encoded.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute(
+            "DELETE FROM results WHERE created_at < ?", (now - self.max_age_seconds,)
+        )
+        count, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM results"
+        ).fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        # Drop least recently used entries until both limits hold again.
+        rows = self._conn.execute(
+            "SELECT key, size_bytes FROM results ORDER BY accessed_at ASC"
+        ).fetchall()
+        doomed = []
+        for key, size_bytes in rows:
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total_bytes -= size_bytes
+        self._conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+
+    def last_lookup_hit(self) -> bool:
+        """Whether the most recent get() on this thread returned a cached value."""
+        return getattr(self._local, "last_hit", False)
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM results")
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Returns the process-wide result cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
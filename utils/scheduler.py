@@ -0,0 +1,469 @@
+import collections
+import contextlib
+import contextvars
+import functools
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from utils.session import current_session_id
+
+# Request priorities; lower values are admitted first.
+INTERACTIVE = 0
+NORMAL = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BATCH: "batch"}
+
+# Quotas applied to every model unless set_limits() says otherwise; 0 disables a limit.
+DEFAULT_MODEL_RPM = float(os.getenv("MODEL_RPM", "1000"))
+DEFAULT_MODEL_TPM = float(os.getenv("MODEL_TPM", "4000000"))
+DEFAULT_FILE_API_RPM = float(os.getenv("FILE_API_RPM", "600"))
+FILE_API = "files"
+
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# Rough token costs used to reserve TPM before a call; corrected from usage_metadata afterwards.
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 258
+TOKENS_PER_MB = {"video": 1000, "audio": 1500, "image": 258}
+OUTPUT_TOKEN_ESTIMATE = 500
+# Share of a quota that may be used in one burst. A bucket admits at most
+# (1 + BURST_FRACTION) x its quota in any window, so a full-quota burst
+# followed by steady refill cannot overrun a sliding-window limit by much.
+BURST_FRACTION = 0.1
+# Recent waits kept per lane for the averages shown to users.
+WAIT_HISTORY = 200
+
+_priority: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("request_priority", default=None)
+
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[type, ...]:
+    """Rate limits (429, including ResourceExhausted), overload and timeouts."""
+    # google.api_core pulls in grpc; import it when an error is first handled, not at startup.
+    from google.api_core import exceptions as api_exceptions
+
+    return (
+        api_exceptions.TooManyRequests,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError,
+        api_exceptions.DeadlineExceeded,
+        ConnectionError,
+        TimeoutError,
+    )
+
+
+@contextlib.contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """Runs the enclosed model and File API calls at the given priority (this thread or task only)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority(default: int = NORMAL) -> int:
+    """The priority set with request_priority(), or default outside one."""
+    priority = _priority.get()
+    return default if priority is None else priority
+
+
+def estimate_tokens(contents: Any) -> int:
+    """A rough input token count for generate_content contents: text, inline images and File API files."""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    total = 0
+    for part in parts:
+        if isinstance(part, str):
+            total += len(part) // CHARS_PER_TOKEN + 1
+        elif hasattr(part, "size_bytes") and hasattr(part, "mime_type"):
+            media = (part.mime_type or "").split("/", 1)[0]
+            total += int(TOKENS_PER_MB.get(media, 250) * (part.size_bytes or 0) / (1024 * 1024)) + 1
+        else:
+            total += TOKENS_PER_IMAGE
+    return total
+
+
+class TokenBucket:
+    """Refills at rate units per second up to capacity; takes may overdraw, which delays later takes."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken; requests larger than the bucket only need a full one."""
+        self._refill(time.monotonic())
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill(time.monotonic())
+        self.level -= amount
+
+    def drain(self) -> None:
+        """Empties the bucket, e.g. after the service reported the quota exhausted."""
+        self._refill(time.monotonic())
+        self.level = min(self.level, 0.0)
+
+
+class _Ticket:
+    def __init__(self, priority: int, seq: int, tokens: int):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Lane:
+    """Queue, buckets and counters for one quota: a model or the File API."""
+
+    def __init__(self, rpm: float, tpm: float, period: float):
+        self.set_limits(rpm, tpm, period)
+        self.queue: List[_Ticket] = []
+        self.in_flight = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failed = 0
+        self.waits: Deque[float] = collections.deque(maxlen=WAIT_HISTORY)
+
+    def set_limits(self, rpm: float, tpm: float, period: float) -> None:
+        """Replaces the buckets; queued tickets and counters are kept."""
+        self.requests = TokenBucket(rpm / period, max(1.0, rpm * BURST_FRACTION)) if rpm else None
+        self.tokens = TokenBucket(tpm / period, tpm * BURST_FRACTION) if tpm else None
+
+    def wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    def take(self, tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+
+    def drain(self) -> None:
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.drain()
+
+
+class RequestScheduler:
+    """
+    Admits model and File API calls from every session against shared quotas.
+
+    Each quota (one per model name, plus FILE_API) has a request bucket, a
+    token bucket for models, and a priority queue: a call waits until it is
+    first in its queue and both buckets can cover it, so interactive calls
+    overtake queued batch work. Rate-limit and transient errors are retried
+    with jittered exponential backoff; a 429 also empties the quota's
+    buckets so every caller slows down, not just the one that was rejected.
+    period is the length of a quota window in seconds (60 for per-minute
+    quotas; load tests shrink it along with the simulated service).
+    """
+
+    def __init__(
+        self,
+        model_rpm: float = DEFAULT_MODEL_RPM,
+        model_tpm: float = DEFAULT_MODEL_TPM,
+        file_api_rpm: float = DEFAULT_FILE_API_RPM,
+        period: float = 60.0,
+        max_retries: int = MAX_RETRIES,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+    ):
+        self.model_rpm = model_rpm
+        self.model_tpm = model_tpm
+        self.file_api_rpm = file_api_rpm
+        self.period = period
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lanes: Dict[str, _Lane] = {}
+        self._limits: Dict[str, tuple] = {}
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+
+    def set_limits(self, key: str, rpm: float, tpm: float = 0) -> None:
+        """
+        Sets the quota of one model (or FILE_API), replacing its current buckets.
+
+        An existing lane is updated in place, so calls already queued on it
+        stay in line and are re-checked against the new limits.
+        """
+        with self._condition:
+            self._limits[key] = (rpm, tpm)
+            lane = self._lanes.get(key)
+            if lane is not None:
+                lane.set_limits(rpm, tpm, self.period)
+                self._condition.notify_all()
+
+    def _lane(self, key: str) -> _Lane:
+        lane = self._lanes.get(key)
+        if lane is None:
+            if key in self._limits:
+                rpm, tpm = self._limits[key]
+            elif key == FILE_API:
+                rpm, tpm = self.file_api_rpm, 0
+            else:
+                rpm, tpm = self.model_rpm, self.model_tpm
+            lane = self._lanes[key] = _Lane(rpm, tpm, self.period)
+        return lane
+
+    def _acquire(self, key: str, priority: int, tokens: int, seq: int) -> float:
+        ticket = _Ticket(priority, seq, tokens)
+        with self._condition:
+            lane = self._lane(key)
+            heapq.heappush(lane.queue, ticket)
+            while True:
+                if lane.queue[0] is ticket:
+                    wait = lane.wait_time(tokens)
+                    if wait <= 0:
+                        heapq.heappop(lane.queue)
+                        lane.take(tokens)
+                        lane.in_flight += 1
+                        lane.admitted += 1
+                        waited = time.monotonic() - ticket.enqueued_at
+                        lane.waits.append(waited)
+                        # The next ticket may be admissible right away.
+                        self._condition.notify_all()
+                        return waited
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+
+    def call(
+        self,
+        key: str,
+        fn: Callable[..., Any],
+        *args,
+        tokens: int = 0,
+        priority: Optional[int] = None,
+        retries: Optional[int] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Runs fn(*args, **kwargs) once the quota named key admits it, retrying retryable errors.
+
+        tokens is the estimated token cost; priority defaults to the one set
+        with request_priority(), else NORMAL. The last error is raised once
+        retries are used up. Pass retries=0 when the caller retries on its
+        own: its errors then do not count as retries or failures in
+        snapshot(), though a 429 still empties the buckets.
+        """
+        priority = current_priority() if priority is None else priority
+        retries = self.max_retries if retries is None else retries
+        # Retries keep their place in line rather than queueing behind newer calls.
+        seq = next(self._seq)
+        for attempt in range(retries + 1):
+            self._admit(key, priority, tokens, seq)
+            try:
+                return fn(*args, **kwargs)
+            except retryable_errors() as e:
+                # With retries=0 the caller retries on its own and keeps its own counts.
+                self._count_error(key, e, final=attempt == retries if retries else None)
+                if attempt == retries:
+                    raise
+            finally:
+                self._release(key)
+            self._backoff(attempt)
+
+    def _admit(self, key: str, priority: int, tokens: int, seq: int) -> None:
+        waited = self._acquire(key, priority, tokens, seq)
+        if waited > 0.01:
+            _record_wait(key, priority, waited)
+
+    def _release(self, key: str) -> None:
+        with self._condition:
+            self._lane(key).in_flight -= 1
+
+    def _count_error(self, key: str, error: Exception, final: Optional[bool]) -> None:
+        """Counts a retryable error as a failure or a retry (neither if final is None); a 429 also empties the quota's buckets."""
+        from google.api_core.exceptions import TooManyRequests
+
+        with self._condition:
+            lane = self._lane(key)
+            if isinstance(error, TooManyRequests):
+                lane.throttled += 1
+                lane.drain()
+            if final:
+                lane.failed += 1
+            elif final is not None:
+                lane.retries += 1
+
+    def _backoff(self, attempt: int) -> None:
+        time.sleep(min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def settle(self, key: str, estimated: int, actual: int) -> None:
+        """Corrects a call's token reservation once its real usage is known."""
+        with self._condition:
+            lane = self._lane(key)
+            if lane.tokens is not None and actual:
+                lane.tokens.take(actual - estimated)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """One row per quota: queued calls by priority, calls in flight, waits and throttling."""
+        rows = []
+        with self._condition:
+            for key, lane in sorted(self._lanes.items()):
+                waits = sorted(lane.waits)
+                queued = collections.Counter(ticket.priority for ticket in lane.queue)
+                rows.append({
+                    "quota": key,
+                    "queued": len(lane.queue),
+                    **{f"queued_{name}": queued.get(level, 0) for level, name in PRIORITY_NAMES.items()},
+                    "in_flight": lane.in_flight,
+                    "admitted": lane.admitted,
+                    "avg_wait_s": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                    "p95_wait_s": round(waits[int(len(waits) * 0.95)], 2) if waits else 0.0,
+                    "throttled": lane.throttled,
+                    "retries": lane.retries,
+                    "failed": lane.failed,
+                })
+        return rows
+
+
+def _record_wait(key: str, priority: int, seconds: float) -> None:
+    from utils.metrics import record_duration
+
+    record_duration("queue_wait", seconds, current_session_id(), quota=key, priority=PRIORITY_NAMES.get(priority, priority))
+
+
+class ScheduledStream:
+    """
+    A streamed generate_content reply that keeps its quota slot until the stream ends.
+
+    The call is made when iteration starts. A retryable error before the
+    first chunk retries the whole call like RequestScheduler.call(); after
+    that the error is counted (a 429 still empties the buckets) and raised,
+    since the caller has already used part of the reply. Once the stream is
+    exhausted its token usage is settled against the estimate. Other
+    attributes, such as usage_metadata, come from the underlying response.
+    """
+
+    def __init__(self, scheduler: RequestScheduler, key: str, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any],
+                 tokens: int, priority: int, retries: Optional[int] = None):
+        self._scheduler = scheduler
+        self._key = key
+        self._call = functools.partial(fn, *args, **kwargs)
+        self._tokens = tokens
+        self._priority = priority
+        self._retries = scheduler.max_retries if retries is None else retries
+        self._response: Any = None
+
+    def __iter__(self) -> Iterator[Any]:
+        scheduler = self._scheduler
+        seq = next(scheduler._seq)
+        for attempt in range(self._retries + 1):
+            scheduler._admit(self._key, self._priority, self._tokens, seq)
+            started = False
+            try:
+                self._response = self._call()
+                for chunk in self._response:
+                    started = True
+                    yield chunk
+                usage = getattr(self._response, "usage_metadata", None)
+                scheduler.settle(self._key, self._tokens, getattr(usage, "total_token_count", 0) or 0)
+                return
+            except retryable_errors() as e:
+                final = started or attempt == self._retries
+                scheduler._count_error(self._key, e, final)
+                if final:
+                    raise
+            finally:
+                scheduler._release(self._key)
+            scheduler._backoff(attempt)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+
+class ScheduledModel:
+    """
+    A GenerativeModel whose generate_content calls go through the scheduler.
+
+    Everything else is delegated to the wrapped model, so model_name and the
+    generation config stay visible to the result cache. priority applies
+    when no request_priority() is in effect.
+    """
+
+    def __init__(self, model: Any, priority: int = NORMAL, scheduler: Optional[RequestScheduler] = None):
+        self._model = model
+        self._priority = priority
+        self._scheduler = scheduler
+
+    @property
+    def quota_key(self) -> str:
+        return getattr(self._model, "model_name", None) or "default"
+
+    def generate_content(self, contents, *args, **kwargs):
+        scheduler = self._scheduler or get_scheduler()
+        estimated = estimate_tokens(contents) + OUTPUT_TOKEN_ESTIMATE
+        priority = current_priority(self._priority)
+        if kwargs.get("stream"):
+            return ScheduledStream(
+                scheduler, self.quota_key, self._model.generate_content, (contents, *args), kwargs, estimated, priority,
+            )
+        response = scheduler.call(
+            self.quota_key, self._model.generate_content, contents, *args,
+            tokens=estimated, priority=priority, **kwargs,
+        )
+        usage = getattr(response, "usage_metadata", None)
+        scheduler.settle(self.quota_key, estimated, getattr(usage, "total_token_count", 0) or 0)
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._model, name)
+
+
+def file_api_call(fn: Callable[..., Any], *args, retries: Optional[int] = None, **kwargs) -> Any:
+    """Runs a File API call (upload_file, get_file, delete_file) under the shared File API quota."""
+    return get_scheduler().call(FILE_API, fn, *args, retries=retries, **kwargs)
+
+
+def format_queue_status(rows: List[Dict[str, Any]]) -> str:
+    queued = sum(row["queued"] for row in rows)
+    throttled = sum(row["throttled"] for row in rows)
+    waits = [row["avg_wait_s"] for row in rows if row["admitted"]]
+    average = max(waits) if waits else 0.0
+    return f"Request queue: {queued} waiting, average wait up to {average:.1f}s, {throttled} rate-limited"
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Returns the process-wide scheduler shared by all sessions."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def set_scheduler(scheduler: Optional[RequestScheduler]) -> None:
+    """Replaces the process-wide scheduler, e.g. with different limits in a load test."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
@@ -0,0 +1,23 @@
+from typing import Optional, List
+
+# The SDK builds response schemas with pydantic, which rejects typing.TypedDict before Python 3.12.
+from typing_extensions import TypedDict
+
+
+# Define the structure for Video Analysis metadata
+class VideoAnalysis(TypedDict):
+    name: str
+    title: str
+    total_duration: float  # Duration in seconds
+    summary: str
+    small_summary: str
+    tags: Optional[List[str]]
+
+
+# One detected object; coordinates are normalized to 0-1000.
+class DetectedBox(TypedDict):
+    name: str
+    ymin: float
+    xmin: float
+    ymax: float
+    xmax: float
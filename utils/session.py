@@ -0,0 +1,18 @@
+import sys
+
+
+def current_session_id() -> str:
+    """Returns the id of the Streamlit session running this thread, or "default" outside one."""
+    # Without Streamlit loaded there is no session to find, and importing it
+    # here would cost headless callers (the CLI, worker threads) a second.
+    if "streamlit" not in sys.modules:
+        return "default"
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        # Also called from worker threads (e.g. by the request scheduler), where no context is expected.
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            return ctx.session_id
+    except ImportError:
+        pass
+    return "default"
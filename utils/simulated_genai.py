@@ -0,0 +1,451 @@
+"""
+In-process stand-in for the parts of google.generativeai this app uses.
+
+Select it with GENAI_BACKEND=simulated (see utils/backend.py). Uploads take
+time proportional to their size, video and audio files sit in PROCESSING
+before turning ACTIVE (or FAILED), model calls have a time to first token
+plus a per-token cost and can fail with the same google.api_core
+exceptions as the real service. Replies follow the response schema or the
+prompt of each flow: video metadata, speaker-labelled transcripts, boxes
+for object detection and plain answers otherwise.
+
+All timings and failure rates come from SimulationConfig, which reads SIM_*
+environment variables; time_scale multiplies every delay so benchmark runs
+can be kept short.
+"""
+import collections
+import datetime
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import threading
+import time
+import types
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from google.api_core import exceptions as api_exceptions
+
+
+class SimulationConfig:
+    """Latency, processing-time and failure distributions of the simulated service."""
+
+    def __init__(
+        self,
+        time_scale: float = 1.0,
+        request_latency: float = 0.08,
+        upload_overhead: float = 0.3,
+        upload_mbps: float = 50.0,
+        processing_base: float = 2.0,
+        processing_per_mb: float = 0.05,
+        first_token_latency: float = 0.5,
+        tokens_per_second: float = 150.0,
+        latency_sigma: float = 0.3,
+        upload_failure_rate: float = 0.0,
+        processing_failure_rate: float = 0.0,
+        generate_failure_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        rpm_limit: float = 0.0,
+        tpm_limit: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.time_scale = time_scale
+        self.request_latency = request_latency
+        self.upload_overhead = upload_overhead
+        self.upload_mbps = upload_mbps
+        self.processing_base = processing_base
+        self.processing_per_mb = processing_per_mb
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.latency_sigma = latency_sigma
+        self.upload_failure_rate = upload_failure_rate
+        self.processing_failure_rate = processing_failure_rate
+        self.generate_failure_rate = generate_failure_rate
+        self.malformed_rate = malformed_rate
+        # Per-model quotas over a sliding minute (scaled by time_scale); 0 means unlimited.
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls) -> "SimulationConfig":
+        """Builds a config from SIM_<FIELD> environment variables, e.g. SIM_TIME_SCALE=0.1."""
+        defaults = cls()
+        values = {}
+        for field, default in vars(defaults).items():
+            raw = os.getenv(f"SIM_{field.upper()}")
+            if raw is not None:
+                values[field] = int(raw) if field == "seed" else float(raw)
+        return cls(**values) if values else defaults
+
+
+_config = SimulationConfig.from_env()
+_rng = random.Random(_config.seed)
+_rng_lock = threading.Lock()
+_files: Dict[str, Dict[str, Any]] = {}
+_files_lock = threading.Lock()
+_counter = itertools.count(1)
+_quota_log: Dict[str, collections.deque] = collections.defaultdict(collections.deque)
+_quota_lock = threading.Lock()
+
+# Token accounting roughly as documented for Gemini.
+TOKENS_PER_IMAGE = 258
+TOKENS_PER_MB = {"video": 3000, "audio": 1000}
+CHARS_PER_TOKEN = 4
+
+
+def configure(api_key: Optional[str] = None, **kwargs) -> None:
+    """Accepted for compatibility with genai.configure; the simulation needs no key."""
+
+
+def configure_simulation(config: Optional[SimulationConfig] = None, **overrides) -> SimulationConfig:
+    """Replaces the active config (or just some of its fields) and reseeds the random source."""
+    global _config, _rng
+    config = config or SimulationConfig(**{**vars(_config), **overrides})
+    with _rng_lock:
+        _config = config
+        _rng = random.Random(config.seed)
+    return config
+
+
+def get_config() -> SimulationConfig:
+    return _config
+
+
+def reset() -> None:
+    """Forgets every simulated file and the quota usage so far."""
+    with _files_lock:
+        _files.clear()
+    with _quota_lock:
+        _quota_log.clear()
+
+
+def _random() -> float:
+    with _rng_lock:
+        return _rng.random()
+
+
+def _sample(median: float) -> float:
+    """A lognormal delay around median, scaled by time_scale."""
+    if median <= 0:
+        return 0.0
+    with _rng_lock:
+        value = _rng.lognormvariate(math.log(median), _config.latency_sigma)
+    return value * _config.time_scale
+
+
+def _sleep(seconds: float) -> None:
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+def _maybe_fail(rate: float, error: type) -> None:
+    if rate and _random() < rate:
+        raise error("Simulated transient failure")
+
+
+class File:
+    """Snapshot of a simulated remote file, shaped like google.generativeai's File."""
+
+    def __init__(self, record: Dict[str, Any]):
+        now = time.time()
+        if record["state"] == "PROCESSING" and now >= record["ready_at"]:
+            record["state"] = "FAILED" if record["will_fail"] else "ACTIVE"
+        self.name = record["name"]
+        self.display_name = record["display_name"]
+        self.mime_type = record["mime_type"]
+        self.size_bytes = record["size_bytes"]
+        self.sha256_hash = record["sha256_hash"]
+        self.uri = f"https://simulated.invalid/v1beta/{record['name']}"
+        self.create_time = record["create_time"]
+        self.update_time = record["create_time"]
+        self.expiration_time = record["create_time"] + datetime.timedelta(hours=48)
+        self.state = types.SimpleNamespace(name=record["state"])
+
+    def delete(self) -> None:
+        delete_file(self.name)
+
+    def __repr__(self) -> str:
+        return f"File(name={self.name!r}, state={self.state.name})"
+
+
+def _read_upload(path) -> bytes:
+    if isinstance(path, (str, os.PathLike)):
+        with open(path, "rb") as f:
+            return f.read()
+    data = path.read()
+    return data if isinstance(data, bytes) else data.encode()
+
+
+def upload_file(path, *, mime_type: Optional[str] = None, name: Optional[str] = None,
+                display_name: Optional[str] = None, resumable: bool = True) -> File:
+    data = _read_upload(path)
+    size_mb = len(data) / (1024 * 1024)
+    _sleep(_sample(_config.upload_overhead) + size_mb * 8 / _config.upload_mbps * _config.time_scale)
+    _maybe_fail(_config.upload_failure_rate, api_exceptions.ServiceUnavailable)
+
+    mime_type = mime_type or "application/octet-stream"
+    media = mime_type.split("/", 1)[0]
+    processing = 0.0
+    if media in ("video", "audio"):
+        processing = _sample(_config.processing_base + _config.processing_per_mb * size_mb)
+    file_name = name or f"files/sim-{next(_counter):06d}-{uuid.uuid4().hex[:6]}"
+    record = {
+        "name": file_name,
+        "display_name": display_name or (path if isinstance(path, str) else getattr(path, "name", "")),
+        "mime_type": mime_type,
+        "size_bytes": len(data),
+        "sha256_hash": hashlib.sha256(data).digest(),
+        "create_time": datetime.datetime.now(datetime.timezone.utc),
+        "state": "PROCESSING" if processing else "ACTIVE",
+        "ready_at": time.time() + processing,
+        "will_fail": _random() < _config.processing_failure_rate,
+    }
+    with _files_lock:
+        _files[file_name] = record
+        return File(record)
+
+
+def get_file(name: str) -> File:
+    _sleep(_sample(_config.request_latency))
+    with _files_lock:
+        record = _files.get(getattr(name, "name", name))
+        if record is None:
+            raise api_exceptions.NotFound(f"File {name} not found")
+        return File(record)
+
+
+def list_files(page_size: int = 100) -> Iterator[File]:
+    """Yields files newest first, one simulated request per page."""
+    with _files_lock:
+        names = sorted(_files, key=lambda n: _files[n]["create_time"], reverse=True)
+    for start in range(0, len(names), page_size):
+        _sleep(_sample(_config.request_latency))
+        with _files_lock:
+            page = [File(_files[n]) for n in names[start:start + page_size] if n in _files]
+        yield from page
+
+
+def delete_file(name) -> None:
+    _sleep(_sample(_config.request_latency))
+    with _files_lock:
+        if _files.pop(getattr(name, "name", name), None) is None:
+            raise api_exceptions.NotFound(f"File {name} not found")
+
+
+def _config_value(config: Any, key: str) -> Any:
+    if config is None:
+        return None
+    if isinstance(config, dict):
+        return config.get(key)
+    return getattr(config, key, None)
+
+
+def _part_tokens(part: Any) -> int:
+    if isinstance(part, str):
+        return max(1, len(part) // CHARS_PER_TOKEN)
+    if isinstance(part, File):
+        media = part.mime_type.split("/", 1)[0]
+        if media == "image":
+            return TOKENS_PER_IMAGE
+        return int(TOKENS_PER_MB.get(media, 250) * part.size_bytes / (1024 * 1024)) + 1
+    # Inline blobs and PIL images.
+    return TOKENS_PER_IMAGE
+
+
+def _seed_for(contents: List[Any]) -> int:
+    digest = hashlib.sha256()
+    for part in contents:
+        if isinstance(part, str):
+            digest.update(part.encode())
+        elif isinstance(part, File):
+            digest.update(part.sha256_hash)
+        elif isinstance(part, dict) and "data" in part:
+            digest.update(part["data"][:4096])
+    return int.from_bytes(digest.digest()[:8], "big")
+
+
+WORDS = (
+    "the team reviews quarterly results and discusses the product roadmap with a focus on "
+    "customer feedback latency costs and the launch plan for next month"
+).split()
+OBJECT_NAMES = ["person", "car", "dog", "golden retriever", "bicycle", "bottle", "cup", "chair"]
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _boxes(rng: random.Random) -> List[Dict[str, Any]]:
+    boxes = []
+    for _ in range(rng.randint(2, 12)):
+        x, y = rng.randint(0, 850), rng.randint(0, 850)
+        boxes.append({
+            "name": rng.choice(OBJECT_NAMES),
+            "ymin": y, "xmin": x,
+            "ymax": y + rng.randint(20, 150), "xmax": x + rng.randint(20, 150),
+        })
+    return boxes
+
+
+def _reply(contents: List[Any], config: Any, system_instruction: Optional[str]) -> str:
+    rng = random.Random(_seed_for(contents))
+    schema = _config_value(config, "response_schema")
+    prompt = " ".join(part for part in contents if isinstance(part, str)).lower()
+    files = [part for part in contents if isinstance(part, File)]
+
+    if getattr(schema, "__origin__", None) is list or "bounding box" in prompt:
+        text = json.dumps(_boxes(rng))
+        if schema is None:
+            # Without JSON mode the model tends to fence its output.
+            text = f"```json\n{text}\n```"
+        if _random() < _config.malformed_rate:
+            text = text[: len(text) // 2]
+        return text
+    if schema is not None and hasattr(schema, "__annotations__"):
+        size_mb = sum(f.size_bytes for f in files) / (1024 * 1024)
+        values = {
+            "name": files[0].display_name if files else "video",
+            "title": _sentence(rng, 5).rstrip("."),
+            "total_duration": round(size_mb * 8 + rng.uniform(5, 30), 1),
+            "summary": " ".join(_sentence(rng, 14) for _ in range(4)),
+            "small_summary": _sentence(rng, 12),
+            "tags": rng.sample(WORDS, 5),
+        }
+        return json.dumps({key: values.get(key, _sentence(rng, 3)) for key in schema.__annotations__})
+    if "transcribe" in prompt:
+        size_mb = sum(f.size_bytes for f in files) / (1024 * 1024)
+        speakers = ["Speaker A", "Speaker B", "Speaker C"][: rng.randint(2, 3)]
+        lines = max(3, int(size_mb * 20))
+        return "\n".join(f"[{rng.choice(speakers)}]: {_sentence(rng, rng.randint(6, 18))}" for _ in range(lines))
+    return " ".join(_sentence(rng, rng.randint(8, 16)) for _ in range(rng.randint(2, 5)))
+
+
+def _enforce_quota(model_name: str, tokens: int) -> None:
+    """Rejects the request with 429 if it would exceed the model's requests or tokens per minute."""
+    if not (_config.rpm_limit or _config.tpm_limit):
+        return
+    now = time.monotonic()
+    window = 60 * _config.time_scale
+    with _quota_lock:
+        log = _quota_log[model_name]
+        while log and log[0][0] <= now - window:
+            log.popleft()
+        if _config.rpm_limit and len(log) + 1 > _config.rpm_limit:
+            raise api_exceptions.ResourceExhausted(f"Quota exceeded for {model_name}: requests per minute")
+        if _config.tpm_limit and sum(used for _, used in log) + tokens > _config.tpm_limit:
+            raise api_exceptions.ResourceExhausted(f"Quota exceeded for {model_name}: input tokens per minute")
+        log.append((now, tokens))
+
+
+class _Response:
+    """The parts of GenerateContentResponse the app reads."""
+
+    def __init__(self, text: str, prompt_tokens: int, cached_tokens: int = 0, finish_reason: str = "STOP"):
+        self.text = text
+        self.usage_metadata = types.SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            cached_content_token_count=cached_tokens,
+            candidates_token_count=max(1, len(text) // CHARS_PER_TOKEN),
+            total_token_count=prompt_tokens + max(1, len(text) // CHARS_PER_TOKEN),
+        )
+        self.candidates = [types.SimpleNamespace(finish_reason=types.SimpleNamespace(name=finish_reason))]
+
+
+class _StreamingResponse:
+    """Iterates response chunks as they are "generated"; text is the full reply afterwards."""
+
+    CHUNK_CHARS = 48
+
+    def __init__(self, text: str, prompt_tokens: int, cached_tokens: int, first_token: float):
+        self._text = text
+        self._prompt_tokens = prompt_tokens
+        self._cached_tokens = cached_tokens
+        self._first_token = first_token
+        self._done = False
+        self.text = ""
+        self.usage_metadata = None
+        self.candidates = []
+
+    def __iter__(self):
+        _sleep(self._first_token)
+        per_char = _config.time_scale / (_config.tokens_per_second * CHARS_PER_TOKEN)
+        for start in range(0, len(self._text), self.CHUNK_CHARS):
+            chunk = self._text[start:start + self.CHUNK_CHARS]
+            _sleep(per_char * len(chunk))
+            yield _Response(chunk, self._prompt_tokens, self._cached_tokens)
+        final = _Response(self._text, self._prompt_tokens, self._cached_tokens)
+        self.text, self.usage_metadata, self.candidates = final.text, final.usage_metadata, final.candidates
+
+
+class GenerativeModel:
+    """Simulated GenerativeModel: same constructor and generate_content signature as the SDK."""
+
+    def __init__(self, model_name: str = "gemini-simulated", generation_config: Any = None,
+                 system_instruction: Optional[str] = None, **kwargs):
+        self.model_name = model_name or "gemini-simulated"
+        self._generation_config = generation_config
+        self._system_instruction = system_instruction
+        self._cached_content = None
+
+    @classmethod
+    def from_cached_content(cls, cached_content: "CachedContent", generation_config: Any = None, **kwargs) -> "GenerativeModel":
+        model = cls(cached_content.model, generation_config, cached_content.system_instruction)
+        model._cached_content = cached_content
+        return model
+
+    def generate_content(self, contents, generation_config: Any = None, stream: bool = False, **kwargs):
+        contents = list(contents) if isinstance(contents, (list, tuple)) else [contents]
+        for part in contents:
+            if isinstance(part, File) and get_file(part.name).state.name != "ACTIVE":
+                raise api_exceptions.FailedPrecondition(f"File {part.name} is not in an ACTIVE state")
+
+        cached_tokens = self._cached_content.token_count if self._cached_content is not None else 0
+        all_contents = contents + (self._cached_content.contents if self._cached_content is not None else [])
+        prompt_tokens = sum(_part_tokens(part) for part in contents) + cached_tokens
+        _enforce_quota(self.model_name, prompt_tokens)
+        text = _reply(all_contents, generation_config or self._generation_config, self._system_instruction)
+
+        first_token = _sample(_config.first_token_latency + prompt_tokens / 20000)
+        _maybe_fail(_config.generate_failure_rate, api_exceptions.TooManyRequests)
+        if stream:
+            return _StreamingResponse(text, prompt_tokens, cached_tokens, first_token)
+        output_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+        _sleep(first_token + output_tokens / _config.tokens_per_second * _config.time_scale)
+        return _Response(text, prompt_tokens, cached_tokens)
+
+
+class CachedContent:
+    """Simulated context cache holding contents for follow-up questions."""
+
+    def __init__(self, model: str, display_name: str, system_instruction: Optional[str], contents: List[Any], ttl):
+        self.name = f"cachedContents/sim-{uuid.uuid4().hex[:10]}"
+        self.model = model or "gemini-simulated"
+        self.display_name = display_name
+        self.system_instruction = system_instruction
+        self.contents = list(contents)
+        self.token_count = sum(_part_tokens(part) for part in self.contents)
+        self.usage_metadata = types.SimpleNamespace(total_token_count=self.token_count)
+        self.expire_time = datetime.datetime.now(datetime.timezone.utc) + ttl
+
+    @classmethod
+    def create(cls, model: str, display_name: Optional[str] = None, system_instruction: Optional[str] = None,
+               contents: Optional[List[Any]] = None, ttl: datetime.timedelta = datetime.timedelta(hours=1), **kwargs):
+        cache = cls(model, display_name, system_instruction, contents or [], ttl)
+        _sleep(_sample(_config.first_token_latency + cache.token_count / 20000))
+        return cache
+
+    def update(self, ttl: Optional[datetime.timedelta] = None, **kwargs) -> None:
+        _sleep(_sample(_config.request_latency))
+        if ttl is not None:
+            self.expire_time = datetime.datetime.now(datetime.timezone.utc) + ttl
+
+    def delete(self) -> None:
+        _sleep(_sample(_config.request_latency))
+
+
+# Mirrors "from google.generativeai import caching".
+caching = types.SimpleNamespace(CachedContent=CachedContent)
@@ -0,0 +1,112 @@
+import json
+import re
+import time
+from typing import Any, Dict, List
+
+BOX_KEYS = {"name": str, "ymin": (int, float), "xmin": (int, float), "ymax": (int, float), "xmax": (int, float)}
+
+# Characters that can change the parser state inside an object.
+_OBJECT_TOKENS = re.compile(r'[{}"]')
+_STRING_TOKENS = re.compile(r'["\\]')
+
+
+def is_valid_box(value: Any) -> bool:
+    return isinstance(value, dict) and all(
+        key in value and isinstance(value[key], expected) for key, expected in BOX_KEYS.items()
+    )
+
+
+class BoxStreamParser:
+    """
+    Incremental parser that pulls box objects out of a streamed model response.
+
+    feed() takes arbitrary text chunks and returns every box object whose
+    closing brace arrived in that chunk. Text outside objects (code fences,
+    prose, the enclosing array brackets and commas) is skipped without being
+    copied, strings are tracked so braces inside labels are ignored, and each
+    completed object is decoded with json.loads once. Objects that are not
+    valid boxes are counted in rejected. CPU time spent parsing is
+    accumulated in parse_seconds.
+    """
+
+    def __init__(self):
+        self.rejected = 0
+        self.parse_seconds = 0.0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object: List[str] = []
+
+    @property
+    def pending(self) -> bool:
+        """Whether an object has been opened but not yet closed."""
+        return self._depth > 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        started = time.process_time()
+        boxes = []
+        position = 0
+        length = len(chunk)
+        while position < length:
+            if self._depth == 0:
+                # Outside any object: jump straight to the next opening brace.
+                start = chunk.find("{", position)
+                if start < 0:
+                    break
+                self._depth = 1
+                self._object = ["{"]
+                position = start + 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                    self._object.append(chunk[position])
+                    position += 1
+                    continue
+                match = _STRING_TOKENS.search(chunk, position)
+                if match is None:
+                    self._object.append(chunk[position:])
+                    break
+                end = match.end()
+                self._object.append(chunk[position:end])
+                if match.group() == "\\":
+                    self._escaped = True
+                else:
+                    self._in_string = False
+                position = end
+                continue
+
+            match = _OBJECT_TOKENS.search(chunk, position)
+            if match is None:
+                self._object.append(chunk[position:])
+                break
+            end = match.end()
+            self._object.append(chunk[position:end])
+            position = end
+            token = match.group()
+            if token == '"':
+                self._in_string = True
+            elif token == "{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    box = self._finish_object()
+                    if box is not None:
+                        boxes.append(box)
+        self.parse_seconds += time.process_time() - started
+        return boxes
+
+    def _finish_object(self):
+        text = "".join(self._object)
+        self._object = []
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            self.rejected += 1
+            return None
+        if not is_valid_box(value):
+            self.rejected += 1
+            return None
+        return value
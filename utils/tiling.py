@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils.boxes import BoxArray
+from utils.reporter import RecordingReporter, use_reporter
+
+DEFAULT_TILE_SIZE = 1024
+DEFAULT_TILE_OVERLAP = 0.2
+DEFAULT_TILE_WORKERS = 4
+DEFAULT_IOU_THRESHOLD = 0.5
+# A box cut by a tile seam lies almost entirely inside the complete box from the
+# neighbouring tile, so it is suppressed on containment even when IoU is low.
+DEFAULT_CONTAINMENT_THRESHOLD = 0.85
+# Pieces of one object on either side of a seam share nearly the same extent across it.
+SEAM_EXTENT_RATIO = 0.8
+# Boxes within this many pixels of an inner tile edge count as clipped by it.
+EDGE_TOLERANCE = 2
+
+Tile = Tuple[int, int, int, int]
+
+
+def _tile_starts(length: int, tile_size: int, step: int) -> List[int]:
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)
+    return starts
+
+
+def make_tiles(width: int, height: int, tile_size: int = DEFAULT_TILE_SIZE,
+               overlap: float = DEFAULT_TILE_OVERLAP) -> List[Tile]:
+    """Returns (left, top, right, bottom) tiles covering the image with the given overlap fraction."""
+    step = max(1, int(tile_size * (1 - overlap)))
+    return [
+        (left, top, min(left + tile_size, width), min(top + tile_size, height))
+        for top in _tile_starts(height, tile_size, step)
+        for left in _tile_starts(width, tile_size, step)
+    ]
+
+
+def nms_per_class(boxes: np.ndarray, scores: np.ndarray, labels: np.ndarray,
+                  iou_threshold: float = DEFAULT_IOU_THRESHOLD,
+                  containment_threshold: float = DEFAULT_CONTAINMENT_THRESHOLD) -> np.ndarray:
+    """
+    Greedy non-maximum suppression run separately for every label.
+
+    boxes is an (N, 4) array of xmin, ymin, xmax, ymax. Classes are separated
+    by shifting each label's boxes into its own coordinate range, so all
+    classes are suppressed in one pass. Overlaps against the remaining boxes
+    are computed as array operations. Returns the kept indices, highest score
+    first.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    boxes = boxes.astype(np.float64)
+    offset = (boxes.max() + 1) * labels.astype(np.float64)
+    shifted = boxes + offset[:, None]
+    x1, y1, x2, y2 = shifted.T
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        current, rest = order[0], order[1:]
+        keep.append(current)
+        inter_w = np.maximum(0, np.minimum(x2[current], x2[rest]) - np.maximum(x1[current], x1[rest]))
+        inter_h = np.maximum(0, np.minimum(y2[current], y2[rest]) - np.maximum(y1[current], y1[rest]))
+        intersection = inter_w * inter_h
+        iou = intersection / np.maximum(areas[current] + areas[rest] - intersection, 1e-9)
+        containment = intersection / np.maximum(np.minimum(areas[current], areas[rest]), 1e-9)
+        order = rest[(iou <= iou_threshold) & (containment <= containment_threshold)]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def _seam_pairs(seam: np.ndarray, peers: np.ndarray, extent_ratio: float) -> np.ndarray:
+    """(len(seam), len(peers)) mask of box pairs that intersect and agree in extent along x or y."""
+    x1, y1, x2, y2 = seam.T[:, :, None]
+    px1, py1, px2, py2 = peers.T[:, None, :]
+    inter_x = np.minimum(x2, px2) - np.maximum(x1, px1)
+    inter_y = np.minimum(y2, py2) - np.maximum(y1, py1)
+    union_x = np.maximum(x2, px2) - np.minimum(x1, px1)
+    union_y = np.maximum(y2, py2) - np.minimum(y1, py1)
+    aligned = (inter_y / np.maximum(union_y, 1e-9) >= extent_ratio) | (inter_x / np.maximum(union_x, 1e-9) >= extent_ratio)
+    return (inter_x > 0) & (inter_y > 0) & aligned
+
+
+def fuse_seam_fragments(boxes: np.ndarray, labels: np.ndarray, clipped: np.ndarray,
+                        extent_ratio: float = SEAM_EXTENT_RATIO) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Joins pieces of one object that was cut by a tile seam into a single box.
+
+    Two boxes are fused when they share a label, intersect, at least one was
+    clipped by a tile edge, and their extents across the seam agree (1-D IoU
+    of at least extent_ratio along x or y). Only clipped boxes can start a
+    pair, so each label's clipped boxes are tested against that label's
+    boxes as one (clipped, label) array rather than all boxes against all.
+    Tests are repeated until no pair fuses. Returns the fused boxes and the
+    indices of the input boxes they replace.
+    """
+    boxes = boxes.astype(np.float64)
+    clipped = clipped.copy()
+    alive = np.ones(len(boxes), dtype=bool)
+    while True:
+        fused = False
+        for label in np.unique(labels[alive & clipped]):
+            same_label = alive & (labels == label)
+            seam = np.flatnonzero(same_label & clipped)
+            peers = np.flatnonzero(same_label)
+            candidates = _seam_pairs(boxes[seam], boxes[peers], extent_ratio) & (seam[:, None] != peers[None, :])
+            used = set()
+            for i, j in np.argwhere(candidates):
+                a, b = sorted((seam[i], peers[j]))
+                if a in used or b in used:
+                    continue
+                boxes[a, :2] = np.minimum(boxes[a, :2], boxes[b, :2])
+                boxes[a, 2:] = np.maximum(boxes[a, 2:], boxes[b, 2:])
+                clipped[a] = clipped[a] and clipped[b]
+                alive[b] = False
+                used.update((a, b))
+                fused = True
+        if not fused:
+            return boxes[alive], np.flatnonzero(alive)
+
+
+def merge_tile_boxes(boxes: BoxArray,
+                     clipped: Optional[np.ndarray] = None,
+                     iou_threshold: float = DEFAULT_IOU_THRESHOLD,
+                     containment_threshold: float = DEFAULT_CONTAINMENT_THRESHOLD) -> BoxArray:
+    """
+    Merges detections of the same object from overlapping tiles.
+
+    Pieces of objects cut by a seam (clipped[i] is True for boxes touching an
+    inner tile edge) are first fused, then duplicates are removed with per-class
+    NMS, keeping the largest box. Labels are compared case-insensitively.
+    """
+    if not len(boxes):
+        return boxes
+    _, label_groups = np.unique([label.strip().lower() for label in boxes.labels], return_inverse=True)
+    groups = label_groups.reshape(-1)[boxes.label_ids]
+    clipped_flags = np.zeros(len(boxes), dtype=bool) if clipped is None else np.asarray(clipped, dtype=bool)
+
+    coords, sources = fuse_seam_fragments(boxes.coords, groups, clipped_flags)
+    fused = BoxArray(np.round(coords), boxes.label_ids[sources], boxes.labels)
+    keep = nms_per_class(fused.coords, fused.areas(), groups[sources], iou_threshold, containment_threshold)
+    return fused.select(np.sort(keep))
+
+
+def detect_tiled(
+    image: Image.Image,
+    detect_tile: Callable[[Image.Image], Optional[Any]],
+    tile_size: int = DEFAULT_TILE_SIZE,
+    overlap: float = DEFAULT_TILE_OVERLAP,
+    max_workers: int = DEFAULT_TILE_WORKERS,
+    iou_threshold: float = DEFAULT_IOU_THRESHOLD,
+) -> Tuple[BoxArray, int, int]:
+    """
+    Runs detection on overlapping tiles concurrently and merges the results.
+
+    detect_tile receives a tile image and returns pixel boxes relative to that
+    tile, as a BoxArray (e.g. utils.detection.detect_boxes) or a list of box
+    dicts, or None on failure. Its messages are reported on the calling
+    thread, in tile order. Returns the merged boxes in global pixel
+    coordinates, the tile count and the number of failed tiles.
+    """
+    tiles = make_tiles(image.width, image.height, tile_size, overlap)
+
+    def run(tile: Tile):
+        recorder = RecordingReporter()
+        with use_reporter(recorder):
+            return locate(tile), recorder
+
+    def locate(tile: Tile):
+        left, top, right, bottom = tile
+        tile_boxes = detect_tile(image.crop(tile))
+        if tile_boxes is None:
+            return None
+        tile_boxes = BoxArray.coerce(tile_boxes)
+        xmin, ymin, xmax, ymax = tile_boxes.coords.T
+        # Only edges shared with a neighbouring tile can cut an object.
+        clipped = (
+            ((left > 0) & (xmin <= EDGE_TOLERANCE))
+            | ((top > 0) & (ymin <= EDGE_TOLERANCE))
+            | ((right < image.width) & (right - left - xmax <= EDGE_TOLERANCE))
+            | ((bottom < image.height) & (bottom - top - ymax <= EDGE_TOLERANCE))
+        )
+        return tile_boxes.translate(left, top), clipped
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="detect-tile") as pool:
+        results = []
+        for result, recorder in pool.map(run, tiles):
+            recorder.replay()
+            results.append(result)
+
+    failed = sum(result is None for result in results)
+    detections = [result for result in results if result is not None]
+    boxes = BoxArray.concatenate([tile_boxes for tile_boxes, _ in detections])
+    clipped = np.concatenate([flags for tile_boxes, flags in detections if len(tile_boxes)] or [np.zeros(0, dtype=bool)])
+    return merge_tile_boxes(boxes, clipped, iou_threshold), len(tiles), failed
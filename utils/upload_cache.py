@@ -0,0 +1,178 @@
+import datetime
+import hashlib
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from utils.backend import genai
+from utils.scheduler import file_api_call
+
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+DEFAULT_CACHE_PATH = os.getenv("UPLOAD_CACHE_PATH", ".cache/upload_cache.db")
+
+# Remote files that expire within this window are treated as already gone.
+EXPIRY_MARGIN_SECONDS = 10 * 60
+
+
+def hash_file_content(file, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Computes the SHA-256 hex digest of a file-like object in bounded chunks.
+
+    In-memory buffers (such as Streamlit's UploadedFile) are hashed through a
+    memoryview so the content is never copied. The stream is rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    if hasattr(file, "getbuffer"):
+        with file.getbuffer() as view:
+            for offset in range(0, len(view), chunk_size):
+                digest.update(view[offset:offset + chunk_size])
+    else:
+        file.seek(0)
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def to_timestamp(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class UploadCache:
+    """
+    Persistent map from content digest to the remote Gemini file holding that content.
+
+    Entries store the remote file name and its expiry. A lookup only counts as a
+    hit when the remote file still exists and is ACTIVE, so callers can skip both
+    the upload and the processing poll.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS uploads (
+                    digest TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    expires_at REAL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    def lookup(self, digest: str):
+        """Returns the ACTIVE remote file for the digest, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_name, expires_at FROM uploads WHERE digest = ?", (digest,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        file_name, expires_at = row
+        if expires_at is not None and expires_at - EXPIRY_MARGIN_SECONDS <= time.time():
+            self.forget(digest)
+            return None
+
+        try:
+            remote_file = file_api_call(genai.get_file, file_name)
+        except Exception:
+            self.forget(digest)
+            return None
+
+        if remote_file.state.name != "ACTIVE":
+            self.forget(digest)
+            return None
+        return remote_file
+
+    def store(self, digest: str, remote_file, size_bytes: int) -> None:
+        """Records the remote file that now holds the content with the given digest."""
+        expires_at = to_timestamp(getattr(remote_file, "expiration_time", None))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)",
+                (digest, remote_file.name, size_bytes, expires_at, time.time()),
+            )
+
+    def digest_for(self, file_name: str) -> Optional[str]:
+        """Returns the content digest recorded for a remote file name, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM uploads WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def forget(self, digest: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM uploads WHERE digest = ?", (digest,))
+
+    def forget_file(self, file_name: str) -> None:
+        """Drops the entry for a remote file that has been deleted."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM uploads WHERE file_name = ?", (file_name,))
+
+    def record_hit(self, size_bytes: int) -> None:
+        self._increment("hits", 1)
+        self._increment("saved_bytes", size_bytes)
+
+    def record_miss(self) -> None:
+        self._increment("misses", 1)
+
+    def _increment(self, key: str, amount: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO stats VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                (key, amount),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counts and the number of upload bytes saved so far."""
+        with self._lock:
+            rows = dict(self._conn.execute("SELECT key, value FROM stats").fetchall())
+        return {
+            "hits": rows.get("hits", 0),
+            "misses": rows.get("misses", 0),
+            "saved_bytes": rows.get("saved_bytes", 0),
+        }
+
+
+_cache: Optional[UploadCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_upload_cache() -> UploadCache:
+    """Returns the process-wide upload cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = UploadCache()
+        return _cache
+
+
+def format_cache_stats(stats: Dict[str, Any]) -> str:
+    saved_mb = stats["saved_bytes"] / (1024 * 1024)
+    return (
+        f"Upload cache: {stats['hits']} hits, {stats['misses']} misses, "
+        f"{saved_mb:,.1f} MB of uploads saved"
+    )
@@ -1,93 +1,414 @@
 import pathlib
-import google.generativeai as genai
-from typing import Optional, Dict, Any, List
+from utils.backend import genai
+from typing import Optional, Dict, Any, Iterator, List
 import json
-import time
-from PIL import Image
-import streamlit as st
 import re
-import PIL.Image
-from PIL import Image, ImageDraw
 import os
+import hashlib
+import mimetypes
+import shutil
+import tempfile
+from utils.file_index import get_file_index
+from utils.metrics import span, stream_span
+from utils.poller import INTERACTIVE_MAX_DELAY, get_poller
+from utils.reporter import get_reporter
+from utils.result_cache import get_result_cache, make_key, remote_file_digest
+from utils.scheduler import BATCH, current_priority, file_api_call
+from utils.session import current_session_id
+from utils.upload_cache import CHUNK_SIZE, get_upload_cache, hash_file_content
+
+# NumPy, PIL and OpenCV are imported by the functions that use them, so
+# importing this module for uploads or transcription does not load them.
+
+
+def _file_size(file) -> int:
+    size = getattr(file, "size", None)
+    if size is not None:
+        return size
+    return len(file.getbuffer())
+
+
+def _mime_type(file) -> Optional[str]:
+    mime_type = getattr(file, "type", None)
+    if mime_type:
+        return mime_type
+    return mimetypes.guess_type(file.name)[0]
+
+
+def _session_temp_dir() -> pathlib.Path:
+    """Returns a temp directory private to the current Streamlit session."""
+    temp_dir = pathlib.Path("temp") / current_session_id()
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    return temp_dir
+
+
+def _upload_via_temp_file(file, mime_type: Optional[str]):
+    """Stages the file in a unique session-scoped temp file, copying in bounded chunks."""
+    suffix = pathlib.Path(file.name).suffix
+    file.seek(0)
+    with tempfile.NamedTemporaryFile(dir=_session_temp_dir(), suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(file, tmp, CHUNK_SIZE)
+        temp_path = tmp.name
+    try:
+        return file_api_call(genai.upload_file, temp_path, mime_type=mime_type, display_name=file.name)
+    finally:
+        os.remove(temp_path)  # Remove the file from local after upload
+        file.seek(0)
+
+
+def _upload_stream(file, mime_type: Optional[str]):
+    """Hands the file object straight to the SDK, which reads it in resumable chunks."""
+
+    def upload():
+        # A retried upload has to start from the beginning again.
+        file.seek(0)
+        return genai.upload_file(file, mime_type=mime_type, display_name=file.name)
 
-def upload_file_to_gemini(file) -> Optional[Dict[str, Any]]:
-    """Uploads a file to Google Gemini."""
     try:
-        temp_dir = pathlib.Path("temp")
-        temp_dir.mkdir(exist_ok=True)
-        file_path = temp_dir / file.name
-        with open(file_path, "wb") as f:
-            f.write(file.getbuffer())
-        uploaded_file = genai.upload_file(file_path)
-        os.remove(file_path)  # Remove the file from local after upload
-        return uploaded_file
+        return file_api_call(upload)
+    except TypeError:
+        # Older SDK releases only accept a filesystem path.
+        return _upload_via_temp_file(file, mime_type)
+    finally:
+        file.seek(0)
+
+
+def prepare_video_upload(file, mode: str, session_id: Optional[str] = None, **options):
+    """
+    Runs utils.video_preprocess.prepare_video on an uploaded video file.
+
+    The file is staged in a session-scoped temp file, since OpenCV only reads
+    from paths. options are passed on, e.g. max_side or fps.
+    """
+    from utils.video_preprocess import prepare_video
+
+    suffix = pathlib.Path(file.name).suffix
+    file.seek(0)
+    with tempfile.NamedTemporaryFile(dir=_session_temp_dir(), suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(file, tmp, CHUNK_SIZE)
+        temp_path = tmp.name
+    try:
+        with span("preprocess_video", session_id, mode=mode) as timing:
+            prepared = prepare_video(temp_path, file.name, mode, **options)
+            timing.add_bytes(prepared.original_bytes)
+            timing.attrs["sent_bytes"] = prepared.sent_bytes
+            return prepared
+    finally:
+        os.remove(temp_path)
+        file.seek(0)
+
+
+def prepare_audio_upload(file, session_id: Optional[str] = None, **options):
+    """
+    Runs utils.audio_preprocess.prepare_audio on an uploaded WAV or AIFF file.
+
+    Raises ValueError for audio it cannot decode. options are passed on,
+    e.g. sample_rate or min_silence.
+    """
+    from utils.audio_preprocess import prepare_audio
+
+    file.seek(0)
+    data = file.read()
+    file.seek(0)
+    with span("preprocess_audio", session_id) as timing:
+        prepared = prepare_audio(data, **options)
+        timing.add_bytes(len(data))
+        timing.attrs["sent_bytes"] = len(prepared.data)
+        return prepared
+
+
+def upload_file_to_gemini(
+    file,
+    use_cache: bool = True,
+    stream: bool = True,
+    session_id: Optional[str] = None,
+    digest: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Uploads a file to Google Gemini.
+
+    When use_cache is True, content that was uploaded before and is still ACTIVE
+    on the File API is reused instead of being uploaded again. When stream is True
+    the file object is streamed to the SDK without being written to disk; otherwise
+    it is staged in a unique, session-scoped temp file.
+
+    The remote file is recorded in the local file index as owned by session_id
+    (the current session by default; pass it explicitly from worker threads).
+    Pass digest when the content's SHA-256 is already known, e.g. hashed on a
+    worker process, to skip hashing it again.
+    """
+    session_id = session_id or current_session_id()
+    try:
+        with span("upload", session_id, cache_hit=False) as timing:
+            cache = get_upload_cache() if use_cache else None
+            if cache is not None:
+                digest = digest or hash_file_content(file)
+                cached_file = cache.lookup(digest)
+                if cached_file is not None:
+                    timing.attrs["cache_hit"] = True
+                    cache.record_hit(_file_size(file))
+                    get_file_index().record_use(cached_file, session_id)
+                    get_reporter().info(f"Identical content already uploaded as '{cached_file.name}', reusing it.")
+                    return cached_file
+
+            mime_type = _mime_type(file)
+            if stream:
+                uploaded_file = _upload_stream(file, mime_type)
+            else:
+                uploaded_file = _upload_via_temp_file(file, mime_type)
+            timing.add_bytes(_file_size(file))
+            if cache is not None:
+                cache.store(digest, uploaded_file, _file_size(file))
+                cache.record_miss()
+            get_file_index().record_upload(uploaded_file, digest, _file_size(file), mime_type, session_id)
+            return uploaded_file
     except Exception as e:
-        st.error(f"Error uploading file: {e}")
+        get_reporter().error(f"Error uploading file: {e}")
         return None
 
 
-def poll_file_processing(uploaded_file) -> Optional[Dict[str, Any]]:
-    """Polls the status of the uploaded file until processing is complete."""
+def poll_file_processing(
+    uploaded_file,
+    timeout: Optional[float] = None,
+    session_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Waits until processing of the uploaded file is complete.
+
+    Status checks are made by the shared FilePoller, which backs off adaptively
+    and tracks the files of all sessions from a single thread. Outside
+    BATCH priority the backoff is capped at INTERACTIVE_MAX_DELAY, since
+    someone is waiting on the result.
+    """
     try:
-        with st.spinner('Processing file...'):
-            while uploaded_file.state.name == "PROCESSING":
-                time.sleep(1)
-                uploaded_file = genai.get_file(uploaded_file.name)
+        with get_reporter().spinner('Processing file...'):
+            if uploaded_file.state.name == "PROCESSING":
+                with span("poll", session_id, file=uploaded_file.name) as timing:
+                    max_delay = None if current_priority() == BATCH else INTERACTIVE_MAX_DELAY
+                    uploaded_file = get_poller().submit(uploaded_file, timeout=timeout, max_delay=max_delay).result()
+                    timing.attrs["state"] = uploaded_file.state.name
+                get_file_index().update_state(uploaded_file)
             if uploaded_file.state.name == "ACTIVE":
-                st.success(" File processing completed.")
+                get_reporter().success(" File processing completed.")
                 return uploaded_file
             elif uploaded_file.state.name == "FAILED":
-                st.error("File processing failed.")
+                get_reporter().error("File processing failed.")
                 return None
             else:
-                st.error(f"Unexpected file state: {uploaded_file.state.name}")
+                get_reporter().error(f"Unexpected file state: {uploaded_file.state.name}")
                 return None
     except Exception as e:
-        st.error(f"Error during file processing: {e}")
+        get_reporter().error(f"Error during file processing: {e}")
         return None
 
 
-def generate_metadata(model: Any, video_file) -> Optional[Dict[str, Any]]:
+METADATA_PROMPT = "Provide the details based on provided response schema"
+
+KEYFRAMES_PROMPT = (
+    "The images are {count} keyframes of one video, in order, each preceded by its timestamp. "
+    "The video is {duration:.0f} seconds long. "
+)
+
+TRANSCRIPTION_PROMPT = """
+Please transcribe this interview in the following format:
+[Speaker Name or Speaker A/B]: [Dialogue or caption].
+If a speaker's name is mentioned or can be identified in the audio, map the actual names accordingly.
+If no names are given, use Speaker A, Speaker B, etc.
+Ensure the transcription captures all spoken words accurately, including filler words where appropriate.
+"""
+
+
+def generate_metadata(
+    model: Any,
+    video_file,
+    use_cache: bool = True,
+    session_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
     """Generates metadata for the uploaded video using the Generative AI model."""
+    return _generate_metadata(
+        model, [video_file], METADATA_PROMPT, lambda: remote_file_digest(video_file),
+        getattr(video_file, "size_bytes", 0), use_cache, session_id,
+    )
+
+
+def generate_metadata_from_keyframes(
+    model: Any,
+    keyframes,
+    use_cache: bool = True,
+    session_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Generates metadata from a video's keyframes (see utils.video_preprocess) instead of the video itself."""
+    prompt = KEYFRAMES_PROMPT.format(count=len(keyframes.frames), duration=keyframes.duration) + METADATA_PROMPT
+    return _generate_metadata(
+        model, keyframes.contents(), prompt, keyframes.digest, keyframes.size, use_cache, session_id,
+    )
+
+
+def _generate_metadata(
+    model: Any,
+    contents: List[Any],
+    prompt: str,
+    digest,
+    size: int,
+    use_cache: bool,
+    session_id: Optional[str],
+) -> Optional[Dict[str, Any]]:
     try:
-        prompt = "Provide the details based on provided response schema"
-        result = model.generate_content([video_file, prompt])
-        if result.text:
-            metadata = json.loads(result.text)
-            return metadata
-        else:
-            st.error("No response received from the model.")
-            return None
+        with span("generate_metadata", session_id, cache_hit=False) as timing:
+            cache = get_result_cache() if use_cache else None
+            if cache is not None:
+                cache_key = make_key("metadata", digest(), model, prompt)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    timing.attrs["cache_hit"] = True
+                    return cached
+            timing.add_bytes(size)
+            result = model.generate_content([*contents, prompt])
+            timing.record_usage(result)
+            if result.text:
+                metadata = json.loads(result.text)
+                if cache is not None:
+                    cache.put(cache_key, "metadata", metadata)
+                return metadata
+            else:
+                get_reporter().error("No response received from the model.")
+                return None
     except json.JSONDecodeError as je:
-        st.error(f"Error decoding JSON response: {je}")
+        get_reporter().error(f"Error decoding JSON response: {je}")
         return None
     except Exception as e:
-        st.error(f"Error generating metadata: {e}")
+        get_reporter().error(f"Error generating metadata: {e}")
         return None
 
 
-def generate_transcription(model: Any, audio_file) -> Optional[str]:
+def generate_transcription(
+    model: Any,
+    audio_file,
+    use_cache: bool = True,
+    session_id: Optional[str] = None,
+) -> Optional[str]:
     """Generates transcription for the uploaded audio using the Generative AI model."""
     try:
-        prompt = """
-Please transcribe this interview in the following format:
-[Speaker Name or Speaker A/B]: [Dialogue or caption].
-If a speaker's name is mentioned or can be identified in the audio, map the actual names accordingly.
-If no names are given, use Speaker A, Speaker B, etc.
-Ensure the transcription captures all spoken words accurately, including filler words where appropriate.
-"""
-        responses = model.generate_content([audio_file, prompt])
-        if responses.text:
-            transcription = responses.text.strip()
-            return transcription
-        else:
-            st.error("No response received from the model.")
-            return None
+        with span("generate_transcription", session_id, cache_hit=False) as timing:
+            prompt = TRANSCRIPTION_PROMPT
+            cache = get_result_cache() if use_cache else None
+            if cache is not None:
+                cache_key = make_key("transcription", remote_file_digest(audio_file), model, prompt)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    timing.attrs["cache_hit"] = True
+                    return cached
+            timing.add_bytes(getattr(audio_file, "size_bytes", 0))
+            responses = model.generate_content([audio_file, prompt])
+            timing.record_usage(responses)
+            if responses.text:
+                transcription = responses.text.strip()
+                if cache is not None:
+                    cache.put(cache_key, "transcription", transcription)
+                return transcription
+            else:
+                get_reporter().error("No response received from the model.")
+                return None
     except Exception as e:
-        st.error(f"Error generating transcription: {e}")
+        get_reporter().error(f"Error generating transcription: {e}")
         return None
 
 
+# Matches "[Speaker A]: text" as well as "Speaker A: text".
+SPEAKER_LINE_PATTERN = re.compile(r'^\s*\[?([^\[\]:\n]{1,80}?)\]?\s*:\s*(.*)$')
+
+
+class SpeakerLineParser:
+    """
+    Incrementally parses streamed transcript text into speaker lines.
+
+    feed() accepts arbitrary chunks and returns the lines completed by that chunk
+    as {"speaker": ..., "text": ...} dicts. Lines without a speaker prefix are
+    treated as a continuation of the previous speaker's line.
+    """
+
+    def __init__(self):
+        self.lines: List[Dict[str, str]] = []
+        self._pending = ""
+
+    def feed(self, text: str) -> List[Dict[str, str]]:
+        self._pending += text
+        *complete, self._pending = self._pending.split("\n")
+        return self._parse(complete)
+
+    def close(self) -> List[Dict[str, str]]:
+        """Parses whatever is left once the stream has ended."""
+        remaining, self._pending = [self._pending], ""
+        return self._parse(remaining)
+
+    def _parse(self, raw_lines: List[str]) -> List[Dict[str, str]]:
+        new_lines = []
+        for raw_line in raw_lines:
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            match = SPEAKER_LINE_PATTERN.match(raw_line)
+            if match:
+                line = {"speaker": match.group(1).strip(), "text": match.group(2).strip()}
+                self.lines.append(line)
+                new_lines.append(line)
+            elif self.lines:
+                self.lines[-1]["text"] = f"{self.lines[-1]['text']} {raw_line}".strip()
+        return new_lines
+
+
+def stream_transcription(model: Any, audio_file, use_cache: bool = True) -> Iterator[str]:
+    """
+    Streams the transcription of the uploaded audio as text chunks arrive.
+
+    A cached transcription is yielded as a single chunk. Once the stream
+    completes, the full text is stored in the result cache.
+    """
+    try:
+        with stream_span("stream_transcription", cache_hit=False) as timing:
+            prompt = TRANSCRIPTION_PROMPT
+            cache = get_result_cache() if use_cache else None
+            if cache is not None:
+                cache_key = make_key("transcription", remote_file_digest(audio_file), model, prompt)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    timing.attrs["cache_hit"] = True
+                    yield cached
+                    return
+            timing.add_bytes(getattr(audio_file, "size_bytes", 0))
+            chunks = []
+            stream = model.generate_content([audio_file, prompt], stream=True)
+            for response in stream:
+                try:
+                    text = response.text
+                except ValueError:
+                    # Chunks without text parts (e.g. only safety metadata) carry nothing to render.
+                    continue
+                chunks.append(text)
+                yield text
+            # Once iterated, the stream's usage_metadata is that of the whole reply.
+            timing.record_usage(stream)
+            transcription = "".join(chunks).strip()
+            if not transcription:
+                get_reporter().error("No response received from the model.")
+            elif cache is not None:
+                cache.put(cache_key, "transcription", transcription)
+    except Exception as e:
+        get_reporter().error(f"Error generating transcription: {e}")
+
+
+def hash_image(image) -> str:
+    """
+    Returns a SHA-256 digest of a PIL image's pixels, size and mode.
+
+    This reads every decoded pixel; when the image came from a file, hashing
+    the file's bytes (utils.upload_cache.hash_file_content) is much cheaper.
+    """
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
 def remove_markdown(text):
     """
     Remove Markdown formatting from the given text.
@@ -181,38 +502,22 @@ def convert_normalized_to_pixel(bounding_boxes, image_width, image_height):
   Converts normalized bounding box coordinates to pixel values.
   
   Args:
-      bounding_boxes (list of dict): List of bounding boxes with normalized coordinates.
+      bounding_boxes (list of dict or BoxArray): Bounding boxes with normalized coordinates.
       image_width (int): Width of the original image in pixels.
       image_height (int): Height of the original image in pixels.
       
   Returns:
       list of dict: List of bounding boxes with pixel coordinates.
   """
-  converted_boxes = []
-  for box in bounding_boxes:
-      name = (box['name'])
-      xmin = (box['xmin'] / 1000) * image_width
-      ymin = (box['ymin'] / 1000) * image_height
-      xmax = (box['xmax'] / 1000) * image_width
-      ymax = (box['ymax'] / 1000) * image_height
-      
-      # Ensure coordinates are integers
-      xmin, ymin, xmax, ymax = map(int, [xmin, ymin, xmax, ymax])
-      
-      # Validate coordinates
-      if not (0 <= xmin < xmax <= image_width) or not (0 <= ymin < ymax <= image_height):
-          print(f"Invalid bounding box coordinates after conversion: {box}")
-          continue  # Skip invalid boxes
-      
-      converted_boxes.append({
-          'name': name,
-          'xmin': xmin,
-          'ymin': ymin,
-          'xmax': xmax,
-          'ymax': ymax
-      })
-  
-  return converted_boxes
+  from utils.boxes import BoxArray
+
+  boxes = BoxArray.coerce(bounding_boxes)
+  # Scaling, truncation and validity filtering run as single array passes.
+  converted_boxes = boxes.to_pixel(image_width, image_height)
+  skipped = len(boxes) - len(converted_boxes)
+  if skipped:
+      get_reporter().warning(f"Skipped {skipped} invalid bounding boxes after conversion.")
+  return converted_boxes.to_dicts()
 
 
 def draw_bounding_boxes(image, bounding_boxes, output_path=None):
@@ -225,54 +530,14 @@ def draw_bounding_boxes(image, bounding_boxes, output_path=None):
         output_path (str, optional): Path to save the annotated image. If None, returns the image object.
         
     Returns:
-        PIL.Image.Image: Image with bounding boxes and labels drawn.
+        PIL.Image.Image: Image with bounding boxes and labels drawn (the same object, drawn on in place).
     """
-    draw = ImageDraw.Draw(image)
-    
-    # You may need to adjust the font size based on your needs
-    try:
-        from PIL import ImageFont
-        font = ImageFont.truetype("arial.ttf", 20)
-    except:
-        font = ImageFont.load_default()
-    
-    for idx, box in enumerate(bounding_boxes, 1):
-        xmin = box['xmin']
-        ymin = box['ymin']
-        xmax = box['xmax']
-        ymax = box['ymax']
-        name = box['name']
-        
-        # Draw the red bounding box
-        draw.rectangle([xmin, ymin, xmax, ymax], outline="red", width=1)
-        
-        # Prepare the label text
-        label_text = f"{name}"
-        
-        # Get text size
-        text_bbox = draw.textbbox((0, 0), label_text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        
-        # Calculate text position (above the bounding box)
-        text_x = xmin
-        text_y = max(0, ymin - text_height - 2)  # 2 pixels padding
-        
-        # Draw yellow background for text
-        draw.rectangle(
-            [
-                text_x - 2,  # 2 pixels padding
-                text_y - 2,
-                text_x + text_width + 2,
-                text_y + text_height + 2
-            ],
-            fill="yellow"
-        )
-        
-        # Draw black text on yellow background
-        draw.text((text_x, text_y), label_text, fill="black", font=font)
-    
+    from utils.render import draw_boxes
+
+    # Fonts are cached per size, and strokes and labels scale with the image.
+    draw_boxes(image, bounding_boxes)
+
     if output_path:
         image.save(output_path)
-        print(f"Annotated image saved at '{output_path}'.")
+        get_reporter().info(f"Annotated image saved at '{output_path}'.")
     return image
\ No newline at end of file
@@ -0,0 +1,308 @@
+import hashlib
+import heapq
+import io
+import os
+import pathlib
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from utils.image_preprocess import EncodedImage, encode_image
+
+MODES = ("raw", "reduced", "keyframes")
+# Gemini samples uploaded video at about one frame per second and tokenizes
+# frames at low resolution, so anything beyond this is upload and processing
+# time spent on detail the model never sees.
+DEFAULT_MAX_SIDE = 768
+DEFAULT_FPS = 2.0
+# MPEG-4 Part 2 is built into every opencv-python wheel; H.264 encoders often are not.
+FOURCC = "mp4v"
+
+# Scene changes are found by comparing small colour thumbnails of frames sampled at SAMPLE_FPS;
+# greyscale would miss cuts between scenes of similar brightness.
+SAMPLE_FPS = 2.0
+THUMBNAIL_SIZE = (64, 36)
+# Mean absolute difference (0-255) between consecutive thumbnails that counts as a new scene.
+DEFAULT_SCENE_THRESHOLD = 12.0
+DEFAULT_MAX_KEYFRAMES = 32
+# Sampled frames differenced together; bounds the decoded frames held in memory.
+CHUNK_FRAMES = 64
+
+
+class VideoBytes(io.BytesIO):
+    """An encoded video with the name/type/size attributes upload_file_to_gemini expects."""
+
+    def __init__(self, data: bytes, name: str, mime_type: str = "video/mp4"):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+        self.size = len(data)
+
+
+class Keyframe:
+    """One scene-change frame, encoded for the model, and where it occurs in the video."""
+
+    def __init__(self, timestamp: float, score: float, image: EncodedImage):
+        self.timestamp = timestamp
+        self.score = score
+        self.image = image
+
+
+class Keyframes:
+    """Scene-change frames of a video, sent to the model as an image sequence instead of the video."""
+
+    def __init__(self, frames: List[Keyframe], duration: float):
+        self.frames = frames
+        self.duration = duration
+
+    @property
+    def size(self) -> int:
+        return sum(len(frame.image.data) for frame in self.frames)
+
+    def digest(self) -> str:
+        """A content hash of the frames and their timestamps, for the result cache."""
+        sha256 = hashlib.sha256()
+        for frame in self.frames:
+            sha256.update(f"{frame.timestamp:.3f}".encode("ascii"))
+            sha256.update(frame.image.data)
+        return sha256.hexdigest()
+
+    def contents(self) -> List[Any]:
+        """generate_content parts: each frame preceded by its timestamp."""
+        parts: List[Any] = []
+        for frame in self.frames:
+            parts.append(f"Frame at {frame.timestamp:.1f}s:")
+            parts.append(frame.image.as_part())
+        return parts
+
+
+class PreparedVideo:
+    """What will be sent to the model for one video, and what preparing it cost."""
+
+    def __init__(
+        self,
+        mode: str,
+        original_bytes: int,
+        sent_bytes: int,
+        seconds: float,
+        duration: float,
+        file: Optional[VideoBytes] = None,
+        keyframes: Optional[Keyframes] = None,
+    ):
+        self.mode = mode
+        self.original_bytes = original_bytes
+        self.sent_bytes = sent_bytes
+        self.seconds = seconds
+        self.duration = duration
+        # The reduced video to upload; None means upload the original.
+        self.file = file
+        self.keyframes = keyframes
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.sent_bytes
+
+    def as_row(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "original_mb": round(self.original_bytes / (1024 * 1024), 2),
+            "sent_mb": round(self.sent_bytes / (1024 * 1024), 2),
+            "saved_pct": round(100 * self.saved_bytes / self.original_bytes, 1) if self.original_bytes else 0.0,
+            "preprocess_s": round(self.seconds, 2),
+        }
+
+
+def _open(path: str):
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"OpenCV cannot read {path}")
+    return capture
+
+
+def _scaled_size(width: int, height: int, max_side: Optional[int]):
+    if not max_side or max(width, height) <= max_side:
+        return width, height
+    scale = max_side / max(width, height)
+    # Most encoders need even dimensions.
+    return max(2, round(width * scale / 2) * 2), max(2, round(height * scale / 2) * 2)
+
+
+def _sampled_frames(capture, source_fps: float, target_fps: float):
+    """Yields (frame index, decoded frame) at about target_fps, decoding only the frames it keeps."""
+    step = max(1.0, source_fps / target_fps)
+    next_frame = 0.0
+    index = 0
+    while capture.grab():
+        if index >= next_frame:
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+            yield index, frame
+            next_frame += step
+        index += 1
+
+
+def reduce_video(
+    source_path: str,
+    output_path: str,
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    fps: float = DEFAULT_FPS,
+) -> float:
+    """
+    Re-encodes a video at no more than max_side pixels on its longest side and fps frames per second.
+
+    Frames are dropped rather than blended, so playback speed is unchanged.
+    OpenCV writes video only: the audio track is not carried over. Returns
+    the duration of the video in seconds.
+    """
+    import cv2
+
+    capture = _open(source_path)
+    try:
+        source_fps = capture.get(cv2.CAP_PROP_FPS) or fps
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        size = _scaled_size(width, height, max_side)
+        output_fps = min(fps, source_fps)
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*FOURCC), output_fps, size)
+        if not writer.isOpened():
+            raise ValueError(f"OpenCV cannot write {FOURCC} video")
+        frames = 0
+        try:
+            for _, frame in _sampled_frames(capture, source_fps, output_fps):
+                if (frame.shape[1], frame.shape[0]) != size:
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                writer.write(frame)
+                frames += 1
+        finally:
+            writer.release()
+        return frames / output_fps
+    finally:
+        capture.release()
+
+
+def _scene_scores(thumbnails: np.ndarray, previous: Optional[np.ndarray]) -> np.ndarray:
+    """Mean absolute difference of each thumbnail from the one before it; the very first frame scores inf."""
+    stacked = thumbnails.astype(np.int16)
+    if previous is None:
+        first = np.array([np.inf])
+    else:
+        first = np.array([np.abs(stacked[0] - previous.astype(np.int16)).mean()])
+    return np.concatenate([first, np.abs(np.diff(stacked, axis=0)).reshape(len(stacked) - 1, -1).mean(axis=1)])
+
+
+def extract_keyframes(
+    source_path: str,
+    threshold: float = DEFAULT_SCENE_THRESHOLD,
+    max_frames: int = DEFAULT_MAX_KEYFRAMES,
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    sample_fps: float = SAMPLE_FPS,
+) -> Keyframes:
+    """
+    Picks the frames where the scene changes, for sending as images instead of the video.
+
+    Frames sampled at sample_fps are shrunk to colour thumbnails and
+    differenced a chunk at a time with NumPy; a frame whose difference from
+    the previous sample exceeds threshold starts a new scene. The first
+    frame is always kept. When there are more than max_frames scene
+    changes, the strongest are kept, in time order.
+    """
+    import cv2
+
+    capture = _open(source_path)
+    try:
+        source_fps = capture.get(cv2.CAP_PROP_FPS) or sample_fps
+        duration = capture.get(cv2.CAP_PROP_FRAME_COUNT) / source_fps
+        # Min-heap of the strongest scene changes so far, so weaker ones are never encoded.
+        kept: List[tuple] = []
+        previous = None
+
+        def flush(chunk):
+            nonlocal previous
+            thumbnails = np.stack([thumbnail for _, _, thumbnail in chunk])
+            scores = _scene_scores(thumbnails, previous)
+            previous = thumbnails[-1]
+            for (index, frame, _), score in zip(chunk, scores):
+                if score < threshold or (len(kept) >= max_frames and score <= kept[0][0]):
+                    continue
+                image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                keyframe = Keyframe(index / source_fps, float(score), encode_image(image, max_side))
+                entry = (keyframe.score, index, keyframe)
+                if len(kept) < max_frames:
+                    heapq.heappush(kept, entry)
+                else:
+                    heapq.heapreplace(kept, entry)
+
+        chunk = []
+        for index, frame in _sampled_frames(capture, source_fps, sample_fps):
+            # Only max_side pixels are ever sent, so do not hold a chunk of full-size frames.
+            size = _scaled_size(frame.shape[1], frame.shape[0], max_side)
+            if size != (frame.shape[1], frame.shape[0]):
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            thumbnail = cv2.resize(frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+            chunk.append((index, frame, thumbnail))
+            if len(chunk) >= CHUNK_FRAMES:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    finally:
+        capture.release()
+
+    frames = sorted((keyframe for _, _, keyframe in kept), key=lambda keyframe: keyframe.timestamp)
+    return Keyframes(frames, duration)
+
+
+def prepare_video(
+    source_path: str,
+    name: str,
+    mode: str = "reduced",
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    fps: float = DEFAULT_FPS,
+    threshold: float = DEFAULT_SCENE_THRESHOLD,
+    max_keyframes: int = DEFAULT_MAX_KEYFRAMES,
+) -> PreparedVideo:
+    """
+    Prepares a local video for the model in one of MODES.
+
+    "raw" sends the file as it is. "reduced" re-encodes it with reduce_video,
+    falling back to the original when that would not be smaller. "keyframes"
+    replaces it with the frames from extract_keyframes.
+    """
+    import cv2
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown video mode {mode!r}; expected one of {MODES}")
+    original_bytes = pathlib.Path(source_path).stat().st_size
+    started = time.perf_counter()
+    if mode == "keyframes":
+        keyframes = extract_keyframes(source_path, threshold, max_keyframes, max_side)
+        return PreparedVideo(
+            mode, original_bytes, keyframes.size, time.perf_counter() - started, keyframes.duration,
+            keyframes=keyframes,
+        )
+    if mode == "reduced":
+        # Never next to the source: it may be the user's own file in a read-only directory.
+        fd, output_path = tempfile.mkstemp(suffix=".reduced.mp4")
+        os.close(fd)
+        try:
+            duration = reduce_video(source_path, output_path, max_side, fps)
+            data = pathlib.Path(output_path).read_bytes()
+        finally:
+            pathlib.Path(output_path).unlink(missing_ok=True)
+        if len(data) < original_bytes:
+            file = VideoBytes(data, f"{pathlib.Path(name).stem}.reduced.mp4")
+            return PreparedVideo(mode, original_bytes, len(data), time.perf_counter() - started, duration, file=file)
+
+    capture = _open(source_path)
+    try:
+        frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        duration = frame_count / (capture.get(cv2.CAP_PROP_FPS) or 1)
+    finally:
+        capture.release()
+    return PreparedVideo("raw", original_bytes, original_bytes, time.perf_counter() - started, duration)